@@ -1,6 +1,6 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
 import os
 import tempfile
 import shutil
@@ -28,8 +28,11 @@ logger = logging.getLogger(__name__)
 from video_agent import process_youtube_video, process_uploaded_video, save_uploaded_video, cleanup_video_file
 from speech import Process_Audio
 from legal import LegalDocumentSummarizer
-from normal import GeneralDocumentSummarizer, SummarySettings
-from resume import ResumeSummarizer
+from retrieval import DEFAULT_TOP_K, MAX_TOP_K
+from normal import GeneralDocumentSummarizer, SummarySettings, DEFAULT_SECTION_TOKEN_BUDGET
+from dedup import DEFAULT_SIMILARITY_THRESHOLD
+from resume import ResumeSummarizer, RESUME_BATCH_CONCURRENCY, rank_screening_results
+from resume_models import CandidateQuery, CandidateMatch
 from website import fetch_transcript, summarize_content
 from yt import summarize_youtube_video, prompt
 
@@ -101,13 +104,36 @@ def get_resume_summarizer():
 
 # Request/Response models
 class LegalSummaryResponse(BaseModel):
+    document_id: Optional[str] = None
     document_type: str
     summary: str
     processing_time: float
+    duplicate_chunks: int = 0
+    llm_calls_saved: int = 0
+    version: Optional[Dict[str, Any]] = None
+    clause_reuse: Optional[Dict[str, Any]] = None
+    route: Optional[Dict[str, Any]] = None
+    document_classification: Optional[Dict[str, Any]] = None
+    facts: Optional[Dict[str, Any]] = None
+    retrieval: Optional[Dict[str, Any]] = None
+    stage_metrics: Dict[str, Dict[str, Any]] = {}
 
 class LegalSummaryRequest(BaseModel):
     custom_question: Optional[str] = None
 
+class LegalQuestionRequest(BaseModel):
+    document_id: str
+    question: str
+    top_k: int = Field(default=DEFAULT_TOP_K, ge=1, le=MAX_TOP_K)
+
+class LegalQuestionResponse(BaseModel):
+    document_id: str
+    document_type: str
+    answer: str
+    processing_time: float
+    retrieval: Dict[str, Any] = {}
+    stage_metrics: Dict[str, Dict[str, Any]] = {}
+
 class GeneralSummaryRequest(BaseModel):
     conciseness: str = "balanced"
     focus_areas: List[str] = []
@@ -115,20 +141,41 @@ class GeneralSummaryRequest(BaseModel):
     extract_key_points: bool = True
     include_statistics: bool = False
     summary_length_percentage: Optional[float] = None
+    max_input_tokens: Optional[int] = None
+    extractive_prefilter: bool = False
+    extractive_keep_ratio: Optional[float] = None
+    metadata_mode: str = "llm"
+    metadata_only: bool = False
+    document_key: Optional[str] = None
 
 class ResumeAnalysisRequest(BaseModel):
     job_description: Optional[str] = None
 
+class CandidateSearchResponse(BaseModel):
+    candidates: List[CandidateMatch]
+    total: int
+    query_time_ms: float
+
 # Routes for Legal Document Summarization
 @app.post("/api/legal/summarize", response_model=LegalSummaryResponse)
 async def summarize_legal_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    custom_question: Optional[str] = Form(None)
+    custom_question: Optional[str] = Form(None),
+    extractive_keep_ratio: Optional[float] = Form(None),
+    document_key: Optional[str] = Form(None),
+    reuse_clauses: bool = Form(False),
+    facts_only: bool = Form(False),
+    question_mode: bool = Form(False)
 ):
-    """Summarize a legal document (PDF format)"""
+    """
+    Summarize a legal document (PDF format). With facts_only, extract its parties, dates, amounts
+    and deadlines without the LLM; with question_mode, answer custom_question from the relevant clauses.
+    """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    if question_mode and not custom_question:
+        raise HTTPException(status_code=400, detail="question_mode requires a custom_question")
     
     try:
         # Save uploaded file to temp directory
@@ -141,7 +188,8 @@ async def summarize_legal_document(
             
         # Process the document
         summarizer = get_legal_summarizer()
-        result = summarizer.generate_summary(temp_file_path, custom_question)
+        result = summarizer.generate_summary(temp_file_path, custom_question, extractive_keep_ratio, document_key,
+                                             reuse_clauses, facts_only, question_mode)
         
         # Clean up temp file in the background
         background_tasks.add_task(os.unlink, temp_file_path)
@@ -152,6 +200,17 @@ async def summarize_legal_document(
             os.unlink(temp_file_path)
         raise HTTPException(status_code=500, detail=f"Error processing legal document: {str(e)}")
 
+@app.post("/api/legal/ask", response_model=LegalQuestionResponse)
+async def ask_legal_document(request: LegalQuestionRequest):
+    """Answer a follow-up question about a legal document uploaded before, by its document_id"""
+    summarizer = get_legal_summarizer()
+    try:
+        return summarizer.ask(request.document_id, request.question, request.top_k)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown document id; upload the document again")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
+
 # Routes for General Document Summarization
 @app.post("/api/general/summarize")
 async def summarize_general_document(
@@ -161,7 +220,16 @@ async def summarize_general_document(
     extract_topics: bool = Form(True),
     extract_key_points: bool = Form(True),
     include_statistics: bool = Form(False),
-    summary_length_percentage: Optional[float] = Form(None)
+    summary_length_percentage: Optional[float] = Form(None),
+    max_input_tokens: Optional[int] = Form(None),
+    extractive_prefilter: bool = Form(False),
+    extractive_keep_ratio: Optional[float] = Form(None),
+    metadata_mode: str = Form("llm"),
+    metadata_only: bool = Form(False),
+    document_key: Optional[str] = Form(None),
+    sectioning: str = Form("auto"),
+    section_token_budget: int = Form(DEFAULT_SECTION_TOKEN_BUDGET),
+    duplicate_threshold: Optional[float] = Form(DEFAULT_SIMILARITY_THRESHOLD)
 ):
     """Summarize a general document (PDF, DOCX, or TXT format)"""
     valid_extensions = ['.pdf', '.docx', '.txt']
@@ -187,7 +255,16 @@ async def summarize_general_document(
             extract_topics=extract_topics,
             extract_key_points=extract_key_points,
             include_statistics=include_statistics,
-            summary_length_percentage=summary_length_percentage
+            summary_length_percentage=summary_length_percentage,
+            max_input_tokens=max_input_tokens,
+            extractive_prefilter=extractive_prefilter,
+            extractive_keep_ratio=extractive_keep_ratio,
+            metadata_mode=metadata_mode,
+            metadata_only=metadata_only,
+            document_key=document_key,
+            sectioning=sectioning,
+            section_token_budget=section_token_budget,
+            duplicate_threshold=duplicate_threshold
         )
             
         # Process the document
@@ -209,7 +286,8 @@ async def summarize_general_document(
 async def analyze_resume(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    job_description: Optional[str] = Form(None)
+    job_description: Optional[str] = Form(None),
+    ats_recommendations: bool = Form(True)
 ):
     """Analyze a resume (PDF format) with optional job description for ATS comparison"""
     if not file.filename.lower().endswith('.pdf'):
@@ -226,7 +304,8 @@ async def analyze_resume(
             
         # Process the resume
         summarizer = get_resume_summarizer()
-        result = summarizer.process_resume_file(temp_file_path, job_description)
+        result = summarizer.process_resume_file(temp_file_path, job_description, ats_recommendations,
+                                               source=file.filename)
         
         # Clean up temp file in the background
         background_tasks.add_task(os.unlink, temp_file_path)
@@ -238,6 +317,69 @@ async def analyze_resume(
             os.unlink(temp_file_path)
         raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
 
+@app.post("/api/resume/batch")
+async def screen_resume_batch(
+    files: List[UploadFile] = File(...),
+    job_description: str = Form(...),
+    include_summary: bool = Form(False),
+    include_recommendations: bool = Form(False),
+    max_concurrency: int = Form(RESUME_BATCH_CONCURRENCY)
+):
+    """
+    Screen many resumes (PDF format) against one job description. Results are streamed as
+    newline-delimited JSON as each resume completes, followed by the final ranking.
+    """
+    if any(not file.filename.lower().endswith('.pdf') for file in files):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported for resumes")
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    
+    # Save uploaded files to temp directory
+    resumes = []
+    for file in files:
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+        with temp_file:
+            temp_file.write(await file.read())
+        resumes.append((file.filename, temp_file.name))
+    
+    def stream_results():
+        completed = []
+        results = None
+        try:
+            summarizer = get_resume_summarizer()
+            results = summarizer.screen_resumes(resumes, job_description, max_concurrency, include_summary,
+                                                include_recommendations)
+            for result in results:
+                completed.append(result)
+                yield json.dumps({"event": "result", **result.model_dump(mode="json")}) + "\n"
+            ranking = rank_screening_results(completed)
+            yield json.dumps({"event": "ranking", "results": [
+                {"rank": result.rank, "filename": result.filename, "batch_index": result.batch_index,
+                 "candidate_name": result.candidate_name, "score": result.score, "duplicate_of": result.duplicate_of,
+                 "duplicate_of_index": result.duplicate_of_index, "error": result.error}
+                for result in ranking
+            ]}) + "\n"
+        finally:
+            # Stop the batch first, cancelling resumes not started yet, then clean up the temp
+            # files once the batch is done (or the client disconnects)
+            if results is not None:
+                results.close()
+            for _, temp_file_path in resumes:
+                if os.path.exists(temp_file_path):
+                    os.unlink(temp_file_path)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/api/resume/candidates/search", response_model=CandidateSearchResponse)
+async def search_candidates(query: CandidateQuery):
+    """Filter and rank every resume processed so far by skills, experience, title, degree and location"""
+    summarizer = get_resume_summarizer()
+    try:
+        candidates, query_time_ms = summarizer.search_candidates(query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching candidates: {str(e)}")
+    return CandidateSearchResponse(candidates=candidates, total=len(candidates), query_time_ms=query_time_ms)
+
 # Pydantic models for request validation
 class YouTubeRequest(BaseModel):
     url: HttpUrl
@@ -321,7 +463,11 @@ async def summarize_video(
 
 # Speech/Audio endpoint
 @app.post("/api/process-audio", summary="Transcribe and summarize audio file")
-async def process_audio_endpoint(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def process_audio_endpoint(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    extractive_keep_ratio: Optional[float] = Form(None)
+):
     """
     Upload an audio file to be transcribed and summarized.
     
@@ -344,7 +490,7 @@ async def process_audio_endpoint(background_tasks: BackgroundTasks, file: Upload
             print(f"Audio saved to temporary file: {temp_file_path}, size: {len(file_content)} bytes")
         
         # Process the audio file
-        result = Process_Audio(temp_file_path)
+        result = Process_Audio(temp_file_path, extractive_keep_ratio)
         
         # Schedule cleanup of temp file
         if temp_file_path:
@@ -361,7 +507,10 @@ async def process_audio_endpoint(background_tasks: BackgroundTasks, file: Upload
         return {
             "success": True,
             "transcript": result["transcript"],
-            "summary": result["summary"]
+            "timestamped_transcript": result.get("timestamped_transcript"),
+            "segments": result.get("segments", []),
+            "summary": result["summary"],
+            "stage_metrics": result.get("stage_metrics", {})
         }
     
     except Exception as e:
@@ -0,0 +1,168 @@
+from collections import Counter
+from typing import Any, List, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from extractive import STOP_WORDS, split_sentences
+from keyphrases import PHRASE_WORD_PATTERN, MAX_PHRASE_WORDS, extract_keyphrases
+from retrieval import BM25_K1
+from resume_models import ResumeData
+from skill_taxonomy import default_skill_taxonomy
+
+JOB_KEYWORDS = 20  # Key terms extracted from a job description
+PARTIAL_MATCH_WEIGHT = 0.5  # Credit for a multi-word term whose words all appear, but not together
+FULL_CREDIT_MENTIONS = 2  # Mentions of a term (e.g. in skills and in experience) that earn its full weight
+JOB_SKILL_WEIGHT = 0.5  # Weight of a known skill per mention in a job description, up to full weight (1.0)
+# Words common to every job posting, which say nothing about the role
+GENERIC_JOB_TERMS = frozenset("""
+ability able applicant apply bonus build building candidate candidates collaborate company design develop
+developing etc experience experienced familiarity familiar good great have ideal job junior knowledge looking
+maintain maintaining manage must need needed nice plus preferred required requirement requirements
+responsibilities responsible role senior skills strong support team understanding use using want work working year
+years
+""".split())
+
+class KeywordScore(BaseModel):
+    """Match of one resume against the key terms of a job description."""
+    score: float  # 0-100
+    present: List[str] = Field(default_factory=list)
+    missing: List[str] = Field(default_factory=list)  # Most important first
+
+def skill_term(skill: str) -> str:
+    """A canonical skill as a key term, in the words term matching sees ("CI/CD" -> "ci cd")."""
+    return " ".join(PHRASE_WORD_PATTERN.findall(skill.lower()))
+
+def _is_filler(word: str) -> bool:
+    """Whether a word says nothing about the role on its own: generic, a stop word or a number ("5+")."""
+    return word in GENERIC_JOB_TERMS or word in STOP_WORDS or not any(character.isalpha() for character in word)
+
+def job_keywords(text: str, top_n: int = JOB_KEYWORDS) -> Tuple[List[str], List[float]]:
+    """
+    Key terms of a job description and their weights, best first: every known skill it
+    names, weighted by its mentions (aliases resolved, so "k8s" and "Kubernetes" are one
+    term), and the top keyphrases of the rest of the text (TF-IDF keyphrase scores).
+    Skills are atomic terms: they are cut out of the text before keyphrases are
+    extracted, so no keyphrase splits ("CI/CD") or repeats them.
+    """
+    taxonomy = default_skill_taxonomy()
+    mentions = taxonomy.find(text)
+    skill_mentions = Counter(mention.skill for mention in mentions)
+    parts = []
+    position = 0
+    for mention in mentions:
+        parts.append(text[position:mention.start])
+        parts.append(" , ")  # Phrase boundary where the skill was
+        position = mention.end
+    parts.append(text[position:])
+    keyphrases = extract_keyphrases(split_sentences("".join(parts)), top_n=top_n * 2)
+
+    terms, weights = [], []
+    for skill, count in skill_mentions.items():
+        term = skill_term(skill)
+        if term and term not in terms:
+            terms.append(term)
+            weights.append(min(1.0, JOB_SKILL_WEIGHT * count))
+    keyphrase_terms = 0
+    for keyphrase in keyphrases:
+        # Trim filler from the edges ("build rest apis" -> "rest apis", "5+ years" -> "")
+        words = keyphrase.phrase.split()
+        while words and _is_filler(words[0]):
+            words = words[1:]
+        while words and _is_filler(words[-1]):
+            words = words[:-1]
+        term = " ".join(words)
+        if not term or term in terms:
+            continue
+        terms.append(term)
+        weights.append(keyphrase.score)
+        keyphrase_terms += 1
+        if keyphrase_terms >= top_n:
+            break
+    order = sorted(range(len(terms)), key=lambda i: -weights[i])
+    return [terms[i] for i in order], [weights[i] for i in order]
+
+def phrase_counts(text: str, max_words: int = MAX_PHRASE_WORDS) -> Counter:
+    """Occurrences of every word n-gram of up to max_words words in a text."""
+    words = PHRASE_WORD_PATTERN.findall(text.lower())
+    counts = Counter()
+    for n in range(1, max_words + 1):
+        counts.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts
+
+def term_count_matrix(texts: List[str], terms: List[str]) -> np.ndarray:
+    """
+    Texts x terms matrix of term occurrences. A multi-word term that never occurs as a
+    phrase gets PARTIAL_MATCH_WEIGHT if each of its words occurs somewhere in the text.
+    """
+    term_words = [term.split() for term in terms]
+    matrix = np.zeros((len(texts), len(terms)))
+    for row, text in enumerate(texts):
+        counts = phrase_counts(text)
+        matrix[row] = [
+            counts.get(term, 0) or (PARTIAL_MATCH_WEIGHT if len(words) > 1 and all(word in counts for word in words) else 0)
+            for term, words in zip(terms, term_words)
+        ]
+    return matrix
+
+def keyword_scores(counts: np.ndarray, weights: np.ndarray, k1: float = BM25_K1) -> np.ndarray:
+    """
+    Scores (0-100) of every row of a texts x terms count matrix: the weighted share of
+    terms present, each saturating with repetition like a BM25 term frequency and
+    reaching full credit at FULL_CREDIT_MENTIONS mentions.
+    """
+    if not weights.size or not weights.sum():
+        return np.zeros(counts.shape[0])
+    saturation = counts * (k1 + 1.0) / (counts + k1)
+    full = FULL_CREDIT_MENTIONS * (k1 + 1.0) / (FULL_CREDIT_MENTIONS + k1)
+    credit = np.minimum(saturation / full, 1.0)
+    return np.round(100.0 * (credit @ weights) / weights.sum(), 1)
+
+def match_keywords(texts: List[str], terms: List[str], weights: List[float]) -> List[KeywordScore]:
+    """
+    Match texts (e.g. a batch of resumes) against weighted job terms in one vectorized pass.
+    Skill aliases in the texts are resolved first, as in job_keywords.
+    """
+    taxonomy = default_skill_taxonomy()
+    counts = term_count_matrix([taxonomy.canonicalize(text) for text in texts], terms)
+    scores = keyword_scores(counts, np.asarray(weights, dtype=np.float64))
+    results = []
+    for row, score in zip(counts, scores):
+        results.append(KeywordScore(
+            score=float(score),
+            # A partial match earns credit, so it counts as present
+            present=[term for term, count in zip(terms, row) if count > 0],
+            missing=[term for term, count in zip(terms, row) if count == 0]
+        ))
+    return results
+
+def _strings(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in _strings(item)]
+    if isinstance(value, (list, tuple)):
+        return [text for item in value for text in _strings(item)]
+    return []
+
+def resume_to_text(resume_data: ResumeData) -> str:
+    """Every text field of structured resume data, one per line, for keyword matching."""
+    return "\n".join(_strings(resume_data.model_dump()))
+
+def format_issues(resume_data: ResumeData) -> List[str]:
+    """Structural gaps that make a resume harder for an ATS to parse or rank."""
+    issues = []
+    info = resume_data.basic_information
+    if not info.email:
+        issues.append("No email address was found.")
+    if not info.phone:
+        issues.append("No phone number was found.")
+    if not resume_data.skills:
+        issues.append("No dedicated skills section was found.")
+    if not resume_data.experience:
+        issues.append("No work experience entries were found.")
+    elif any(not (entry.dates or entry.start_date) for entry in resume_data.experience):
+        issues.append("Some experience entries have no dates.")
+    if not resume_data.education:
+        issues.append("No education entries were found.")
+    return issues
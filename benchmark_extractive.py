@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+from collections import Counter
+
+from extractive import extract_top_sentences, resolve_keep_ratio, tokenize, SCORING_METHODS
+from normal import GeneralDocumentSummarizer
+from token_utils import estimate_tokens
+
+def ngrams(tokens, n):
+    """Count the n-grams of a token list."""
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+def rouge_n(candidate, reference, n):
+    """ROUGE-N precision, recall and F1 between two texts."""
+    candidate_ngrams = ngrams(tokenize(candidate), n)
+    reference_ngrams = ngrams(tokenize(reference), n)
+    overlap = sum((candidate_ngrams & reference_ngrams).values())
+    precision = overlap / max(sum(candidate_ngrams.values()), 1)
+    recall = overlap / max(sum(reference_ngrams.values()), 1)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+def rouge_l(candidate, reference):
+    """ROUGE-L F1 from the longest common subsequence of two (short) texts."""
+    a, b = tokenize(candidate), tokenize(reference)
+    if not a or not b:
+        return 0.0
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    precision, recall = lcs / len(a), lcs / len(b)
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+def benchmark_local(summarizer, path, keep_ratio, method):
+    """Measure the extractive stage alone: latency, token reduction and coverage of the full text."""
+    text = summarizer.load_document(path)
+    start = time.perf_counter()
+    selection = extract_top_sentences(text, keep_ratio, method=method)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    reduction = 1 - selection.tokens_after / max(selection.tokens_before, 1)
+    print(f"Sentences kept:      {selection.kept_sentences}/{selection.total_sentences}")
+    print(f"Tokens:              {selection.tokens_before} -> {selection.tokens_after} ({reduction:.0%} fewer)")
+    print(f"Extraction latency:  {elapsed_ms:.1f} ms")
+    print(f"ROUGE-1 recall:      {rouge_n(selection.text, text, 1)[1]:.3f} (of full text)")
+    print(f"ROUGE-2 recall:      {rouge_n(selection.text, text, 2)[1]:.3f} (of full text)")
+
+def benchmark_llm(summarizer, path, keep_ratio, conciseness):
+    """Summarize with and without the pre-filter and compare latency, tokens and overlap."""
+    settings = {"conciseness": conciseness}
+    baseline = summarizer.summarize_document(path, settings)
+    filtered = summarizer.summarize_document(path, {
+        **settings,
+        "extractive_prefilter": True,
+        "extractive_keep_ratio": keep_ratio
+    })
+
+    baseline_text = f"{baseline.executive_summary}\n{baseline.detailed_summary or ''}"
+    filtered_text = f"{filtered.executive_summary}\n{filtered.detailed_summary or ''}"
+    print(f"Baseline latency:    {baseline.processing_time:.2f} s")
+    print(f"Pre-filter latency:  {filtered.processing_time:.2f} s")
+    if baseline.section_plan and filtered.section_plan:
+        print(f"Planned input tokens: {baseline.section_plan.estimated_input_tokens} -> "
+              f"{filtered.section_plan.estimated_input_tokens}")
+    print(f"Summary tokens:      {estimate_tokens(baseline_text)} -> {estimate_tokens(filtered_text)}")
+    print(f"ROUGE-1 F1:          {rouge_n(filtered_text, baseline_text, 1)[2]:.3f} (vs baseline summary)")
+    print(f"ROUGE-2 F1:          {rouge_n(filtered_text, baseline_text, 2)[2]:.3f} (vs baseline summary)")
+    print(f"ROUGE-L F1:          {rouge_l(filtered_text, baseline_text):.3f} (vs baseline summary)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the extractive pre-filter against the full-text baseline')
+    parser.add_argument('documents', nargs='+', help='Paths to PDF, DOCX or TXT documents')
+    parser.add_argument('--keep-ratio', type=float, default=None, help='Share of sentences to keep (default: from conciseness)')
+    parser.add_argument('--conciseness', type=str, default='balanced', help='Conciseness level used for the keep ratio and summaries')
+    parser.add_argument('--method', type=str, default='textrank', choices=SCORING_METHODS, help='Sentence scoring method')
+    parser.add_argument('--llm', action='store_true', help='Also run full summaries with and without the pre-filter (uses the OpenAI API)')
+
+    args = parser.parse_args()
+    keep_ratio = resolve_keep_ratio(args.keep_ratio, args.conciseness)
+    summarizer = GeneralDocumentSummarizer()
+
+    for document_path in args.documents:
+        if not os.path.exists(document_path):
+            print(f"Error: File {document_path} does not exist")
+            continue
+
+        print("\n" + "="*50)
+        print(f"{os.path.basename(document_path)} (keep ratio {keep_ratio:.2f}, {args.method})")
+        print("="*50)
+        benchmark_local(summarizer, document_path, keep_ratio, args.method)
+        if args.llm:
+            benchmark_llm(summarizer, document_path, keep_ratio, args.conciseness)
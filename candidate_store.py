@@ -0,0 +1,299 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+import duckdb
+
+from resume_models import CandidateMatch, CandidateQuery, Experience, ResumeData, SkillCategory
+from resume_dedup import RESUME_DUPLICATE_THRESHOLD, ResumeFingerprint, resume_similarity, same_candidate
+from skill_taxonomy import default_skill_taxonomy
+
+# Location of the candidate database
+CANDIDATE_STORE_PATH = os.getenv(
+    "CANDIDATE_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "ultimate_summarization_candidates.duckdb")
+)
+
+MONTH_NAMES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+CURRENT_PATTERN = re.compile(r'\b(?:present|current|now|today|ongoing)\b', re.IGNORECASE)
+DATE_RANGE_SPLIT_PATTERN = re.compile(r'\s+(?:-|–|—|to|until)\s+|\s*[–—]\s*', re.IGNORECASE)
+MONTH_YEAR_PATTERN = re.compile(r'\b([a-z]{3})[a-z]*\.?\s*,?\s*(\d{4})\b', re.IGNORECASE)
+NUMERIC_MONTH_YEAR_PATTERN = re.compile(r'\b(?:(\d{4})[-/.](\d{1,2})|(\d{1,2})[-/.](\d{4}))\b')
+YEAR_PATTERN = re.compile(r'\b(19\d{2}|20\d{2})\b')
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS candidates (
+        candidate_id VARCHAR PRIMARY KEY, name VARCHAR, email VARCHAR, phone VARCHAR, location VARCHAR,
+        professional_summary VARCHAR, experience_years DOUBLE, source VARCHAR, updated_at TIMESTAMP,
+        resume_json JSON)""",
+    """CREATE TABLE IF NOT EXISTS candidate_skills (
+        candidate_id VARCHAR, skill VARCHAR, category VARCHAR, proficiency VARCHAR, origin VARCHAR)""",
+    """CREATE TABLE IF NOT EXISTS candidate_experience (
+        candidate_id VARCHAR, company VARCHAR, title VARCHAR, start_month DATE, end_month DATE,
+        is_current BOOLEAN, years DOUBLE, location VARCHAR)""",
+    """CREATE TABLE IF NOT EXISTS candidate_education (
+        candidate_id VARCHAR, degree VARCHAR, institution VARCHAR, major VARCHAR, end_year INTEGER)""",
+    """CREATE TABLE IF NOT EXISTS candidate_certifications (
+        candidate_id VARCHAR, name VARCHAR, issuer VARCHAR, issued VARCHAR)""",
+    """CREATE TABLE IF NOT EXISTS candidate_fingerprints (
+        candidate_id VARCHAR, email VARCHAR, phone VARCHAR, name VARCHAR, signature UBIGINT[])""",
+    """CREATE TABLE IF NOT EXISTS candidate_fingerprint_bands (candidate_id VARCHAR, band_key BIGINT)""",
+    "CREATE INDEX IF NOT EXISTS candidate_skills_skill ON candidate_skills (skill)",
+    "CREATE INDEX IF NOT EXISTS candidate_skills_candidate ON candidate_skills (candidate_id)",
+    "CREATE INDEX IF NOT EXISTS candidate_experience_candidate ON candidate_experience (candidate_id)",
+    "CREATE INDEX IF NOT EXISTS candidate_education_candidate ON candidate_education (candidate_id)",
+    "CREATE INDEX IF NOT EXISTS candidate_certifications_candidate ON candidate_certifications (candidate_id)",
+    "CREATE INDEX IF NOT EXISTS candidates_experience_years ON candidates (experience_years)",
+    "CREATE INDEX IF NOT EXISTS candidate_fingerprints_candidate ON candidate_fingerprints (candidate_id)",
+    "CREATE INDEX IF NOT EXISTS candidate_fingerprints_email ON candidate_fingerprints (email)",
+    "CREATE INDEX IF NOT EXISTS candidate_fingerprints_phone ON candidate_fingerprints (phone)",
+    "CREATE INDEX IF NOT EXISTS candidate_fingerprint_bands_key ON candidate_fingerprint_bands (band_key)"
+]
+CHILD_TABLES = ["candidate_skills", "candidate_experience", "candidate_education", "candidate_certifications",
+                "candidate_fingerprints", "candidate_fingerprint_bands"]
+
+def normalize_skill(skill: str) -> str:
+    """Resolve a skill name through the taxonomy and lowercase it, so spellings of one skill share a row value."""
+    return " ".join(default_skill_taxonomy().normalize(skill).lower().split())
+
+def parse_month(value: Optional[str]) -> Optional[date]:
+    """First day of the month named in a resume date ("Jan 2020", "2020-01", "01/2020", "2020"), if any."""
+    if not value:
+        return None
+    if CURRENT_PATTERN.search(value):
+        today = date.today()
+        return date(today.year, today.month, 1)
+    match = MONTH_YEAR_PATTERN.search(value)
+    if match and match.group(1).lower() in MONTH_NAMES:
+        return date(int(match.group(2)), MONTH_NAMES[match.group(1).lower()], 1)
+    match = NUMERIC_MONTH_YEAR_PATTERN.search(value)
+    if match:
+        year, month = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        if 1 <= int(month) <= 12:
+            return date(int(year), int(month), 1)
+    match = YEAR_PATTERN.search(value)
+    return date(int(match.group(1)), 1, 1) if match else None
+
+def experience_period(entry: Experience) -> Tuple[Optional[date], Optional[date]]:
+    """Start and end month of an experience entry, from its start/end dates or its date range."""
+    start, end = entry.start_date, entry.end_date
+    if entry.dates and not (start and end):
+        parts = DATE_RANGE_SPLIT_PATTERN.split(entry.dates.strip(), maxsplit=1)
+        start = start or parts[0]
+        end = end or (parts[1] if len(parts) > 1 else None)
+    start_month = parse_month(start)
+    end_month = parse_month(end) or (parse_month("present") if entry.current else None)
+    if start_month and end_month and end_month < start_month:
+        return None, None
+    return start_month, end_month
+
+def total_experience_years(experience: List[Experience]) -> float:
+    """Years covered by the experience entries, counting overlapping periods once."""
+    periods = sorted(
+        (start, end) for start, end in (experience_period(entry) for entry in experience) if start and end
+    )
+    months = 0
+    covered_until = None
+    for start, end in periods:
+        start_index = start.year * 12 + start.month - 1
+        end_index = end.year * 12 + end.month  # The end month counts as worked
+        if covered_until is not None:
+            start_index = max(start_index, covered_until)
+        months += max(0, end_index - start_index)
+        covered_until = max(covered_until or end_index, end_index)
+    return round(months / 12, 1)
+
+def candidate_id(resume_data: ResumeData) -> str:
+    """Stable id of a candidate: from the email when known, so re-uploads update one row."""
+    info = resume_data.basic_information
+    key = (info.email or "").strip().lower() or resume_data.model_dump_json()
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def _skill_rows(resume_data: ResumeData) -> List[Tuple[str, Optional[str], Optional[str], str]]:
+    """(skill, category, proficiency, origin) of every skill and technology in a resume."""
+    rows = []
+    for skill in resume_data.skills:
+        if isinstance(skill, SkillCategory):
+            rows.extend((name, skill.category, None, "skills") for name in skill.skills)
+        elif isinstance(skill, dict) and "name" in skill:
+            rows.append((skill["name"], skill.get("category"), skill.get("proficiency"), "skills"))
+        elif isinstance(skill, dict) and "skills" in skill:
+            rows.extend((name, skill.get("category"), None, "skills") for name in skill["skills"])
+        elif isinstance(skill, dict) and all(isinstance(names, list) for names in skill.values()):
+            rows.extend((name, category, None, "skills") for category, names in skill.items() for name in names)
+        elif isinstance(skill, str):
+            rows.append((skill, None, None, "skills"))
+    for entry in resume_data.experience:
+        rows.extend((name, "Technology", None, "experience") for name in entry.technologies or [])
+    for project in resume_data.projects:
+        rows.extend((name, "Technology", None, "project") for name in project.technologies or [])
+
+    taxonomy = default_skill_taxonomy()
+    unique = {}
+    for name, category, proficiency, origin in rows:
+        if isinstance(name, str) and name.strip():
+            # Known skills get their taxonomy category
+            category = taxonomy.categories.get(taxonomy.normalize(name)) or category
+            unique.setdefault(normalize_skill(name), (normalize_skill(name), category, proficiency, origin))
+    return list(unique.values())
+
+class CandidateStore:
+    """
+    DuckDB store of parsed resumes, flattened into candidate, skill, experience, education
+    and certification tables so candidates can be filtered and ranked without the LLM.
+    """
+
+    def __init__(self, path: str = CANDIDATE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = duckdb.connect(path)
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+
+    def add(self, resume_data: ResumeData, source: Optional[str] = None,
+            fingerprint: Optional[ResumeFingerprint] = None, replace_id: Optional[str] = None) -> str:
+        """
+        Store (or replace) a parsed resume; returns the candidate id. With the fingerprint of
+        the resume text, later copies of the resume can be found with find_duplicate.
+        replace_id stores it under an existing candidate's id instead, replacing that
+        candidate's rows (e.g. with an updated resume found by find_candidate).
+        """
+        cid = replace_id or candidate_id(resume_data)
+        info = resume_data.basic_information
+        candidate_row = [cid, info.name, info.email, info.phone, info.location, resume_data.professional_summary,
+                         total_experience_years(resume_data.experience), source, datetime.now(),
+                         resume_data.model_dump_json()]
+        skill_rows = [(cid, *row) for row in _skill_rows(resume_data)]
+        experience_rows = []
+        for entry in resume_data.experience:
+            start, end = experience_period(entry)
+            experience_rows.append((cid, entry.company, entry.title, start, end, bool(entry.current),
+                                    total_experience_years([entry]), entry.location))
+        education_rows = []
+        for entry in resume_data.education:
+            # The last year named in the dates is the graduation year
+            years = YEAR_PATTERN.findall(entry.end_date or entry.dates or "")
+            education_rows.append((cid, entry.degree, entry.institution, entry.major, int(years[-1]) if years else None))
+        certification_rows = [(cid, entry.name, entry.issuer, entry.date) for entry in resume_data.certifications_licenses]
+        fingerprint_rows, band_rows = [], []
+        if fingerprint is not None:
+            fingerprint_rows = [(cid, fingerprint.email, fingerprint.phone, fingerprint.name, fingerprint.signature)]
+            band_rows = [(cid, key) for key in fingerprint.band_keys()]
+
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                if cursor.execute("SELECT 1 FROM candidates WHERE candidate_id = ?", [cid]).fetchone():
+                    for table in CHILD_TABLES + ["candidates"]:
+                        cursor.execute(f"DELETE FROM {table} WHERE candidate_id = ?", [cid])
+                cursor.execute("INSERT INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", candidate_row)
+                for table, rows in zip(CHILD_TABLES, [skill_rows, experience_rows, education_rows, certification_rows,
+                                                      fingerprint_rows, band_rows]):
+                    if rows:
+                        placeholders = ", ".join("?" for _ in rows[0])
+                        cursor.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return cid
+
+    def count(self) -> int:
+        """Number of stored candidates."""
+        with self._lock:
+            return self._connection.cursor().execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def get(self, cid: str) -> Optional[ResumeData]:
+        """The parsed resume of a stored candidate."""
+        with self._lock:
+            row = self._connection.cursor().execute(
+                "SELECT resume_json FROM candidates WHERE candidate_id = ?", [cid]
+            ).fetchone()
+        return ResumeData.model_validate_json(row[0]) if row else None
+
+    def find_duplicate(self, fingerprint: ResumeFingerprint,
+                       threshold: float = RESUME_DUPLICATE_THRESHOLD) -> Optional[str]:
+        """Id of a stored candidate whose resume is a near-identical copy of the fingerprinted one, if any."""
+        match = self.find_candidate(fingerprint)
+        return match[0] if match is not None and match[1] >= threshold else None
+
+    def find_candidate(self, fingerprint: ResumeFingerprint) -> Optional[Tuple[str, float]]:
+        """
+        Id of the stored candidate the fingerprinted resume is from (same email or phone
+        number, or near-identical text), the most similar first, and the estimated
+        similarity of the two texts; None if there is none.
+        """
+        keys = fingerprint.band_keys()
+        placeholders = ", ".join("?" for _ in keys)
+        with self._lock:
+            rows = self._connection.cursor().execute(
+                f"""SELECT candidate_id, email, phone, name, signature FROM candidate_fingerprints
+                    WHERE email = ? OR phone = ? OR candidate_id IN
+                        (SELECT candidate_id FROM candidate_fingerprint_bands WHERE band_key IN ({placeholders}))""",
+                [fingerprint.email, fingerprint.phone] + keys
+            ).fetchall()
+
+        stored = [(row[0], ResumeFingerprint(email=row[1], phone=row[2], name=row[3], signature=row[4])) for row in rows]
+        matches = [(resume_similarity(fingerprint, other), cid) for cid, other in stored if same_candidate(fingerprint, other)]
+        if not matches:
+            return None
+        similarity, cid = max(matches)
+        return cid, similarity
+
+    def search(self, query: CandidateQuery) -> Tuple[List[CandidateMatch], float]:
+        """
+        Candidates matching the query, ranked by matched skills then years of experience.
+        Returns the matches and the query time in milliseconds.
+        """
+        skills = sorted({normalize_skill(skill) for skill in query.skills if skill.strip()})
+        conditions, parameters = [], []
+        if query.min_years is not None:
+            conditions.append("c.experience_years >= ?")
+            parameters.append(query.min_years)
+        if query.location:
+            conditions.append("c.location ILIKE ?")
+            parameters.append(f"%{query.location}%")
+        if query.title:
+            conditions.append("EXISTS (SELECT 1 FROM candidate_experience e WHERE e.candidate_id = c.candidate_id AND e.title ILIKE ?)")
+            parameters.append(f"%{query.title}%")
+        if query.degree:
+            conditions.append("EXISTS (SELECT 1 FROM candidate_education d WHERE d.candidate_id = c.candidate_id "
+                              "AND (d.degree ILIKE ? OR d.major ILIKE ?))")
+            parameters.extend([f"%{query.degree}%", f"%{query.degree}%"])
+        if query.certification:
+            conditions.append("EXISTS (SELECT 1 FROM candidate_certifications x WHERE x.candidate_id = c.candidate_id "
+                              "AND x.name ILIKE ?)")
+            parameters.append(f"%{query.certification}%")
+
+        skill_placeholders = ", ".join("?" for _ in skills)
+        matched = (f"(SELECT list(DISTINCT s.skill ORDER BY s.skill) FROM candidate_skills s "
+                   f"WHERE s.candidate_id = c.candidate_id AND s.skill IN ({skill_placeholders}))") if skills else "[]"
+        where = " AND ".join(conditions) or "TRUE"
+        sql = f"""
+            SELECT candidate_id, name, email, location, experience_years, source, matched_skills
+            FROM (SELECT c.*, {matched} AS matched_skills FROM candidates c WHERE {where})
+            WHERE len(coalesce(matched_skills, [])) >= ?
+            ORDER BY len(coalesce(matched_skills, [])) DESC, experience_years DESC, candidate_id
+            LIMIT ?
+        """
+        required = len(skills) if query.match_all else min(1, len(skills))
+        start = time.perf_counter()
+        with self._lock:
+            rows = self._connection.cursor().execute(sql, skills + parameters + [required, query.limit]).fetchall()
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        matches = [
+            CandidateMatch(candidate_id=row[0], name=row[1], email=row[2], location=row[3],
+                           experience_years=row[4], source=row[5], matched_skills=list(row[6] or []))
+            for row in rows
+        ]
+        return matches, elapsed_ms
@@ -0,0 +1,79 @@
+import re
+from typing import List
+
+from pydantic import BaseModel
+
+from token_utils import estimate_tokens
+from versioning import content_defined_chunks
+
+# Clauses shorter than this are merged into the next one (a bare heading, a one-line definition)
+MIN_CLAUSE_TOKENS = 40
+# Longer clauses are split with content-defined boundaries so their parts stay reusable
+MAX_CLAUSE_TOKENS = 1000
+
+# "Section 12", "ARTICLE IV", "Clause 3.2"
+LABELED_HEADING_PATTERN = re.compile(r'^(?:section|article|clause)\s+[0-9ivxlc]+(?:\.\d+)*\b', re.IGNORECASE)
+# "12. Governing Law", "12.1 The parties", "4) Term"
+NUMBERED_HEADING_PATTERN = re.compile(r'^(?:\d+[.)]|\d+(?:\.\d+)+\.?)\s+[A-Z]')
+# "GOVERNING LAW", "LIMITATION OF LIABILITY"
+CAPITALIZED_HEADING_PATTERN = re.compile(r'^[A-Z][A-Z0-9 ,;&\'\-]{3,80}$')
+MAX_CAPITALIZED_HEADING_WORDS = 8
+
+# Leading numbering that differs between contracts sharing a clause
+CLAUSE_NUMBERING_PATTERN = re.compile(
+    r'^\s*(?:(?:section|article|clause)\s+[0-9ivxlc]+(?:\.\d+)*|\d+(?:\.\d+)*|\(?[a-z0-9]{1,3}\))[.:)]?\s+',
+    re.IGNORECASE | re.MULTILINE
+)
+NON_WORD_PATTERN = re.compile(r'[^a-z0-9]+')
+
+class ClauseReuse(BaseModel):
+    """How many clauses of a document were summarized before, in this or another document."""
+    total_clauses: int
+    distinct_clauses: int = 0
+    reused_clauses: int = 0  # Distinct clauses whose summary was already in the index
+    new_clauses: int = 0  # Distinct clauses sent to the LLM
+    repeated_clauses: int = 0  # Occurrences of a clause already seen earlier in the document
+    hit_rate: float = 0.0  # Share of the distinct clauses served from the index
+
+def is_clause_heading(line: str) -> bool:
+    """True for a line that starts a new clause: a labeled, numbered or capitalized heading."""
+    if LABELED_HEADING_PATTERN.match(line) or NUMBERED_HEADING_PATTERN.match(line):
+        return True
+    return bool(CAPITALIZED_HEADING_PATTERN.match(line)) and len(line.split()) <= MAX_CAPITALIZED_HEADING_WORDS
+
+def segment_clauses(text: str, min_tokens: int = MIN_CLAUSE_TOKENS,
+                    max_tokens: int = MAX_CLAUSE_TOKENS) -> List[str]:
+    """
+    Split a legal document into clauses at section headings.
+
+    Fragments below min_tokens are merged into the following clause, and clauses above
+    max_tokens are cut at content-defined boundaries, so the same clause text yields the
+    same pieces wherever it appears.
+    """
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+
+    clauses = []
+    current = []
+    for line in lines:
+        if current and is_clause_heading(line) and estimate_tokens("\n".join(current)) >= min_tokens:
+            clauses.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        clauses.append("\n".join(current))
+
+    pieces = []
+    for clause in clauses:
+        if estimate_tokens(clause) > max_tokens:
+            pieces.extend(content_defined_chunks(clause, max_tokens))
+        else:
+            pieces.append(clause)
+    return pieces
+
+def normalize_clause(clause: str) -> str:
+    """
+    Canonical form of a clause for fingerprinting: without its numbering, case,
+    punctuation and layout, so a clause copied between contracts keeps its fingerprint.
+    """
+    text = CLAUSE_NUMBERING_PATTERN.sub("", clause.lower())
+    return NON_WORD_PATTERN.sub(" ", text).strip()
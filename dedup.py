@@ -0,0 +1,99 @@
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+SHINGLE_SIZE = 5  # Words per shingle
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates
+DEFAULT_SIMILARITY_THRESHOLD = 0.85
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+HASH_SEED = 1729
+
+SHINGLE_WORD_PATTERN = re.compile(r'\w+')
+
+_rng = np.random.default_rng(HASH_SEED)
+# Coefficients below 2**32 keep a * hash + b inside uint64 for 32-bit shingle hashes
+_PERMUTATION_A = _rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+class DuplicateGroups(BaseModel):
+    """Near-duplicate clusters over a list of texts."""
+    representative_of: List[int] = Field(default_factory=list)  # For each text, the index of its cluster representative
+    threshold: float = DEFAULT_SIMILARITY_THRESHOLD
+
+    @property
+    def representatives(self) -> List[int]:
+        """Indices of the texts that stand for their cluster, in order."""
+        return [i for i, representative in enumerate(self.representative_of) if i == representative]
+
+    @property
+    def duplicates_removed(self) -> int:
+        """Number of texts that can reuse another text's result."""
+        return len(self.representative_of) - len(self.representatives)
+
+    def cluster_sizes(self) -> Dict[int, int]:
+        """Map each representative to the number of texts in its cluster."""
+        sizes = {}
+        for representative in self.representative_of:
+            sizes[representative] = sizes.get(representative, 0) + 1
+        return sizes
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Hash the word shingles of a normalized text to 32-bit integers."""
+    words = SHINGLE_WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of a text: the minimum of each hash permutation over its shingles."""
+    hashes = shingle_hashes(text)
+    permuted = (_PERMUTATION_A[:, None] * hashes[None, :] + _PERMUTATION_B[:, None]) % MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+def minhash_signatures(texts: List[str]) -> np.ndarray:
+    """Stack the MinHash signatures of several texts into a (texts x permutations) array."""
+    if not texts:
+        return np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint64)
+    return np.vstack([minhash_signature(text) for text in texts])
+
+def candidate_pairs(signatures: np.ndarray) -> List[Tuple[int, int]]:
+    """Locality-sensitive hashing: texts sharing any band of their signature are candidates."""
+    rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+    pairs = set()
+    for band in range(LSH_BANDS):
+        buckets = {}
+        band_rows = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i, key in enumerate(map(bytes, band_rows)):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pairs.add((members[a], members[b]))
+    return sorted(pairs)
+
+def find_near_duplicates(texts: List[str], threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> DuplicateGroups:
+    """
+    Group texts whose estimated Jaccard similarity is at least the threshold.
+
+    Each text points at the earliest text of its group, so summaries computed for
+    representatives can be reused for every later duplicate.
+    """
+    signatures = minhash_signatures(texts)
+    representative_of = list(range(len(texts)))
+
+    for first, second in candidate_pairs(signatures):
+        if representative_of[second] != second:
+            continue
+        representative = representative_of[first]
+        similarity = float(np.mean(signatures[representative] == signatures[second]))
+        if similarity >= threshold:
+            representative_of[second] = representative
+
+    return DuplicateGroups(representative_of=representative_of, threshold=threshold)
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from pydantic import BaseModel, Field
+
+from extractive import tokenize
+
+# Trained model location; without a trained model the keyword-seeded model is used
+DOCUMENT_CLASSIFIER_PATH = os.getenv(
+    "DOCUMENT_CLASSIFIER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "document_type_classifier.npz")
+)
+
+CLASSIFIER_INPUT_CHARS = 5000  # Same opening text the LLM classifier saw
+DEFAULT_CONFIDENCE_THRESHOLD = 0.6  # Below this, the caller should ask the LLM
+MIN_DOCUMENT_FREQUENCY = 2
+MAX_FEATURES = 20000
+TRAINING_ITERATIONS = 300
+LEARNING_RATE = 2.0
+L2_PENALTY = 1e-3
+SEED_TERM_WEIGHT = 1.0  # Logit added per (log) occurrence of a keyword in the seeded model
+DEFAULT_TEST_SIZE = 0.2
+SPLIT_SEED = 42
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+# Indicative terms (unigrams, or stop-word-free bigrams) for the keyword-seeded model
+SEED_KEYWORDS = {
+    "Non-Disclosure Agreement": ["non-disclosure", "nondisclosure", "confidential information",
+                                 "disclosing party", "receiving party", "confidentiality"],
+    "Employment Agreement": ["employment agreement", "employee", "employer", "salary",
+                             "employment", "probationary period"],
+    "Lease Agreement": ["lease", "landlord", "tenant", "premises", "rent", "security deposit"],
+    "Loan Agreement": ["loan agreement", "borrower", "lender", "principal amount", "interest rate", "repayment"],
+    "Service Agreement": ["service agreement", "services agreement", "statement work", "deliverables",
+                          "service provider", "service levels"],
+    "Terms of Service": ["terms service", "terms use", "user account", "users", "website", "acceptable use"],
+    "Privacy Policy": ["privacy policy", "personal data", "personal information", "cookies",
+                       "data protection", "data controller"],
+    "Patent Application": ["patent", "invention", "embodiment", "prior art", "claims", "inventor"],
+    "Court Filing": ["plaintiff", "defendant", "court", "motion", "petitioner", "hereby ordered"],
+    "Power of Attorney": ["power attorney", "attorney-in-fact", "attorney fact", "principal", "agent"],
+    "Last Will and Testament": ["last will", "testament", "executor", "bequeath", "testator", "beneficiaries"],
+    "Contract": ["agreement", "parties", "hereto", "witness whereof", "obligations", "term"],
+}
+SEED_GENERIC_WEIGHT = 0.5  # "Contract" is the catch-all label, so its keywords count less
+
+class DocumentTypePrediction(BaseModel):
+    """Predicted document type with its probability and where the answer came from."""
+    label: str
+    confidence: float
+    source: str = "classifier"  # "classifier" or "llm"
+    scores: Dict[str, float] = Field(default_factory=dict)  # Top label probabilities
+    latency_ms: float = 0.0
+
+class ClassifierEvaluation(BaseModel):
+    """Accuracy of the classifier on held-out documents."""
+    documents: int
+    accuracy: float
+    confident_share: float  # Share of documents answered without the LLM fallback
+    confident_accuracy: float  # Accuracy on those documents
+    per_label_accuracy: Dict[str, float] = Field(default_factory=dict)
+    mean_latency_ms: float = 0.0
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax."""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(logits)
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+def document_terms(text: str) -> List[str]:
+    """Unigrams and adjacent bigrams of the content words of the opening text."""
+    words = tokenize(text[:CLASSIFIER_INPUT_CHARS])
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+class DocumentTypeClassifier:
+    """
+    Multinomial logistic regression over TF-IDF unigram and bigram features of the
+    opening text of a document.
+
+    The default model is seeded from keyword lists; train() fits the weights on labeled
+    documents instead. Prediction is a sparse dot product and takes well under a millisecond.
+    """
+
+    def __init__(self, labels: List[str], vocabulary: Dict[str, int], idf: np.ndarray,
+                 weights: np.ndarray, bias: np.ndarray, metadata: Optional[Dict] = None):
+        self.labels = labels
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights  # features x labels
+        self.bias = bias
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_keywords(cls, keywords: Dict[str, List[str]] = SEED_KEYWORDS) -> "DocumentTypeClassifier":
+        """Build an untrained model whose weights are the indicative terms of each label."""
+        labels = list(keywords)
+        vocabulary = {}
+        for terms in keywords.values():
+            for term in terms:
+                vocabulary.setdefault(term, len(vocabulary))
+        weights = np.zeros((len(vocabulary), len(labels)))
+        for column, (label, terms) in enumerate(keywords.items()):
+            weight = SEED_GENERIC_WEIGHT if label == "Contract" else 1.0
+            for term in terms:
+                weights[vocabulary[term], column] = weight * SEED_TERM_WEIGHT
+        # Unnormalized features: confidence grows with the amount of keyword evidence,
+        # so a single stray keyword stays below the LLM fallback threshold
+        return cls(labels, vocabulary, np.ones(len(vocabulary)), weights, np.zeros(len(labels)),
+                   {"source": "keywords", "normalize": False})
+
+    @classmethod
+    def load(cls, path: str = DOCUMENT_CLASSIFIER_PATH) -> "DocumentTypeClassifier":
+        """Load a trained model, or return the keyword-seeded model if none was saved."""
+        if not os.path.exists(path):
+            return cls.from_keywords()
+        data = np.load(path, allow_pickle=False)
+        terms = [str(term) for term in data["terms"]]
+        return cls(
+            labels=[str(label) for label in data["labels"]],
+            vocabulary={term: i for i, term in enumerate(terms)},
+            idf=data["idf"],
+            weights=data["weights"],
+            bias=data["bias"],
+            metadata=json.loads(str(data["metadata"]))
+        )
+
+    def save(self, path: str = DOCUMENT_CLASSIFIER_PATH) -> None:
+        """Save the model as a compressed NumPy archive."""
+        terms = [None] * len(self.vocabulary)
+        for term, index in self.vocabulary.items():
+            terms[index] = term
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            terms=np.array(terms),
+            idf=self.idf,
+            weights=self.weights,
+            bias=self.bias,
+            metadata=np.array(json.dumps(self.metadata))
+        )
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature indices and log TF-IDF values of one document, L2-normalized unless disabled."""
+        counts = Counter(term for term in document_terms(text) if term in self.vocabulary)
+        indices = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+        values = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[indices]
+        if self.metadata.get("normalize", True) and len(values):
+            values /= np.sqrt(values @ values)
+        return indices, values
+
+    def features(self, texts: List[str]) -> sparse.csr_matrix:
+        """Sparse document x feature matrix of log TF-IDF features."""
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            indices, weights = self._vectorize(text)
+            rows.extend([row] * len(indices))
+            cols.extend(indices.tolist())
+            values.extend(weights.tolist())
+        return sparse.csr_matrix((values, (rows, cols)), shape=(len(texts), len(self.vocabulary)))
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Label probabilities for each document."""
+        return _softmax(np.asarray(self.features(texts) @ self.weights) + self.bias)
+
+    def classify(self, text: str, top_n: int = 3) -> DocumentTypePrediction:
+        """Predict the type of one document."""
+        start = time.perf_counter()
+        # Dense fast path for a single document: only the rows of the terms it contains
+        indices, values = self._vectorize(text)
+        probabilities = _softmax((values @ self.weights[indices] + self.bias)[None, :])[0]
+        order = np.argsort(-probabilities)
+        return DocumentTypePrediction(
+            label=self.labels[order[0]],
+            confidence=round(float(probabilities[order[0]]), 3),
+            scores={self.labels[i]: round(float(probabilities[i]), 3) for i in order[:top_n]},
+            latency_ms=round((time.perf_counter() - start) * 1000, 3)
+        )
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str]) -> "DocumentTypeClassifier":
+        """Fit the vocabulary, IDF weights and a softmax regression on labeled documents."""
+        label_names = sorted(set(labels))
+        document_frequency = Counter()
+        for text in texts:
+            document_frequency.update(set(document_terms(text)))
+        terms = [term for term, frequency in document_frequency.most_common(MAX_FEATURES)
+                 if frequency >= MIN_DOCUMENT_FREQUENCY]
+        vocabulary = {term: i for i, term in enumerate(terms)}
+        idf = np.array([np.log((1.0 + len(texts)) / (1.0 + document_frequency[term])) + 1.0 for term in terms])
+
+        model = cls(label_names, vocabulary, idf, np.zeros((len(terms), len(label_names))),
+                    np.zeros(len(label_names)), {"source": "trained", "documents": len(texts)})
+        x = model.features(texts)
+        y = np.zeros((len(texts), len(label_names)))
+        y[np.arange(len(texts)), [label_names.index(label) for label in labels]] = 1.0
+
+        # Full-batch gradient descent on the L2-regularized cross-entropy
+        for _ in range(TRAINING_ITERATIONS):
+            probabilities = _softmax(np.asarray(x @ model.weights) + model.bias)
+            error = (probabilities - y) / len(texts)
+            model.weights -= LEARNING_RATE * (np.asarray(x.T @ error) + L2_PENALTY * model.weights)
+            model.bias -= LEARNING_RATE * error.sum(axis=0)
+        return model
+
+    def evaluate(self, texts: List[str], labels: List[str],
+                 threshold: float = DEFAULT_CONFIDENCE_THRESHOLD) -> ClassifierEvaluation:
+        """Accuracy overall, per label and on the documents confident enough to skip the LLM."""
+        predictions = [self.classify(text) for text in texts]
+        correct = [prediction.label == label for prediction, label in zip(predictions, labels)]
+        confident = [prediction.confidence >= threshold for prediction in predictions]
+        per_label = {}
+        for label in sorted(set(labels)):
+            hits = [ok for ok, truth in zip(correct, labels) if truth == label]
+            per_label[label] = round(sum(hits) / len(hits), 3)
+        confident_hits = [ok for ok, sure in zip(correct, confident) if sure]
+        return ClassifierEvaluation(
+            documents=len(texts),
+            accuracy=round(sum(correct) / max(len(texts), 1), 3),
+            confident_share=round(sum(confident) / max(len(texts), 1), 3),
+            confident_accuracy=round(sum(confident_hits) / max(len(confident_hits), 1), 3),
+            per_label_accuracy=per_label,
+            mean_latency_ms=round(sum(p.latency_ms for p in predictions) / max(len(predictions), 1), 3)
+        )
+
+def read_document(path: str) -> str:
+    """Read the text of a .txt or .pdf file."""
+    if path.lower().endswith(".pdf"):
+        import PyPDF2
+        with open(path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    with open(path, "r", encoding="utf-8", errors="ignore") as file:
+        return file.read()
+
+def load_labeled_folder(folder: str) -> Tuple[List[str], List[str]]:
+    """Read documents from a folder with one subfolder per label (the subfolder name)."""
+    texts, labels = [], []
+    for label in sorted(os.listdir(folder)):
+        label_dir = os.path.join(folder, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                texts.append(read_document(os.path.join(label_dir, name)))
+                labels.append(label)
+    return texts, labels
+
+def split_held_out(texts: List[str], labels: List[str], test_size: float = DEFAULT_TEST_SIZE,
+                   seed: int = SPLIT_SEED) -> Tuple[List[int], List[int]]:
+    """Stratified train/test split of document indices; every label keeps at least one training document."""
+    rng = random.Random(seed)
+    train, test = [], []
+    for label in sorted(set(labels)):
+        indices = [i for i, other in enumerate(labels) if other == label]
+        rng.shuffle(indices)
+        held_out = min(int(round(len(indices) * test_size)), len(indices) - 1)
+        test.extend(indices[:held_out])
+        train.extend(indices[held_out:])
+    return sorted(train), sorted(test)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train or evaluate the local legal document type classifier')
+    parser.add_argument('command', choices=['train', 'evaluate'], help='Train on a labeled folder, or evaluate the saved model on one')
+    parser.add_argument('folder', help='Folder with one subfolder of .txt/.pdf documents per document type')
+    parser.add_argument('--model', type=str, default=DOCUMENT_CLASSIFIER_PATH, help='Model file to write or read')
+    parser.add_argument('--test-size', type=float, default=DEFAULT_TEST_SIZE, help='Share of documents held out for evaluation')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_CONFIDENCE_THRESHOLD, help='Confidence below which the LLM is asked')
+
+    args = parser.parse_args()
+    texts, labels = load_labeled_folder(args.folder)
+    print(f"Loaded {len(texts)} documents with {len(set(labels))} labels.")
+
+    if args.command == 'train':
+        train_indices, test_indices = split_held_out(texts, labels, args.test_size)
+        classifier = DocumentTypeClassifier.train([texts[i] for i in train_indices], [labels[i] for i in train_indices])
+        evaluation = classifier.evaluate([texts[i] for i in test_indices], [labels[i] for i in test_indices], args.threshold)
+        classifier.metadata["held_out"] = evaluation.model_dump()
+        classifier.save(args.model)
+        print(f"Saved model to {args.model}")
+    else:
+        classifier = DocumentTypeClassifier.load(args.model)
+        evaluation = classifier.evaluate(texts, labels, args.threshold)
+
+    print(json.dumps(evaluation.model_dump(), indent=2))
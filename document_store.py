@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from retrieval import BM25Index
+from versioning import WHITESPACE_PATTERN
+
+# Location of the stored documents and how many are kept on disk and open in memory
+DOCUMENT_STORE_DIR = os.getenv(
+    "DOCUMENT_STORE_DIR",
+    os.path.join(tempfile.gettempdir(), "ultimate_summarization_documents")
+)
+DOCUMENT_STORE_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "200"))
+DOCUMENT_STORE_MAX_OPEN = 16
+DOCUMENT_ID_LENGTH = 16
+DOCUMENT_ID_PATTERN = re.compile(rf'^[0-9a-f]{{{DOCUMENT_ID_LENGTH}}}$')
+CHUNK_SUMMARIES_FILE = "chunk_summaries.json"
+
+def document_id(text: str) -> str:
+    """Stable id of a document's text: re-uploading the same file gives the same id."""
+    normalized = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:DOCUMENT_ID_LENGTH]
+
+class ChunkSummaryReuse(BaseModel):
+    """How many chunk summaries of a document were kept from an earlier run on the same document."""
+    document_id: str
+    reused_summaries: int = 0  # Distinct chunks whose summary was stored under the document
+    new_summaries: int = 0  # Distinct chunks sent to the LLM
+
+class StoredDocument:
+    """Chunks, retrieval index and computed metadata (type, facts, summary) of one document."""
+
+    def __init__(self, document_id: str, chunks: List[str], index: BM25Index, metadata: Dict[str, Any]):
+        self.document_id = document_id
+        self.chunks = chunks
+        self.index = index
+        self.metadata = metadata
+
+class DocumentStore:
+    """
+    On-disk store of processed documents, so follow-up questions skip extraction,
+    chunking, classification and indexing.
+
+    Each document lives in its own directory: chunks, metadata and chunk summaries as JSON
+    and the BM25 weights as .npy arrays that are memory-mapped when opened. Up to max_open documents
+    stay open in memory and up to max_documents on disk, least recently used evicted first.
+    """
+
+    def __init__(self, directory: str = DOCUMENT_STORE_DIR, max_documents: int = DOCUMENT_STORE_MAX_DOCUMENTS,
+                 max_open: int = DOCUMENT_STORE_MAX_OPEN):
+        self.directory = directory
+        self.max_documents = max_documents
+        self.max_open = max_open
+        self._open: "OrderedDict[str, StoredDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        return os.path.join(self.directory, document_id)
+
+    def add(self, document_id: str, chunks: List[str], metadata: Dict[str, Any]) -> StoredDocument:
+        """Index and store a document, evicting the least recently used ones beyond max_documents."""
+        index = BM25Index(chunks)
+        path = self._path(document_id)
+        # Write into a temporary directory and rename it, so readers never see a partial document
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".staging-")
+        index.save(staging)
+        with open(os.path.join(staging, "chunks.json"), "w", encoding="utf-8") as file:
+            json.dump(chunks, file)
+        with open(os.path.join(staging, "metadata.json"), "w", encoding="utf-8") as file:
+            json.dump(metadata, file)
+
+        with self._lock:
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+            stored = StoredDocument(document_id, chunks, index, metadata)
+            self._remember(stored)
+            self._evict()
+        return stored
+
+    def get(self, document_id: str) -> Optional[StoredDocument]:
+        """Open a stored document, or None if it was never stored or has been evicted."""
+        # Ids come from clients: anything but a hex digest could point outside the store
+        if not DOCUMENT_ID_PATTERN.match(document_id):
+            return None
+        with self._lock:
+            path = self._path(document_id)
+            if not os.path.isdir(path):
+                self._open.pop(document_id, None)
+                return None
+            os.utime(path)
+            stored = self._open.get(document_id)
+            if stored is not None:
+                self._open.move_to_end(document_id)
+                return stored
+
+            with open(os.path.join(path, "chunks.json"), "r", encoding="utf-8") as file:
+                chunks = json.load(file)
+            with open(os.path.join(path, "metadata.json"), "r", encoding="utf-8") as file:
+                metadata = json.load(file)
+            stored = StoredDocument(document_id, chunks, BM25Index.load(path, chunks), metadata)
+            self._remember(stored)
+            return stored
+
+    def update_metadata(self, document_id: str, **values: Any) -> None:
+        """Add computed results (e.g. the summary) to a stored document."""
+        stored = self.get(document_id)
+        if stored is None:
+            return
+        with self._lock:
+            stored.metadata.update(values)
+            with open(os.path.join(self._path(document_id), "metadata.json"), "w", encoding="utf-8") as file:
+                json.dump(stored.metadata, file)
+
+    def get_chunk_summaries(self, document_id: str, namespace: str) -> Dict[str, str]:
+        """Chunk summaries of a stored document by chunk content hash, for one model and prompt namespace."""
+        if not DOCUMENT_ID_PATTERN.match(document_id):
+            return {}
+        with self._lock:
+            path = os.path.join(self._path(document_id), CHUNK_SUMMARIES_FILE)
+            if not os.path.exists(path):
+                return {}
+            with open(path, "r", encoding="utf-8") as file:
+                return json.load(file).get(namespace, {})
+
+    def put_chunk_summaries(self, document_id: str, namespace: str, summaries: Dict[str, str]) -> None:
+        """Add chunk summaries to a stored document; they are deleted with it on eviction."""
+        if not DOCUMENT_ID_PATTERN.match(document_id):
+            return
+        with self._lock:
+            directory = self._path(document_id)
+            if not os.path.isdir(directory):
+                return
+            path = os.path.join(directory, CHUNK_SUMMARIES_FILE)
+            stored = {}
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as file:
+                    stored = json.load(file)
+            stored.setdefault(namespace, {}).update(summaries)
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(stored, file)
+
+    def _remember(self, stored: StoredDocument) -> None:
+        self._open[stored.document_id] = stored
+        self._open.move_to_end(stored.document_id)
+        while len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+
+    def _evict(self) -> None:
+        """Delete the least recently used documents beyond max_documents (directory mtime is the access time)."""
+        entries = [entry for entry in os.scandir(self.directory) if entry.is_dir() and not entry.name.startswith(".")]
+        if len(entries) <= self.max_documents:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_documents]:
+            self._open.pop(entry.name, None)
+            shutil.rmtree(entry.path, ignore_errors=True)
+        print(f"Evicted {len(entries) - self.max_documents} least recently used documents from the store.")
@@ -0,0 +1,179 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+from scipy import sparse
+from pydantic import BaseModel, Field
+
+from token_utils import estimate_tokens
+
+# Sentence boundaries: terminal punctuation followed by whitespace, or a blank line
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+TERM_PATTERN = re.compile(r'\b[a-z][a-z0-9\-]{1,}\b')
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just may me might more most must
+my myself no nor not now of off on once only or other our ours ourselves out over own same shall she should
+so some such than that the their theirs them themselves then there these they this those through to too
+under until up upon very was we were what when where which while who whom why will with within without
+would you your yours yourself yourselves
+""".split())
+
+# Share of sentences kept for each conciseness level
+CONCISENESS_KEEP_RATIO = {
+    "very_concise": 0.2,
+    "balanced": 0.35,
+    "detailed": 0.5
+}
+
+SCORING_METHODS = ["textrank", "tfidf"]
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+TEXTRANK_TOLERANCE = 1e-6
+MIN_KEPT_SENTENCES = 3
+
+class ExtractiveSelection(BaseModel):
+    """Result of the extractive pre-filter."""
+    text: str
+    kept_sentences: int
+    total_sentences: int
+    keep_ratio: float
+    tokens_before: int
+    tokens_after: int
+    sentence_indices: List[int] = Field(default_factory=list)
+
+    model_config = {
+        "extra": "allow"
+    }
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into non-empty sentences."""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY_PATTERN.split(text) if sentence and sentence.strip()]
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase content terms of a text, without stop words."""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOP_WORDS]
+
+def build_tfidf_matrix(sentences: List[str]) -> sparse.csr_matrix:
+    """Build an L2-normalized sentence x term TF-IDF matrix."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for term in tokenize(sentence):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+
+    shape = (len(sentences), max(len(vocabulary), 1))
+    # Duplicate (row, col) entries are summed, giving raw term frequencies
+    counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=shape)
+    counts.sum_duplicates()
+
+    document_frequency = np.bincount(counts.indices, minlength=shape[1])
+    idf = np.log((1.0 + shape[0]) / (1.0 + document_frequency)) + 1.0
+
+    tfidf = counts.copy()
+    tfidf.data = np.log1p(tfidf.data) * idf[tfidf.indices]
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ tfidf
+
+def textrank_scores(matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    TextRank over the cosine-similarity graph of the sentences.
+
+    The similarity matrix X @ X.T is never materialized: each power iteration applies it
+    as two sparse matrix-vector products, so memory stays linear in the number of terms.
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    # Rows are unit length, so self-similarity is 1 (or 0 for empty sentences)
+    self_similarity = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+    degree = matrix @ (matrix.T @ np.ones(n)) - self_similarity
+    degree[degree <= 0] = 1.0
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(TEXTRANK_ITERATIONS):
+        weighted = scores / degree
+        propagated = matrix @ (matrix.T @ weighted) - self_similarity * weighted
+        updated = (1.0 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * propagated
+        if np.abs(updated - scores).sum() < TEXTRANK_TOLERANCE:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+def tfidf_scores(matrix: sparse.csr_matrix) -> np.ndarray:
+    """Score sentences by cosine similarity to the document centroid."""
+    centroid = np.asarray(matrix.sum(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    if norm == 0:
+        return np.zeros(matrix.shape[0])
+    return matrix @ (centroid / norm)
+
+def score_sentences(sentences: List[str], method: str = "textrank") -> np.ndarray:
+    """Score sentences with the given method ('textrank' or 'tfidf')."""
+    if method not in SCORING_METHODS:
+        raise ValueError(f"method must be one of {SCORING_METHODS}")
+    matrix = build_tfidf_matrix(sentences)
+    if method == "textrank":
+        return textrank_scores(matrix)
+    return tfidf_scores(matrix)
+
+def resolve_keep_ratio(keep_ratio: Optional[float] = None, conciseness: Optional[str] = None) -> float:
+    """Return the explicit keep ratio, or the one implied by the conciseness level."""
+    if keep_ratio is None:
+        keep_ratio = CONCISENESS_KEEP_RATIO.get(conciseness, CONCISENESS_KEEP_RATIO["balanced"])
+    if not 0 < keep_ratio <= 1:
+        raise ValueError("keep_ratio must be between 0 and 1")
+    return keep_ratio
+
+def extract_top_sentences(text: str, keep_ratio: float, method: str = "textrank",
+                          min_sentences: int = MIN_KEPT_SENTENCES) -> ExtractiveSelection:
+    """
+    Keep the highest-scoring fraction of sentences, in their original order.
+
+    Sentences that were adjacent in the source stay on one line; a gap where sentences
+    were dropped starts a new line, so the map stage can still see the breaks.
+    """
+    sentences = split_sentences(text)
+    tokens_before = estimate_tokens(text)
+    keep_count = min(len(sentences), max(min_sentences, int(round(len(sentences) * keep_ratio))))
+
+    if keep_count >= len(sentences):
+        return ExtractiveSelection(
+            text=text,
+            kept_sentences=len(sentences),
+            total_sentences=len(sentences),
+            keep_ratio=keep_ratio,
+            tokens_before=tokens_before,
+            tokens_after=tokens_before,
+            sentence_indices=list(range(len(sentences)))
+        )
+
+    scores = score_sentences(sentences, method)
+    # argpartition finds the top-k without sorting every score
+    kept = np.sort(np.argpartition(-scores, keep_count - 1)[:keep_count])
+
+    lines = []
+    previous = None
+    for index in kept:
+        if previous is not None and index == previous + 1:
+            lines[-1] = f"{lines[-1]} {sentences[index]}"
+        else:
+            lines.append(sentences[index])
+        previous = index
+    filtered_text = "\n".join(lines)
+
+    return ExtractiveSelection(
+        text=filtered_text,
+        kept_sentences=keep_count,
+        total_sentences=len(sentences),
+        keep_ratio=keep_ratio,
+        tokens_before=tokens_before,
+        tokens_after=estimate_tokens(filtered_text),
+        sentence_indices=kept.tolist()
+    )
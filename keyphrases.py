@@ -0,0 +1,155 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+from scipy import sparse
+from pydantic import BaseModel, Field
+
+from extractive import STOP_WORDS, build_tfidf_matrix, textrank_scores
+
+# Fragments between punctuation; keyphrase candidates never cross these
+FRAGMENT_SPLIT_PATTERN = re.compile(r'[^\w\s\-+#.]|(?<!\w)\.|\.(?!\w)')
+PHRASE_WORD_PATTERN = re.compile(r'[a-z0-9][a-z0-9\-+#.]*[a-z0-9+#]|[a-z]')
+
+MAX_PHRASE_WORDS = 3
+MIN_PHRASE_CHARS = 3
+MULTIWORD_BOOST = 0.5  # Extra weight per additional word in a phrase
+MAX_RELATED_SENTENCES = 2
+NEAR_DUPLICATE_SIMILARITY = 0.8  # Sentences this similar to a chosen one add nothing new
+
+class Keyphrase(BaseModel):
+    """A keyphrase with its normalized score and the sentences it occurs in."""
+    phrase: str
+    score: float
+    frequency: int
+    sentence_indices: List[int] = Field(default_factory=list)
+
+class CentralSentence(BaseModel):
+    """A central sentence with its normalized score and its most similar other sentences."""
+    index: int
+    score: float
+    similar_indices: List[int] = Field(default_factory=list)
+
+def candidate_phrases(text: str, max_words: int = MAX_PHRASE_WORDS) -> List[str]:
+    """
+    RAKE-style candidates: runs of content words between stop words and punctuation,
+    expanded into all n-grams of up to max_words words.
+    """
+    phrases = []
+    for fragment in FRAGMENT_SPLIT_PATTERN.split(text.lower()):
+        run = []
+        for word in PHRASE_WORD_PATTERN.findall(fragment) + [None]:
+            if word is None or word in STOP_WORDS:
+                for n in range(1, max_words + 1):
+                    for i in range(len(run) - n + 1):
+                        phrases.append(" ".join(run[i:i + n]))
+                run = []
+            else:
+                run.append(word)
+    return [phrase for phrase in phrases if len(phrase) >= MIN_PHRASE_CHARS and not phrase.replace(" ", "").isdigit()]
+
+def phrase_sentence_matrix(sentences: List[str], max_words: int = MAX_PHRASE_WORDS):
+    """Build a sparse phrase x sentence count matrix and the phrase vocabulary."""
+    vocabulary = {}
+    rows, cols = [], []
+    for column, sentence in enumerate(sentences):
+        for phrase in candidate_phrases(sentence, max_words):
+            rows.append(vocabulary.setdefault(phrase, len(vocabulary)))
+            cols.append(column)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+        shape=(len(vocabulary), len(sentences))
+    )
+    matrix.sum_duplicates()
+    phrases = [None] * len(vocabulary)
+    for phrase, index in vocabulary.items():
+        phrases[index] = phrase
+    return matrix, phrases
+
+def _overlaps(phrase: str, selected: List[str]) -> bool:
+    padded = f" {phrase} "
+    return any(padded in f" {other} " or f" {other} " in padded for other in selected)
+
+def extract_keyphrases(sentences: List[str], top_n: int = 10, max_words: int = MAX_PHRASE_WORDS,
+                       sentence_weights: Optional[np.ndarray] = None) -> List[Keyphrase]:
+    """
+    Rank keyphrases by TF-IDF over sentences, boosting multi-word phrases.
+
+    Scores are computed for the whole vocabulary at once from the sparse phrase x
+    sentence matrix. Phrases contained in a better-ranked phrase (or containing one)
+    are skipped, and each phrase keeps the sentences it occurs in, ordered by
+    sentence_weights when given.
+    """
+    if not sentences:
+        return []
+    matrix, phrases = phrase_sentence_matrix(sentences, max_words)
+    if not phrases:
+        return []
+
+    frequency = np.asarray(matrix.sum(axis=1)).ravel()
+    document_frequency = np.diff(matrix.indptr)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + document_frequency)) + 1.0
+    word_counts = np.fromiter((phrase.count(" ") + 1 for phrase in phrases), dtype=np.float64, count=len(phrases))
+    scores = np.log1p(frequency) * idf * (1.0 + MULTIWORD_BOOST * (word_counts - 1))
+    # A phrase seen once in a multi-sentence text is rarely a key topic
+    if len(sentences) > 1:
+        scores[frequency < 2] *= 0.5
+
+    keyphrases = []
+    selected = []
+    top_score = None
+    for index in np.argsort(-scores, kind="stable"):
+        phrase = phrases[index]
+        if _overlaps(phrase, selected):
+            continue
+        top_score = top_score or scores[index]
+        occurrences = matrix.indices[matrix.indptr[index]:matrix.indptr[index + 1]]
+        if sentence_weights is not None:
+            occurrences = occurrences[np.argsort(-sentence_weights[occurrences], kind="stable")]
+        keyphrases.append(Keyphrase(
+            phrase=phrase,
+            score=round(float(scores[index] / top_score), 3),
+            frequency=int(frequency[index]),
+            sentence_indices=occurrences.tolist()
+        ))
+        selected.append(phrase)
+        if len(keyphrases) >= top_n:
+            break
+    return keyphrases
+
+def central_sentences(sentences: List[str], top_n: int = 5, related: int = MAX_RELATED_SENTENCES,
+                      matrix: Optional[sparse.csr_matrix] = None,
+                      scores: Optional[np.ndarray] = None) -> List[CentralSentence]:
+    """
+    Rank sentences by TextRank centrality and attach, for each, the most similar
+    other sentences (cosine similarity from the same TF-IDF matrix). A precomputed
+    TF-IDF matrix and TextRank scores can be passed in to avoid recomputing them.
+    """
+    if not sentences:
+        return []
+    if matrix is None:
+        matrix = build_tfidf_matrix(sentences)
+    if scores is None:
+        scores = textrank_scores(matrix)
+    order = np.argsort(-scores, kind="stable")
+    top_score = scores[order[0]] if scores[order[0]] > 0 else 1.0
+    transposed = matrix.T.tocsc()
+
+    results = []
+    chosen = []
+    for index in order:
+        # Similarities of this sentence to every sentence, as one sparse product
+        similarities = (matrix[index] @ transposed).toarray().ravel()
+        if chosen and similarities[chosen].max() >= NEAR_DUPLICATE_SIMILARITY:
+            continue
+        similarities[similarities >= NEAR_DUPLICATE_SIMILARITY] = 0.0
+        similar = np.argsort(-similarities, kind="stable")[:related]
+        results.append(CentralSentence(
+            index=int(index),
+            score=round(float(scores[index] / top_score), 3),
+            similar_indices=[int(i) for i in similar if similarities[i] > 0]
+        ))
+        chosen.append(int(index))
+        if len(results) >= top_n:
+            break
+    return results
@@ -1,5 +1,7 @@
 import os
-from typing import List, Dict, Any, Optional
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 import PyPDF2
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -8,6 +10,19 @@ from langchain.prompts import PromptTemplate
 import requests
 import json
 from datetime import datetime
+from extractive import extract_top_sentences, resolve_keep_ratio
+from dedup import find_near_duplicates, DEFAULT_SIMILARITY_THRESHOLD
+from tree_reduce import TreeReducer, reduce_token_limit
+from versioning import SummaryCache, VersionDiff, content_defined_chunks, content_hash
+from clauses import ClauseReuse, normalize_clause, segment_clauses
+from legal_facts import LegalFacts, extract_legal_facts, format_facts
+from retrieval import BM25Index, DEFAULT_TOP_K
+from document_store import ChunkSummaryReuse, DocumentStore, StoredDocument, document_id
+from routing import LatencyModel, RouteDecision, get_latency_model, route_document
+from model_tiers import build_stage_llms, record_stage, resolve_stage_models, track_stage_metrics
+from legal_glossary import LegalGlossary
+from doc_classifier import DocumentTypeClassifier, DocumentTypePrediction, DEFAULT_CONFIDENCE_THRESHOLD
+from token_utils import estimate_tokens
 
 # Load environment variables
 load_dotenv()
@@ -16,19 +31,62 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+# Expected output of a chunk summary and of the final summary, used by the router
+CHUNK_SUMMARY_TOKENS = 300
+FINAL_SUMMARY_TOKENS = 1000
+
+# Target chunk size for versioned documents, whose chunks are content-defined
+VERSIONED_CHUNK_TOKENS = 1000
+
 class LegalDocumentSummarizer:
     """
     A simplified legal document summarizer that uses LangChain and OpenAI
     without vector databases for easier deployment.
     """
     
-    def __init__(self, model_name="gpt-4", temperature=0.0):
-        """Initialize the legal document summarizer with necessary components."""
-        self.llm = ChatOpenAI(
-            model_name=model_name,
+    def __init__(self, model_name="gpt-4", temperature=0.0,
+                 duplicate_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD,
+                 summary_cache: Optional[SummaryCache] = None,
+                 stage_models: Optional[Dict[str, str]] = None,
+                 document_classifier: Optional[DocumentTypeClassifier] = None,
+                 classifier_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
+                 glossary: Optional[LegalGlossary] = None,
+                 document_store: Optional[DocumentStore] = None):
+        """
+        Initialize the legal document summarizer with necessary components.
+        
+        duplicate_threshold is the MinHash similarity above which chunks are treated as
+        near-duplicates and summarized once; None disables deduplication. summary_cache
+        stores chunk summaries of versioned documents; one is opened on first use if not given.
+        model_name is used for the final summary; stage_models overrides the model of other
+        stages (classify, extract, map, intermediate_reduce), which default to a small model.
+        document_classifier predicts the document type locally (the saved model, or the
+        keyword-seeded one); the LLM is only asked when its confidence is below classifier_threshold.
+        glossary resolves legal concepts offline before any web search; one is opened on first use if not given.
+        document_store keeps the clauses, index and results of every processed document for follow-up
+        questions; one is opened on first use if not given.
+        """
+        self.duplicate_threshold = duplicate_threshold
+        self.summary_cache = summary_cache
+        self.model_name = model_name
+        self.stage_models = resolve_stage_models(model_name, stage_models)
+        self.stage_llms = build_stage_llms(self.stage_models, lambda model: ChatOpenAI(
+            model_name=model,
             temperature=temperature,
             openai_api_key=OPENAI_API_KEY
-        )
+        ))
+        self.llm = self.stage_llms["reduce"]
+        self.document_classifier = document_classifier or DocumentTypeClassifier.load()
+        self.classifier_threshold = classifier_threshold
+        self.glossary = glossary
+        self.document_store = document_store
+        
+        # Multi-level reduce for chunk summaries that overflow the final prompt; every
+        # intermediate batch must fit both the intermediate and the final model
+        self.tree_reducer = TreeReducer(self._reduce_summaries, min(
+            reduce_token_limit(model_name),
+            reduce_token_limit(self.stage_models["intermediate_reduce"])
+        ))
         
         # Text splitter tuned for legal documents
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -80,7 +138,30 @@ class LegalDocumentSummarizer:
     
     def detect_document_type(self, text: str) -> str:
         """Determine the type of legal document based on content analysis."""
-        # We'll use the LLM to identify document type
+        return self.classify_document_type(text).label
+    
+    def classify_document_type(self, text: str, use_cache: bool = False) -> DocumentTypePrediction:
+        """
+        Classify the document type locally, asking the LLM only when the classifier is not
+        confident. With use_cache, LLM answers are stored per opening text and reused.
+        """
+        prediction = self.document_classifier.classify(text)
+        if prediction.confidence >= self.classifier_threshold:
+            print(f"Detected document type: {prediction.label} (local, confidence {prediction.confidence:.2f})")
+            return prediction
+        
+        print(f"Classifier confidence {prediction.confidence:.2f} is below {self.classifier_threshold}, asking the LLM...")
+        opening = text[:5000]
+        namespace = f"legal:{self.stage_models['classify']}:document_type"
+        document_type = self._get_summary_cache().get(namespace, opening) if use_cache else None
+        if document_type is None:
+            document_type = self._detect_document_type_llm(text)
+            if use_cache:
+                self._get_summary_cache().put(namespace, opening, document_type)
+        return prediction.model_copy(update={"label": document_type, "source": "llm"})
+    
+    def _detect_document_type_llm(self, text: str) -> str:
+        """Ask the LLM for the document type."""
         prompt = """
         Analyze the following legal text and identify the document type (e.g., Contract, NDA, 
         Employment Agreement, Terms of Service, Privacy Policy, Patent Application, Court Filing, etc.).
@@ -90,23 +171,137 @@ class LegalDocumentSummarizer:
         {}
         """.format(text[:5000])  # Use the first 5000 chars to identify doc type
         
-        response = self.llm.predict(prompt)
+        response = self._call("classify", prompt)
         print(f"Detected document type: {response}")
         return response.strip()
     
-    def chunk_document(self, text: str) -> List[str]:
-        """Split document into manageable chunks."""
+    def extract_facts(self, text: str) -> LegalFacts:
+        """Extract parties, dates, amounts and deadlines with local patterns, without the LLM."""
+        facts = extract_legal_facts(text)
+        record_stage("facts", "regex", 0, 0, facts.extraction_ms / 1000)
+        print(f"Extracted {len(facts.parties)} parties, {len(facts.timeline)} dates, {len(facts.amounts)} amounts "
+              f"and {len(facts.deadlines)} deadlines in {facts.extraction_ms:.1f} ms.")
+        return facts
+    
+    def chunk_document(self, text: str, content_defined: bool = False, by_clause: bool = False) -> List[str]:
+        """
+        Split document into manageable chunks.
+        
+        With content_defined, chunk boundaries depend only on nearby lines, so an edit
+        to one passage leaves the other chunks of a revised document unchanged.
+        With by_clause, every chunk is one clause of the document.
+        """
         print("Splitting text into manageable chunks...")
-        chunks = self.text_splitter.split_text(text)
+        if by_clause:
+            chunks = segment_clauses(text)
+        elif content_defined:
+            chunks = content_defined_chunks(text, VERSIONED_CHUNK_TOKENS)
+        else:
+            chunks = self.text_splitter.split_text(text)
         print(f"Created {len(chunks)} text chunks.")
         return chunks
     
+    def _get_summary_cache(self) -> SummaryCache:
+        """Return the summary cache, opening the default one on first use."""
+        if self.summary_cache is None:
+            self.summary_cache = SummaryCache()
+        return self.summary_cache
+    
+    def _get_document_store(self) -> DocumentStore:
+        """Return the document store, opening the default one on first use."""
+        if self.document_store is None:
+            self.document_store = DocumentStore()
+        return self.document_store
+    
+    def open_document(self, text: str, classification: Optional[DocumentTypePrediction] = None,
+                      facts: Optional[LegalFacts] = None) -> StoredDocument:
+        """
+        The stored document for a text, storing its clauses, retrieval index, type and facts
+        on first upload. Classification and facts computed by the caller replace stored ones.
+        """
+        store = self._get_document_store()
+        doc_id = document_id(text)
+        stored = store.get(doc_id)
+        if stored is None:
+            classification = classification or self.document_classifier.classify(text)
+            facts = facts or self.extract_facts(text)
+            stored = store.add(doc_id, segment_clauses(text), {
+                "document_classification": classification.model_dump(),
+                "facts": facts.model_dump()
+            })
+            print(f"Stored document {doc_id} with {len(stored.chunks)} clauses.")
+        elif classification is not None and facts is not None:
+            store.update_metadata(doc_id, document_classification=classification.model_dump(), facts=facts.model_dump())
+        return stored
+    
+    def deduplicate_chunks(self, chunks: List[str]) -> Tuple[List[str], int]:
+        """
+        Collapse near-duplicate chunks (repeated schedules, copied appendices) so each is
+        summarized once. Kept chunks note how often they occur so the summary can say so.
+        Returns the kept chunks and the number of chunks removed.
+        """
+        if self.duplicate_threshold is None or len(chunks) < 2:
+            return chunks, 0
+        
+        groups = find_near_duplicates(chunks, self.duplicate_threshold)
+        if not groups.duplicates_removed:
+            return chunks, 0
+        
+        sizes = groups.cluster_sizes()
+        unique_chunks = []
+        for i in groups.representatives:
+            if sizes[i] > 1:
+                unique_chunks.append(f"[This passage appears {sizes[i]} times in the document.]\n{chunks[i]}")
+            else:
+                unique_chunks.append(chunks[i])
+        print(f"Collapsed {groups.duplicates_removed} near-duplicate chunks, {len(unique_chunks)} remain.")
+        return unique_chunks, groups.duplicates_removed
+    
+    def route_chunks(self, chunks: List[str], allow_single_pass: bool = True) -> RouteDecision:
+        """Choose single-pass, map-reduce or hierarchical summarization for the chunks by predicted latency."""
+        document_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+        return route_document(
+            document_tokens,
+            self.model_name,
+            chunk_tokens=max(1, math.ceil(document_tokens / max(len(chunks), 1))),
+            summary_tokens=CHUNK_SUMMARY_TOKENS,
+            output_tokens=FINAL_SUMMARY_TOKENS,
+            latency=self._latency("reduce"),
+            map_latency=self._latency("map"),
+            allow_single_pass=allow_single_pass
+        )
+    
+    def _get_glossary(self) -> LegalGlossary:
+        """Return the legal glossary, opening the default one on first use."""
+        if self.glossary is None:
+            self.glossary = LegalGlossary()
+        return self.glossary
+    
     def search_legal_context(self, query: str, num_results: int = 3) -> List[Dict]:
-        """Use Tavily API to search for relevant legal context."""
+        """
+        Find legal context for a concept: from the local glossary when it has a fresh
+        entry, otherwise with the Tavily API, writing the results back to the glossary.
+        """
+        start = time.perf_counter()
+        sources = self._get_glossary().lookup(query)
+        record_stage("glossary", "sqlite", 0, 0, time.perf_counter() - start)
+        if sources is not None:
+            print(f"Found glossary entry for: {query}")
+            return sources[:num_results]
+        
         if not TAVILY_API_KEY:
             print("Tavily API key not provided. Skipping external context search.")
             return []
-            
+        
+        start = time.perf_counter()
+        results = self._search_tavily(query, num_results)
+        record_stage("web_search", "tavily", 0, 0, time.perf_counter() - start)
+        if results:
+            self._get_glossary().store(query, results)
+        return results
+    
+    def _search_tavily(self, query: str, num_results: int) -> List[Dict]:
+        """Use Tavily API to search for relevant legal context."""
         print(f"Searching for external legal context about: {query}")
         url = "https://api.tavily.com/search"
         payload = {
@@ -128,26 +323,32 @@ class LegalDocumentSummarizer:
         
         return []
     
-    def summarize_chunks(self, chunks: List[str], document_type: str, question: str) -> str:
-        """Summarize document chunks without using vector storage."""
+    def summarize_chunks(self, chunks: List[str], document_type: str, question: str,
+                         version: Optional[VersionDiff] = None,
+                         route: Optional[RouteDecision] = None,
+                         clause_reuse: Optional[ClauseReuse] = None,
+                         document_reuse: Optional[ChunkSummaryReuse] = None) -> str:
+        """
+        Summarize document chunks without using vector storage.
+        
+        The route decides between one call over all chunks and map-reduce; it is computed
+        here when not given. When a version is given, chunk summaries are looked up in and
+        written to the summary cache, and the version records how many were reused.
+        When clause_reuse is given, the chunks are clauses: their summaries are looked up
+        by clause fingerprint, shared by every document, and the counts are recorded in it.
+        Otherwise, when document_reuse is given, chunk summaries are kept with the stored
+        document, so re-runs and custom questions on it skip the map stage.
+        """
+        if route is None:
+            route = self.route_chunks(chunks, allow_single_pass=version is None and clause_reuse is None)
+        
         # For longer documents, we'll use a map-reduce approach
-        if len(chunks) > 5:
-            print("Document is long, using map-reduce approach...")
-            # First, get summaries of each chunk
-            chunk_summaries = []
-            for i, chunk in enumerate(chunks):
-                print(f"Processing chunk {i+1}/{len(chunks)}...")
-                chunk_prompt = f"""
-                You are a legal expert. Summarize the key legal points from this section of a {document_type}:
-                
-                {chunk}
-                
-                Provide a concise summary of the main legal elements in this section.
-                """
-                summary = self.llm.predict(chunk_prompt)
-                chunk_summaries.append(summary)
+        if route.strategy != "single_pass":
+            print(f"Using {route.strategy} approach (predicted {route.predicted_seconds:.1f}s)...")
+            chunk_summaries = self._map_chunks(chunks, document_type, version, clause_reuse, document_reuse)
             
-            # Then combine the summaries
+            # Reduce the summaries level by level until they fit the final prompt, then combine them
+            chunk_summaries = self.tree_reducer.reduce(chunk_summaries, document_type)
             combined_summaries = "\n\n".join(chunk_summaries)
             final_prompt = f"""
             You are a senior legal expert. Based on these summaries of different sections of a {document_type},
@@ -162,7 +363,7 @@ class LegalDocumentSummarizer:
             Include information about parties, obligations, rights, deadlines, conditions, and potential risks.
             Use clear, precise language, with legal terminology where appropriate.
             """
-            return self.llm.predict(final_prompt)
+            return self._call("reduce", final_prompt)
         else:
             # For shorter documents, process all chunks together
             print("Document is shorter, processing all chunks together...")
@@ -172,7 +373,175 @@ class LegalDocumentSummarizer:
                 document_type=document_type,
                 question=question
             )
-            return self.llm.predict(prompt)
+            return self._call("reduce", prompt)
+    
+    def _map_chunks(self, chunks: List[str], document_type: str, version: Optional[VersionDiff],
+                    clause_reuse: Optional[ClauseReuse],
+                    document_reuse: Optional[ChunkSummaryReuse] = None) -> List[str]:
+        """
+        Summaries of the chunks, reusing cached ones for versioned documents, indexed
+        ones for clauses and stored ones from earlier runs on the same document. A clause
+        repeated in the document is summarized and kept once.
+        """
+        if clause_reuse is not None:
+            # Clause summaries do not depend on the document type so boilerplate is shared across documents
+            namespace = f"legal:{self.stage_models['map']}:clause"
+            keys = [normalize_clause(chunk) for chunk in chunks]
+        else:
+            namespace = f"legal:{self.stage_models['map']}:{document_type}"
+            keys = chunks
+        use_cache = version is not None or clause_reuse is not None
+        # Other documents keep their chunk summaries in the document store, evicted with the document
+        per_document = not use_cache and document_reuse is not None
+        first_index = {}
+        for i, key in enumerate(keys):
+            first_index.setdefault(key, i)
+        distinct = sorted(first_index.values())
+        
+        summaries = {}
+        if use_cache:
+            for i in distinct:
+                summary = self._get_summary_cache().get(namespace, keys[i])
+                if summary is not None:
+                    summaries[i] = summary
+        elif per_document:
+            stored_summaries = self._get_document_store().get_chunk_summaries(document_reuse.document_id, namespace)
+            for i in distinct:
+                summary = stored_summaries.get(content_hash(keys[i]))
+                if summary is not None:
+                    summaries[i] = summary
+        reused = len(summaries)
+        
+        pending = [i for i in distinct if i not in summaries]
+        print(f"Summarizing {len(pending)} chunks in parallel...")
+        if clause_reuse is not None:
+            prompts = [self._clause_prompt(chunks[i]) for i in pending]
+        else:
+            prompts = [self._chunk_prompt(chunks[i], document_type) for i in pending]
+        for i, summary in zip(pending, self._call_batch("map", prompts)):
+            summaries[i] = summary
+            if use_cache:
+                self._get_summary_cache().put(namespace, keys[i], summary)
+        if per_document and pending:
+            self._get_document_store().put_chunk_summaries(
+                document_reuse.document_id, namespace, {content_hash(keys[i]): summaries[i] for i in pending}
+            )
+        
+        if version is not None:
+            version.reused_summaries += reused
+            version.new_summaries += len(pending)
+        elif per_document:
+            document_reuse.reused_summaries += reused
+            document_reuse.new_summaries += len(pending)
+            print(f"Document {document_reuse.document_id}: {reused}/{len(distinct)} chunk summaries reused.")
+        if clause_reuse is not None:
+            clause_reuse.distinct_clauses = len(distinct)
+            clause_reuse.reused_clauses = reused
+            clause_reuse.new_clauses = len(pending)
+            clause_reuse.repeated_clauses = len(chunks) - len(distinct)
+            clause_reuse.hit_rate = round(reused / len(distinct), 3) if distinct else 0.0
+            print(f"Clause index: {reused}/{len(distinct)} distinct clauses reused, "
+                  f"{clause_reuse.repeated_clauses} repeated in the document.")
+        return [summaries[i] for i in distinct]
+    
+    def _clause_prompt(self, clause: str) -> str:
+        """Prompt for the map stage on one clause, independent of the document so the summary can be shared."""
+        return f"""
+        You are a legal expert. Summarize the legal effect of this contract clause: who must do what,
+        under which conditions, with any amounts, deadlines, limits and exceptions it states.
+        
+        {clause}
+        
+        Provide a concise summary of this clause only.
+        """
+    
+    def _chunk_prompt(self, chunk: str, document_type: str) -> str:
+        """Prompt for the map stage: the legal points of one chunk."""
+        return f"""
+        You are a legal expert. Summarize the key legal points from this section of a {document_type}:
+        
+        {chunk}
+        
+        Provide a concise summary of the main legal elements in this section.
+        """
+    
+    def _reduce_summaries(self, chunk_summaries: str, document_type: str) -> str:
+        """Merge a batch of consecutive chunk summaries into one (a node of the tree reduce)."""
+        prompt = f"""
+        You are a senior legal expert. The following are summaries of consecutive sections of a {document_type}.
+        Merge them into a single summary that keeps every party, obligation, right, deadline, amount,
+        condition and risk they mention, in the original order, without repetition.
+        
+        SECTION SUMMARIES:
+        {chunk_summaries}
+        """
+        return self._call("intermediate_reduce", prompt)
+    
+    def _latency(self, stage: str) -> LatencyModel:
+        """Latency model of the model a stage runs on."""
+        return get_latency_model(self.stage_models[stage])
+    
+    def _call(self, stage: str, prompt: str) -> str:
+        """Run one prompt on the model of a stage, recording its latency and tokens."""
+        return self._latency(stage).timed(self.stage_llms[stage].predict, prompt, stage)
+    
+    def _call_batch(self, stage: str, prompts: List[str]) -> List[str]:
+        """Run several prompts concurrently on the model of a stage, as many at a time as the tree reduce uses."""
+        def batch(batch_prompts):
+            responses = self.stage_llms[stage].batch(
+                batch_prompts, config={"max_concurrency": self.tree_reducer.max_workers}
+            )
+            return [response.content for response in responses]
+        return self._latency(stage).timed_batch(batch, prompts, self.tree_reducer.max_workers, stage)
+    
+    def answer_question(self, clauses: List[str], index: BM25Index, document_type: str, question: str,
+                        top_k: int = DEFAULT_TOP_K, overview: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Answer a question from the clauses most relevant to it, in a single LLM call.
+        
+        The top_k best BM25 matches that fit the final model's context are passed to the LLM
+        in document order, after the overview (a stored summary) when one is given.
+        Returns the answer and a description of the retrieval.
+        """
+        start = time.perf_counter()
+        retrieved = index.search(question, top_k)
+        if not retrieved:
+            print("No clause matches the question terms, answering from the opening clauses.")
+        indices = [chunk.index for chunk in retrieved] or list(range(min(top_k, len(clauses))))
+        
+        budget = reduce_token_limit(self.model_name) - (estimate_tokens(overview) if overview else 0)
+        selected = []
+        for i in indices:
+            tokens = estimate_tokens(clauses[i])
+            if selected and tokens > budget:
+                continue
+            selected.append(i)
+            budget -= tokens
+        record_stage("retrieve", "bm25", 0, 0, time.perf_counter() - start)
+        print(f"Answering from {len(selected)} of {len(clauses)} clauses.")
+        
+        sections = "\n\n".join(clauses[i] for i in sorted(selected))
+        if overview:
+            sections = f"DOCUMENT OVERVIEW:\n{overview}\n\n{sections}"
+        prompt = f"""
+        You are a legal expert. Answer the question about this {document_type} using only the
+        sections below, which were selected from the document as the most relevant to it.
+        Quote the exact terms (periods, amounts, conditions) where they matter. If the sections
+        do not contain the answer, say so.
+        
+        DOCUMENT SECTIONS:
+        {sections}
+        
+        QUESTION: {question}
+        """
+        answer = self._call("reduce", prompt)
+        scores = {chunk.index: chunk.score for chunk in retrieved}
+        return answer, {
+            "total_chunks": len(clauses),
+            "top_k": top_k,
+            "retrieved": [{"index": i, "score": scores.get(i, 0.0), "tokens": estimate_tokens(clauses[i])}
+                          for i in selected]
+        }
     
     def enhance_with_legal_context(self, summary: str, document_type: str) -> str:
         """Enhance the summary with relevant legal context and explanations."""
@@ -186,7 +555,7 @@ class LegalDocumentSummarizer:
         {}
         """.format(summary)
         
-        key_concepts = self.llm.predict(prompt).strip()
+        key_concepts = self._call("extract", prompt).strip()
         print(f"Key legal concepts identified: {key_concepts}")
         
         # Search for additional context
@@ -221,36 +590,179 @@ class LegalDocumentSummarizer:
             external context - just seamlessly integrate the information.
             """.format(document_type, summary, context_str)
             
-            enhanced_summary = self.llm.predict(enhancement_prompt)
+            enhanced_summary = self._call("reduce", enhancement_prompt)
             print("Summary enhanced with external legal context.")
             return enhanced_summary
         
         return summary
     
-    def generate_summary(self, pdf_path: str, custom_question: Optional[str] = None) -> Dict[str, Any]:
-        """Generate a comprehensive legal document summary."""
+    def generate_summary(self, pdf_path: str, custom_question: Optional[str] = None,
+                         extractive_keep_ratio: Optional[float] = None,
+                         document_key: Optional[str] = None,
+                         reuse_clauses: bool = False, facts_only: bool = False,
+                         question_mode: bool = False) -> Dict[str, Any]:
+        """
+        Generate a comprehensive legal document summary.
+        
+        If extractive_keep_ratio is set, only that share of the most central sentences
+        is passed on to the chunk summaries. If document_key is set, the document is
+        treated as a new version of the document stored under that key: it is diffed
+        chunk by chunk against the previous version, unchanged chunks reuse their cached
+        summaries and only changed chunks and the reduce steps are sent to the LLM.
+        If reuse_clauses is set, the document is split into clauses and only clauses not
+        summarized before, in any document, are sent to the LLM; the result reports the
+        clause index hit rate.
+        
+        The result includes the parties, timeline, amounts and deadlines found by local
+        patterns; with facts_only, only those are returned, without any LLM call (the
+        document type then comes from the local classifier alone). With question_mode,
+        custom_question is answered from the most relevant clauses in one LLM call instead
+        of summarizing the whole document. The result also includes the model, calls,
+        tokens and time of every stage, and the document_id under which follow-up
+        questions can be asked with ask().
+        """
+        with track_stage_metrics() as metrics:
+            if facts_only:
+                result = self._generate_facts(pdf_path)
+            elif question_mode:
+                if not custom_question:
+                    raise ValueError("question_mode requires a custom_question")
+                result = self._generate_answer(pdf_path, custom_question)
+            else:
+                result = self._generate_summary(pdf_path, custom_question, extractive_keep_ratio, document_key,
+                                                reuse_clauses)
+        result["stage_metrics"] = metrics.as_dict()
+        return result
+    
+    def ask(self, doc_id: str, question: str, top_k: int = DEFAULT_TOP_K) -> Dict[str, Any]:
+        """
+        Answer a follow-up question about a stored document in one LLM call, reusing its
+        clauses, index, type and summary. Raises KeyError for unknown or evicted documents.
+        """
+        start_time = datetime.now()
+        with track_stage_metrics() as metrics:
+            stored = self._get_document_store().get(doc_id)
+            if stored is None:
+                raise KeyError(f"Unknown document id: {doc_id}")
+            document_type = stored.metadata["document_classification"]["label"]
+            answer, retrieval = self.answer_question(stored.chunks, stored.index, document_type, question, top_k,
+                                                     overview=stored.metadata.get("summary"))
+        return {
+            "document_id": doc_id,
+            "document_type": document_type,
+            "answer": answer,
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "retrieval": retrieval,
+            "stage_metrics": metrics.as_dict()
+        }
+    
+    def _generate_facts(self, pdf_path: str) -> Dict[str, Any]:
+        """Facts-only pipeline: local classification and fact extraction, no LLM call."""
+        start_time = datetime.now()
+        stored = self.open_document(self.load_pdf(pdf_path))
+        classification = stored.metadata["document_classification"]
+        return {
+            "document_id": stored.document_id,
+            "document_type": classification["label"],
+            "summary": format_facts(LegalFacts(**stored.metadata["facts"])),
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "document_classification": classification,
+            "facts": stored.metadata["facts"]
+        }
+    
+    def _generate_answer(self, pdf_path: str, question: str) -> Dict[str, Any]:
+        """Question pipeline: stored (or local) classification, facts and index, one LLM call."""
+        start_time = datetime.now()
+        stored = self.open_document(self.load_pdf(pdf_path))
+        classification = stored.metadata["document_classification"]
+        answer, retrieval = self.answer_question(stored.chunks, stored.index, classification["label"], question,
+                                                 overview=stored.metadata.get("summary"))
+        return {
+            "document_id": stored.document_id,
+            "document_type": classification["label"],
+            "summary": answer,
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "document_classification": classification,
+            "facts": stored.metadata["facts"],
+            "retrieval": retrieval
+        }
+    
+    def _generate_summary(self, pdf_path: str, custom_question: Optional[str],
+                          extractive_keep_ratio: Optional[float],
+                          document_key: Optional[str], reuse_clauses: bool) -> Dict[str, Any]:
+        """Run the summary pipeline; see generate_summary."""
         start_time = datetime.now()
         
         # Load document
         text = self.load_pdf(pdf_path)
-        document_type = self.detect_document_type(text)
+        classification = self.classify_document_type(text, use_cache=bool(document_key))
+        document_type = classification.label
+        facts = self.extract_facts(text)
+        stored = self.open_document(text, classification, facts)
         
-        # Process document in chunks
-        chunks = self.chunk_document(text)
+        # Optionally shrink the text before any summarization call
+        if extractive_keep_ratio is not None:
+            selection = extract_top_sentences(text, resolve_keep_ratio(extractive_keep_ratio))
+            print(f"Extractive pre-filter kept {selection.kept_sentences}/{selection.total_sentences} sentences "
+                  f"({selection.tokens_after}/{selection.tokens_before} tokens).")
+            text = selection.text
+        
+        # Process document in chunks (or clauses), summarizing repeated passages only once
+        chunks = self.chunk_document(text, content_defined=bool(document_key), by_clause=reuse_clauses)
+        version = None
+        if document_key:
+            version = self._get_summary_cache().record_version(document_key, chunks)
+            print(f"Version {version.version} of '{document_key}': {version.unchanged_chunks} unchanged, "
+                  f"{version.changed_chunks} changed, {version.removed_chunks} removed chunks.")
+        clause_reuse = ClauseReuse(total_clauses=len(chunks)) if reuse_clauses else None
+        # Other documents keep their chunk summaries under their id for re-runs and custom questions
+        document_reuse = ChunkSummaryReuse(document_id=stored.document_id) \
+            if version is None and clause_reuse is None else None
+        if clause_reuse is not None:
+            # Clauses are matched by fingerprint instead, which near-duplicate annotations would change
+            unique_chunks, duplicate_chunks = chunks, 0
+        else:
+            unique_chunks, duplicate_chunks = self.deduplicate_chunks(chunks)
+        
+        # Route by predicted latency; versioned documents and clauses need chunk summaries to reuse
+        allow_single_pass = version is None and clause_reuse is None
+        route = self.route_chunks(unique_chunks, allow_single_pass=allow_single_pass)
+        llm_calls_saved = 0
+        if duplicate_chunks:
+            llm_calls_saved = self.route_chunks(chunks, allow_single_pass=allow_single_pass).predicted_calls - route.predicted_calls
+        chunks = unique_chunks
         
         # Generate summary
         question = custom_question if custom_question else "Provide a comprehensive summary of this legal document."
-        summary = self.summarize_chunks(chunks, document_type, question)
+        summary = self.summarize_chunks(chunks, document_type, question, version, route, clause_reuse,
+                                        document_reuse)
+        if clause_reuse is not None:
+            llm_calls_saved += clause_reuse.reused_clauses + clause_reuse.repeated_clauses
+        elif version is not None:
+            llm_calls_saved += version.reused_summaries
+        else:
+            llm_calls_saved += document_reuse.reused_summaries
         
         # Enhance with legal context
         enhanced_summary = self.enhance_with_legal_context(summary, document_type)
         
+        if not custom_question:
+            self._get_document_store().update_metadata(stored.document_id, summary=enhanced_summary)
         processing_time = (datetime.now() - start_time).total_seconds()
         
         return {
+            "document_id": stored.document_id,
             "document_type": document_type,
             "summary": enhanced_summary,
-            "processing_time": processing_time
+            "processing_time": processing_time,
+            "duplicate_chunks": duplicate_chunks,
+            "llm_calls_saved": llm_calls_saved,
+            "route": route.model_dump(),
+            "document_classification": classification.model_dump(),
+            "version": version.model_dump() if version is not None else None,
+            "clause_reuse": clause_reuse.model_dump() if clause_reuse is not None else None,
+            "chunk_summary_reuse": document_reuse.model_dump() if document_reuse is not None else None,
+            "facts": facts.model_dump()
         }
 
 
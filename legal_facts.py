@@ -0,0 +1,240 @@
+import re
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+CONTEXT_CHARS = 160  # Maximum characters of surrounding sentence kept on each side of a fact
+
+MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "sept": 9,
+    "oct": 10, "nov": 11, "dec": 12
+}
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30,
+    "forty-five": 45, "sixty": 60, "ninety": 90, "one hundred eighty": 180
+}
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+CURRENCY_CODES = {
+    "$": "USD", "usd": "USD", "dollars": "USD", "€": "EUR", "eur": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pounds": "GBP", "₹": "INR", "inr": "INR", "rs": "INR", "rupees": "INR"
+}
+MAGNITUDES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "billion": 1e9}
+
+# Defined terms that name a party rather than a concept of the agreement
+PARTY_ROLES = {
+    "company", "client", "customer", "vendor", "supplier", "contractor", "consultant", "employee",
+    "employer", "licensor", "licensee", "landlord", "tenant", "lessor", "lessee", "buyer", "seller",
+    "purchaser", "provider", "service provider", "recipient", "disclosing party", "receiving party",
+    "borrower", "lender", "guarantor", "plaintiff", "defendant", "petitioner", "respondent",
+    "franchisor", "franchisee", "distributor", "agent", "principal", "partner", "investor", "shareholder"
+}
+LEADING_NAME_WORDS = {"the", "this", "by", "and", "between", "among", "whereas", "agreement"}
+
+_MONTH = r"(?:January|February|March|April|May|June|July|August|September|October|November|December|" \
+         r"Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sept|Sep|Oct|Nov|Dec)\.?"
+_NUMBER_WORD = "|".join(sorted((re.escape(word) for word in NUMBER_WORDS), key=len, reverse=True))
+_ENTITY_SUFFIX = r"(?:Inc|LLC|L\.L\.C|Ltd|Limited|Corp|Corporation|Company|Co|LLP|LP|GmbH|plc|Pvt\.? Ltd)\b\.?"
+_NAME = r"[A-Z][\w&'-]*(?:\s+(?:of\s+|and\s+|&\s+)?[A-Z][\w&'-]*){0,5}"
+
+# Every kind of fact in one alternation so the text is scanned once; the alternation is
+# only tried where a word or a currency symbol starts
+FACT_PATTERN = re.compile(
+    r"(?<!\w)(?=[\w$€£₹])(?:"
+    r"(?P<date>(?i:" + _MONTH + r")\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?(?i:" + _MONTH + r"),?\s+\d{4}"
+    r"|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}/\d{1,2}/\d{4}\b)"
+    r"|(?P<amount>(?:[$€£₹]|\b(?i:USD|EUR|GBP|INR|Rs\.?)\s?)\s?\d[\d,]*(?:\.\d+)?(?:\s?(?i:thousand|million|billion|k)\b)?"
+    r"|\b\d[\d,]*(?:\.\d+)?\s?(?:(?i:thousand|million|billion)\s)?(?i:dollars|USD|euros|EUR|pounds|GBP|rupees|INR)\b)"
+    r"|(?P<deadline>\b(?i:within|no\s+later\s+than|not\s+later\s+than|not\s+less\s+than|at\s+least|"
+    r"for\s+a\s+period\s+of|prior\s+to|before|after|following)\s+"
+    r"(?:(?i:[a-z]+(?:[- ][a-z]+)?)\s+\(\d+\)|\d+|(?i:" + _NUMBER_WORD + r"))\s+"
+    r"(?i:(?:business\s+|calendar\s+|working\s+)?(?:days?|weeks?|months?|years?))\b)"
+    r"|(?P<party>(?P<party_name>" + _NAME + r")(?P<party_suffix>,?\s+" + _ENTITY_SUFFIX + r")?"
+    r"(?:,?\s+an?\s+[^()\"“”\n]{0,80}?)?\s*\(\s*(?i:the\s+|hereinafter\s+(?:referred\s+to\s+as\s+|called\s+)?)?"
+    r"[\"“](?P<party_alias>[A-Z][^\"”]{1,40})[\"”]\s*\))"
+    r"|(?P<organization>" + _NAME + r",?\s+" + _ENTITY_SUFFIX + r"))"
+)
+DEADLINE_NUMBER_PATTERN = re.compile(r"\((\d+)\)|\b(\d+)\b")
+DEADLINE_UNIT_PATTERN = re.compile(r"(business|calendar|working)?\s*(day|week|month|year)s?\s*$", re.IGNORECASE)
+AMOUNT_NUMBER_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+SENTENCE_BREAK_PATTERN = re.compile(r"[.;!?]\s|\n")
+ENTITY_SUFFIX_PATTERN = re.compile(r",?\s*" + _ENTITY_SUFFIX + r"$")
+
+class Party(BaseModel):
+    """A party to the document and the defined terms it is referred to by."""
+    name: str
+    aliases: List[str] = Field(default_factory=list)
+
+class DatedEvent(BaseModel):
+    """A date mentioned in the document, with the sentence it appears in."""
+    date: str  # ISO format
+    text: str
+    context: str
+
+class MonetaryAmount(BaseModel):
+    """An amount of money mentioned in the document."""
+    amount: float
+    currency: str
+    text: str
+    context: str
+
+class Deadline(BaseModel):
+    """A period relative to some event, e.g. "within thirty (30) days"."""
+    value: int
+    unit: str  # day, week, month or year
+    business_days: bool = False
+    days: int  # Approximate length in calendar days
+    text: str
+    context: str
+
+class LegalFacts(BaseModel):
+    """Facts extracted from a legal document without the LLM."""
+    parties: List[Party] = Field(default_factory=list)
+    timeline: List[DatedEvent] = Field(default_factory=list)
+    amounts: List[MonetaryAmount] = Field(default_factory=list)
+    deadlines: List[Deadline] = Field(default_factory=list)
+    extraction_ms: float = 0.0
+
+def normalize_date(text: str) -> Optional[str]:
+    """ISO date of a matched date string; numeric dates are read as month/day unless the first part exceeds 12."""
+    numbers = [int(number) for number in re.findall(r"\d+", text)]
+    month_name = re.search(r"[A-Za-z]{3,}", re.sub(r"(?i)\b(?:day|of|st|nd|rd|th)\b", " ", text))
+    try:
+        if month_name:
+            month = MONTHS.get(month_name.group(0).lower())
+            day, year = numbers[0], numbers[-1]
+            return date(year, month, day).isoformat() if month else None
+        if "-" in text:
+            year, month, day = numbers
+        else:
+            month, day, year = numbers
+            if month > 12:
+                month, day = day, month
+        return date(year, month, day).isoformat()
+    except (ValueError, TypeError, IndexError):
+        return None
+
+def normalize_amount(text: str) -> Optional[MonetaryAmount]:
+    """Numeric value and currency code of a matched amount."""
+    number = AMOUNT_NUMBER_PATTERN.search(text)
+    if number is None:
+        return None
+    lowered = text.lower()
+    currency = next((code for symbol, code in CURRENCY_CODES.items()
+                     if (symbol in lowered if not symbol.isalpha() else re.search(rf"\b{symbol}\b", lowered))), "USD")
+    amount = float(number.group(0).replace(",", ""))
+    for word, factor in MAGNITUDES.items():
+        if re.search(rf"\d\s?{word}\b", lowered):
+            amount *= factor
+    return MonetaryAmount(amount=amount, currency=currency, text=text, context="")
+
+def normalize_deadline(text: str) -> Optional[Deadline]:
+    """Number, unit and approximate length in days of a matched deadline."""
+    number = DEADLINE_NUMBER_PATTERN.search(text)
+    if number:
+        value = int(number.group(1) or number.group(2))
+    else:
+        lowered = text.lower()
+        value = next((NUMBER_WORDS[word] for word in sorted(NUMBER_WORDS, key=len, reverse=True)
+                      if re.search(rf"\b{word}\b", lowered)), None)
+    unit = DEADLINE_UNIT_PATTERN.search(text)
+    if value is None or unit is None:
+        return None
+    business_days = unit.group(1) is not None and unit.group(1).lower() in ("business", "working")
+    unit_name = unit.group(2).lower()
+    return Deadline(value=value, unit=unit_name, business_days=business_days,
+                    days=value * UNIT_DAYS[unit_name], text=text, context="")
+
+def _context(text: str, start: int, end: int) -> str:
+    """The sentence around a match, clipped to CONTEXT_CHARS on each side."""
+    window_start = max(0, start - CONTEXT_CHARS)
+    breaks = list(SENTENCE_BREAK_PATTERN.finditer(text, window_start, start))
+    sentence_start = breaks[-1].end() if breaks else window_start
+    following = SENTENCE_BREAK_PATTERN.search(text, end, end + CONTEXT_CHARS)
+    sentence_end = following.start() + 1 if following else min(len(text), end + CONTEXT_CHARS)
+    return " ".join(text[sentence_start:sentence_end].split())
+
+def _clean_name(name: str) -> str:
+    words = name.split()
+    while words and words[0].lower() in LEADING_NAME_WORDS:
+        words = words[1:]
+    return " ".join(words).strip(" ,")
+
+def extract_legal_facts(text: str) -> LegalFacts:
+    """
+    Extract parties, dates, amounts and deadlines from a legal document in a single
+    pass of compiled patterns. Dates are normalized to ISO and sorted into a timeline,
+    amounts to a number and currency code, deadlines to a number of days.
+
+    Organizations are parties even without a defined term; references to a defined
+    term ("The Company shall...") are not new parties:
+
+    >>> [party.name for party in extract_legal_facts('Google LLC shall provide support.').parties]
+    ['Google LLC']
+    >>> [party.name for party in extract_legal_facts('Payment shall be made to Acme Widgets, Inc. on request.').parties]
+    ['Acme Widgets, Inc.']
+    >>> extract_legal_facts('The Company shall pay the Vendor.').parties
+    []
+    """
+    start_time = time.perf_counter()
+    parties: Dict[str, Party] = {}
+    facts = LegalFacts()
+    seen_events = set()
+
+    for match in FACT_PATTERN.finditer(text):
+        if match.group("date"):
+            iso_date = normalize_date(match.group("date"))
+            context = _context(text, match.start(), match.end())
+            if iso_date and (iso_date, context) not in seen_events:
+                seen_events.add((iso_date, context))
+                facts.timeline.append(DatedEvent(date=iso_date, text=match.group("date"), context=context))
+        elif match.group("amount"):
+            amount = normalize_amount(match.group("amount").strip())
+            if amount is not None:
+                amount.context = _context(text, match.start(), match.end())
+                facts.amounts.append(amount)
+        elif match.group("deadline"):
+            deadline = normalize_deadline(match.group("deadline"))
+            if deadline is not None:
+                deadline.context = _context(text, match.start(), match.end())
+                facts.deadlines.append(deadline)
+        elif match.group("party"):
+            alias = match.group("party_alias").strip()
+            # Other defined terms ("Agreement", "Effective Date") are not parties
+            if not match.group("party_suffix") and alias.lower() not in PARTY_ROLES:
+                continue
+            name = _clean_name(match.group("party_name") + (match.group("party_suffix") or ""))
+            party = parties.setdefault(name.lower(), Party(name=name or alias))
+            if alias not in party.aliases:
+                party.aliases.append(alias)
+        else:
+            name = _clean_name(match.group("organization"))
+            # "The Company" is a reference to a defined term, not an organization's name
+            if not ENTITY_SUFFIX_PATTERN.sub("", name).strip() or name.lower() in PARTY_ROLES:
+                continue
+            parties.setdefault(name.lower(), Party(name=name))
+
+    facts.parties = list(parties.values())
+    facts.timeline.sort(key=lambda event: event.date)
+    facts.extraction_ms = round((time.perf_counter() - start_time) * 1000, 3)
+    return facts
+
+def format_facts(facts: LegalFacts) -> str:
+    """Plain-text report of the extracted facts, used as the summary in facts-only mode."""
+    lines = ["PARTIES:"]
+    lines += [f"- {party.name}" + (f" ({', '.join(party.aliases)})" if party.aliases else "")
+              for party in facts.parties] or ["- None found"]
+    lines.append("\nTIMELINE:")
+    lines += [f"- {event.date}: {event.context}" for event in facts.timeline] or ["- None found"]
+    lines.append("\nAMOUNTS:")
+    lines += [f"- {amount.currency} {amount.amount:,.2f}: {amount.context}" for amount in facts.amounts] or ["- None found"]
+    lines.append("\nDEADLINES:")
+    lines += [f"- {deadline.value} {'business ' if deadline.business_days else ''}{deadline.unit}(s): {deadline.context}"
+              for deadline in facts.deadlines] or ["- None found"]
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Location of the glossary index and of the seed definitions shipped with the app
+LEGAL_GLOSSARY_PATH = os.getenv(
+    "LEGAL_GLOSSARY_PATH",
+    os.path.join(tempfile.gettempdir(), "ultimate_summarization_glossary.db")
+)
+GLOSSARY_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legal_glossary_seed.json")
+
+# Definitions from web searches are refreshed after this many days; seed definitions never expire
+GLOSSARY_TTL_DAYS = float(os.getenv("LEGAL_GLOSSARY_TTL_DAYS", "30"))
+SECONDS_PER_DAY = 86400
+SEED_SOURCE_TITLE = "Legal glossary"
+
+GLOSSARY_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+# A stored term contained in a concept only answers for it if it covers more than this share of
+# the concept's words, not counting filler like "clause" ("waiver of jury trial" is not "waiver")
+GLOSSARY_MIN_COVERAGE = 0.5
+GLOSSARY_FILLER_WORDS = {"a", "an", "the", "of", "clause", "clauses", "provision", "provisions", "section"}
+
+def normalize_term(term: str) -> str:
+    """Lowercase a concept and collapse punctuation and whitespace, so variants share one entry."""
+    return " ".join(GLOSSARY_WORD_PATTERN.findall(term.lower()))
+
+class LegalGlossary:
+    """
+    Local index of legal concept definitions, in the shape of web search results.
+
+    Entries come from a seed dataset and from earlier web searches. Lookups match the
+    normalized concept first, then the longest stored term contained in it that covers
+    most of its words, through a SQLite FTS5 index (e.g. "force majeure clause" resolves
+    to "force majeure", but "exclusive license" does not resolve to "license").
+    Searched entries expire after ttl_days so they are refreshed; seed entries do not.
+    """
+
+    def __init__(self, path: str = LEGAL_GLOSSARY_PATH, ttl_days: float = GLOSSARY_TTL_DAYS,
+                 seed_path: Optional[str] = GLOSSARY_SEED_PATH):
+        self.path = path
+        self.ttl_seconds = ttl_days * SECONDS_PER_DAY
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS glossary ("
+                "term TEXT PRIMARY KEY, sources TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "is_seed INTEGER NOT NULL DEFAULT 0)"
+            )
+        try:
+            with self._connection:
+                self._connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS glossary_fts USING fts5(term)")
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: fall back to exact matches plus a LIKE scan
+            self.full_text = False
+
+        if seed_path and os.path.exists(seed_path) and self.count() == 0:
+            self.load_seed(seed_path)
+
+    def count(self) -> int:
+        """Number of stored entries."""
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM glossary").fetchone()[0]
+
+    def load_seed(self, seed_path: str) -> int:
+        """Load seed definitions from a JSON list of {"term", "definition"} objects."""
+        with open(seed_path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        for entry in entries:
+            sources = [{"title": SEED_SOURCE_TITLE, "url": "", "content": entry["definition"]}]
+            self.store(entry["term"], sources, is_seed=True)
+        print(f"Loaded {len(entries)} seed glossary entries.")
+        return len(entries)
+
+    def store(self, concept: str, sources: List[Dict], is_seed: bool = False) -> None:
+        """Write (or refresh) the sources of a concept."""
+        term = normalize_term(concept)
+        if not term or not sources:
+            return
+        with self._lock, self._connection:
+            exists = self._connection.execute("SELECT 1 FROM glossary WHERE term = ?", (term,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO glossary (term, sources, updated_at, is_seed) VALUES (?, ?, ?, ?)",
+                (term, json.dumps(sources), time.time(), int(is_seed))
+            )
+            if self.full_text and not exists:
+                self._connection.execute("INSERT INTO glossary_fts (term) VALUES (?)", (term,))
+
+    def _fresh(self, updated_at: float, is_seed: int) -> bool:
+        return bool(is_seed) or time.time() - updated_at < self.ttl_seconds
+
+    def _candidate_terms(self, term: str) -> List[str]:
+        """Stored terms sharing words with the concept, best matches first."""
+        words = term.split()
+        if self.full_text:
+            query = " OR ".join(f'"{word}"' for word in words)
+            rows = self._connection.execute(
+                "SELECT term FROM glossary_fts WHERE glossary_fts MATCH ? ORDER BY bm25(glossary_fts) LIMIT 20",
+                (query,)
+            ).fetchall()
+        else:
+            rows = self._connection.execute(
+                "SELECT term FROM glossary WHERE " + " OR ".join("term LIKE ?" for _ in words) + " LIMIT 50",
+                [f"%{word}%" for word in words]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _coverage(stored_term: str, term: str) -> float:
+        """Share of the concept's non-filler words that a stored term contained in it covers."""
+        words = [word for word in term.split() if word not in GLOSSARY_FILLER_WORDS]
+        covered = [word for word in stored_term.split() if word not in GLOSSARY_FILLER_WORDS]
+        return len(covered) / len(words) if words else 0.0
+
+    def lookup(self, concept: str) -> Optional[List[Dict]]:
+        """Return the sources of a concept if a fresh entry matches it, else None."""
+        term = normalize_term(concept)
+        if not term:
+            return None
+        padded = f" {term} "
+        with self._lock:
+            candidates = [term] + [
+                other for other in self._candidate_terms(term)
+                if other != term and f" {other} " in padded and self._coverage(other, term) > GLOSSARY_MIN_COVERAGE
+            ]
+            # Prefer the exact term, then the longest stored term contained in the concept
+            for candidate in sorted(set(candidates), key=lambda other: (other != term, -len(other))):
+                row = self._connection.execute(
+                    "SELECT sources, updated_at, is_seed FROM glossary WHERE term = ?", (candidate,)
+                ).fetchone()
+                if row and self._fresh(row[1], row[2]):
+                    return json.loads(row[0])
+        return None
+
+    def purge_expired(self) -> int:
+        """Delete searched entries older than the TTL; returns the number removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._connection:
+            expired = [row[0] for row in self._connection.execute(
+                "SELECT term FROM glossary WHERE is_seed = 0 AND updated_at < ?", (cutoff,)
+            ).fetchall()]
+            for term in expired:
+                self._connection.execute("DELETE FROM glossary WHERE term = ?", (term,))
+                if self.full_text:
+                    self._connection.execute("DELETE FROM glossary_fts WHERE term = ?", (term,))
+        return len(expired)
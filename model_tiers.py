@@ -0,0 +1,84 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from pydantic import BaseModel
+
+# Pipeline stages that can run on their own model
+STAGES = ["classify", "extract", "map", "intermediate_reduce", "reduce"]
+# Small, low-latency model used by every stage except the final reduce unless configured otherwise
+DEFAULT_SMALL_MODEL = os.getenv("SMALL_MODEL", "gpt-4o-mini")
+
+class StageMetrics(BaseModel):
+    """Calls, tokens and wall-clock time spent in one pipeline stage."""
+    model: Optional[str] = None
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    seconds: float = 0.0
+
+class StageMetricsRecorder:
+    """Thread-safe accumulator of per-stage metrics for one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, model: Optional[str], input_tokens: int, output_tokens: int,
+               seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            metrics = self.stages.setdefault(stage, StageMetrics(model=model))
+            metrics.calls += calls
+            metrics.input_tokens += input_tokens
+            metrics.output_tokens += output_tokens
+            metrics.seconds = round(metrics.seconds + seconds, 3)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: metrics.model_dump() for stage, metrics in self.stages.items()}
+
+_current_recorder: ContextVar[Optional[StageMetricsRecorder]] = ContextVar("stage_metrics", default=None)
+
+@contextmanager
+def track_stage_metrics() -> Iterator[StageMetricsRecorder]:
+    """Collect the metrics of every stage call made inside the block (including worker threads that copy the context)."""
+    recorder = StageMetricsRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+def record_stage(stage: Optional[str], model: Optional[str], input_tokens: int, output_tokens: int,
+                 seconds: float, calls: int = 1) -> None:
+    """Add a call to the metrics being tracked, if any."""
+    recorder = _current_recorder.get()
+    if recorder is not None and stage is not None:
+        recorder.record(stage, model, input_tokens, output_tokens, seconds, calls)
+
+def resolve_stage_models(reduce_model: str, overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Model name of every stage: explicit overrides first, then <STAGE>_MODEL environment
+    variables, then the small model. The final reduce runs on reduce_model unless overridden.
+    """
+    overrides = overrides or {}
+    unknown = set(overrides) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}; expected some of {STAGES}")
+
+    models = {}
+    for stage in STAGES:
+        if stage == "reduce":
+            models[stage] = overrides.get(stage) or reduce_model
+        else:
+            models[stage] = overrides.get(stage) or os.getenv(f"{stage.upper()}_MODEL") or DEFAULT_SMALL_MODEL
+    return models
+
+def build_stage_llms(stage_models: Dict[str, str], factory: Callable[[str], Any]) -> Dict[str, Any]:
+    """Create one LLM client per distinct model and map every stage to its client."""
+    clients = {}
+    for model in set(stage_models.values()):
+        clients[model] = factory(model)
+    return {stage: clients[model] for stage, model in stage_models.items()}
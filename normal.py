@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Iterable, Iterator, Tuple
 from dotenv import load_dotenv
 import PyPDF2
 import docx
@@ -11,6 +11,20 @@ import json
 from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 import math
+from collections import Counter
+from token_utils import estimate_tokens
+from extractive import extract_top_sentences, resolve_keep_ratio, split_sentences, build_tfidf_matrix, textrank_scores
+from dedup import find_near_duplicates, DEFAULT_SIMILARITY_THRESHOLD
+from tree_reduce import TreeReducer, reduce_token_limit, MAX_REDUCE_LEVELS
+from keyphrases import extract_keyphrases, central_sentences
+from versioning import SummaryCache, VersionDiff, content_defined_chunks, content_hash
+from routing import LatencyModel, RouteDecision, get_latency_model, route_document
+from model_tiers import StageMetrics, build_stage_llms, resolve_stage_models, track_stage_metrics
+
+try:
+    import fitz  # PyMuPDF, used for layout-aware sectioning of PDFs
+except ImportError:
+    fitz = None
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +32,55 @@ load_dotenv()
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Average reading speed used for reading time estimates
+WORDS_PER_MINUTE = 200.0
+
+# Block size used when streaming plain text files
+TXT_BLOCK_SIZE = 64 * 1024
+
+# Compiled patterns for statistics; kept at module level so they compile once
+WORD_PATTERN = re.compile(r'\b\w+\b')
+SENTENCE_DELIMITER_PATTERN = re.compile(r'[.!?]+')
+PARAGRAPH_DELIMITER_PATTERN = re.compile(r'\n\n+')
+WORD_CHAR_PATTERN = re.compile(r'\w')
+NON_SPACE_PATTERN = re.compile(r'\S')
+LEADING_NEWLINES_PATTERN = re.compile(r'\n*')
+TRAILING_NEWLINES_PATTERN = re.compile(r'\n*\Z')
+
+# Heuristic section header patterns
+NUMBERED_HEADER_PATTERN = re.compile(r'^(\d+\.|\(?\d+\)?)\s+[A-Z]')
+SHORT_TITLE_HEADER_PATTERN = re.compile(r'^[A-Z][a-zA-Z\s]{0,30}:?$')
+PAGE_NUMBER_PATTERN = re.compile(r'^(page\s+)?\d+(\s+of\s+\d+)?$', re.IGNORECASE)
+
+# Layout-aware sectioning parameters
+SECTIONING_MODES = ["auto", "layout", "heuristic"]
+DEFAULT_SECTION_TOKEN_BUDGET = 3000
+HEADING_SIZE_RATIO = 1.15  # Font size relative to body text that marks a heading
+MAX_HEADING_CHARS = 120
+MAX_HEADING_LEVELS = 3
+FONT_FLAG_BOLD = 16  # PyMuPDF span flag bit for bold text
+
+# Section planner parameters
+SECTION_SUMMARY_TOKENS = {"very_concise": 120, "balanced": 250, "detailed": 500}  # Expected output per section summary
+REDUCE_CALLS = 1  # Summaries, topics and key points come from one structured call
+REDUCE_OUTPUT_RATIO = 4  # Structured reduce output relative to one section summary
+REDUCE_RESERVED_TOKENS = 2000  # Room kept in the context window for the reduce prompt and its answer
+INTERMEDIATE_SUMMARY_RATIO = 2  # An intermediate tree-reduce summary is about this many section summaries long
+PLANNER_RESOLUTION = 1000  # Maximum number of capacity buckets in the knapsack table
+
+# Local (no LLM) topic and key point extraction
+METADATA_MODES = ["llm", "local"]
+LOCAL_TOPIC_COUNTS = {"very_concise": 5, "balanced": 8, "detailed": 12}
+LOCAL_KEY_POINT_COUNTS = {"very_concise": 3, "balanced": 5, "detailed": 8}
+LOCAL_OVERVIEW_SENTENCES = 3
+
+# Settings that steer the pipeline itself and are not shown to the LLM
+PIPELINE_SETTING_KEYS = {
+    "sectioning", "section_token_budget", "max_input_tokens",
+    "extractive_prefilter", "extractive_keep_ratio", "duplicate_threshold",
+    "metadata_mode", "metadata_only", "document_key"
+}
+
 class SummarySettings(BaseModel):
     """Settings for document summary generation."""
     conciseness: str = Field(default="balanced", description="Level of summary conciseness: 'very_concise', 'balanced', or 'detailed'")
@@ -26,6 +89,15 @@ class SummarySettings(BaseModel):
     extract_key_points: bool = Field(default=True, description="Whether to extract key points from the document")
     include_statistics: bool = Field(default=False, description="Whether to include basic document statistics")
     summary_length_percentage: Optional[float] = Field(default=None, description="Target summary length as percentage of original")
+    sectioning: str = Field(default="auto", description="Section detection mode: 'auto', 'layout' (PDF font metadata) or 'heuristic'")
+    section_token_budget: int = Field(default=DEFAULT_SECTION_TOKEN_BUDGET, description="Maximum tokens per section sent to the map stage; smaller sections are merged up to it")
+    max_input_tokens: Optional[int] = Field(default=None, description="Upper bound on document tokens sent to the map stage")
+    extractive_prefilter: bool = Field(default=False, description="Whether to keep only the most central sentences before any LLM call")
+    extractive_keep_ratio: Optional[float] = Field(default=None, description="Share of sentences kept by the extractive pre-filter; derived from conciseness when unset")
+    metadata_mode: str = Field(default="llm", description="How topics and key points are extracted: 'llm' (higher quality) or 'local' (milliseconds, no LLM call)")
+    metadata_only: bool = Field(default=False, description="Return locally extracted topics, key points and an extractive overview without any LLM call")
+    duplicate_threshold: Optional[float] = Field(default=DEFAULT_SIMILARITY_THRESHOLD, description="Similarity above which sections are summarized once; None disables deduplication")
+    document_key: Optional[str] = Field(default=None, description="Key of a versioned document; unchanged sections of a new version reuse the summaries of the previous one")
     
     model_config = {
         "extra": "allow"
@@ -43,12 +115,50 @@ class SummarySettings(BaseModel):
         if v is not None and (v <= 0 or v > 100):
             raise ValueError("summary_length_percentage must be between 1 and 100")
         return v
+    
+    @field_validator('sectioning')
+    def validate_sectioning(cls, v):
+        if v not in SECTIONING_MODES:
+            raise ValueError(f"sectioning must be one of {SECTIONING_MODES}")
+        return v
+    
+    @field_validator('max_input_tokens')
+    def validate_max_input_tokens(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("max_input_tokens must be positive")
+        return v
+    
+    @field_validator('extractive_keep_ratio')
+    def validate_extractive_keep_ratio(cls, v):
+        if v is not None and not 0 < v <= 1:
+            raise ValueError("extractive_keep_ratio must be between 0 and 1")
+        return v
+    
+    @field_validator('metadata_mode')
+    def validate_metadata_mode(cls, v):
+        if v not in METADATA_MODES:
+            raise ValueError(f"metadata_mode must be one of {METADATA_MODES}")
+        return v
+    
+    @field_validator('duplicate_threshold')
+    def validate_duplicate_threshold(cls, v):
+        if v is not None and not 0 < v <= 1:
+            raise ValueError("duplicate_threshold must be between 0 and 1")
+        return v
+    
+    @field_validator('section_token_budget')
+    def validate_section_token_budget(cls, v):
+        if v < 100:
+            raise ValueError("section_token_budget must be at least 100")
+        return v
 
 class DocumentSection(BaseModel):
     """Section of a document with title and content."""
     title: Optional[str] = None
     content: str
     importance_score: Optional[float] = None
+    level: Optional[int] = None
+    children: List["DocumentSection"] = Field(default_factory=list)
     
     model_config = {
         "extra": "allow"
@@ -65,6 +175,107 @@ class DocumentStatistics(BaseModel):
         "extra": "allow"
     }
 
+class DocumentStatisticsAccumulator:
+    """
+    Single-pass statistics engine over streamed text chunks (e.g. PDF pages).
+    
+    Counts match the previous list-based implementation (regex words, sentences
+    split on terminal punctuation, paragraphs split on blank lines), but only a
+    few flags are carried between chunks, so no word, sentence or paragraph
+    lists are materialized and chunk boundaries are handled correctly.
+    """
+    
+    def __init__(self):
+        self.word_count = 0
+        self.sentence_count = 0
+        self.paragraph_count = 0
+        self._ends_in_word = False
+        self._sentence_open = False
+        self._paragraph_open = False
+        self._trailing_newlines = 0
+    
+    def update(self, chunk: str) -> None:
+        """Fold one chunk of text into the running counts."""
+        if not chunk:
+            return
+        
+        # Words: a word split across two chunks is counted once
+        words = sum(1 for _ in WORD_PATTERN.finditer(chunk))
+        if words and self._ends_in_word and WORD_PATTERN.match(chunk):
+            words -= 1
+        self.word_count += words
+        self._ends_in_word = WORD_CHAR_PATTERN.match(chunk, len(chunk) - 1) is not None
+        
+        # Sentences: count non-blank segments between delimiter runs
+        pos = 0
+        for match in SENTENCE_DELIMITER_PATTERN.finditer(chunk):
+            if NON_SPACE_PATTERN.search(chunk, pos, match.start()):
+                self._sentence_open = True
+            if self._sentence_open:
+                self.sentence_count += 1
+                self._sentence_open = False
+            pos = match.end()
+        if NON_SPACE_PATTERN.search(chunk, pos):
+            self._sentence_open = True
+        
+        # Paragraphs: a blank line may straddle the previous chunk boundary
+        leading_newlines = LEADING_NEWLINES_PATTERN.match(chunk).end()
+        if self._trailing_newlines and self._trailing_newlines + leading_newlines >= 2:
+            self._close_paragraph()
+        pos = 0
+        for match in PARAGRAPH_DELIMITER_PATTERN.finditer(chunk):
+            if NON_SPACE_PATTERN.search(chunk, pos, match.start()):
+                self._paragraph_open = True
+            self._close_paragraph()
+            pos = match.end()
+        if NON_SPACE_PATTERN.search(chunk, pos):
+            self._paragraph_open = True
+        
+        if leading_newlines == len(chunk):
+            self._trailing_newlines += leading_newlines
+        else:
+            self._trailing_newlines = len(chunk) - TRAILING_NEWLINES_PATTERN.search(chunk).start()
+    
+    def _close_paragraph(self) -> None:
+        if self._paragraph_open:
+            self.paragraph_count += 1
+            self._paragraph_open = False
+    
+    def consume(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Pass chunks through unchanged while counting them, so statistics are
+        computed during loading instead of in a separate pass."""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+    
+    def result(self) -> DocumentStatistics:
+        """Return the statistics for everything seen so far."""
+        return DocumentStatistics(
+            word_count=self.word_count,
+            sentence_count=self.sentence_count + (1 if self._sentence_open else 0),
+            paragraph_count=self.paragraph_count + (1 if self._paragraph_open else 0),
+            estimated_reading_time_minutes=self.word_count / WORDS_PER_MINUTE
+        )
+
+class SectionPlan(BaseModel):
+    """Sections chosen for the map stage and the predicted cost, computed before any LLM call."""
+    total_sections: int
+    selected_sections: List[int] = Field(default_factory=list)  # Indices in document order
+    token_budget: Optional[int] = None
+    total_input_tokens: int
+    selected_input_tokens: int
+    total_importance: float
+    selected_importance: float
+    llm_calls: int
+    estimated_input_tokens: int
+    estimated_output_tokens: int
+    tree_reduce_calls: int = 0  # Intermediate reduce calls needed when summaries overflow the context
+    duplicate_sections: int = 0  # Near-duplicate sections folded into another; one map call saved each
+    
+    model_config = {
+        "extra": "allow"
+    }
+
 class Topic(BaseModel):
     """Topic extracted from a document."""
     name: str
@@ -92,6 +303,10 @@ class SummaryResult(BaseModel):
     topics: List[Topic] = Field(default_factory=list)
     key_points: List[KeyPoint] = Field(default_factory=list)
     statistics: Optional[DocumentStatistics] = None
+    section_plan: Optional[SectionPlan] = None
+    version: Optional[VersionDiff] = None
+    route: Optional[RouteDecision] = None
+    stage_metrics: Dict[str, StageMetrics] = Field(default_factory=dict)
     processing_time: float
     processed_at: datetime = Field(default_factory=datetime.now)
     
@@ -105,13 +320,26 @@ class GeneralDocumentSummarizer:
     including PDF, Word, and plain text files.
     """
     
-    def __init__(self, model_name="gpt-4o-mini", temperature=0.0):
-        """Initialize the document summarizer with necessary components."""
-        self.llm = ChatOpenAI(
-            model=model_name,
+    def __init__(self, model_name="gpt-4o-mini", temperature=0.0,
+                 summary_cache: Optional[SummaryCache] = None,
+                 stage_models: Optional[Dict[str, str]] = None):
+        """
+        Initialize the document summarizer with necessary components.
+        
+        summary_cache stores section summaries of versioned documents; one is opened
+        on first use if not given. model_name is used for the final summary; stage_models
+        overrides the model of the map and intermediate_reduce stages, which default to a
+        small model.
+        """
+        self.model_name = model_name
+        self.summary_cache = summary_cache
+        self.stage_models = resolve_stage_models(model_name, stage_models)
+        self.stage_llms = build_stage_llms(self.stage_models, lambda model: ChatOpenAI(
+            model=model,
             temperature=temperature,
             openai_api_key=OPENAI_API_KEY
-        )
+        ))
+        self.llm = self.stage_llms["reduce"]
         
         # Text splitter tuned for general documents
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -123,7 +351,7 @@ class GeneralDocumentSummarizer:
         
         # Document analysis prompt template
         self.document_analysis_prompt = PromptTemplate(
-            input_variables=["document_text", "settings"],
+            input_variables=["document_text", "settings", "response_fields", "response_schema"],
             template="""
             You are an expert document analyst capable of identifying key topics, extracting important points, 
             and creating concise summaries that preserve the core meaning of documents.
@@ -136,35 +364,14 @@ class GeneralDocumentSummarizer:
             
             Please analyze this document and provide a structured JSON response that includes:
             
-            1. An executive summary that captures the essential information
-            2. A list of main topics discussed in the document
-            3. Key points from the document
-            4. Any statistics mentioned
+            {response_fields}
             
             The summary should be {settings[conciseness]}, focusing on the most important information.
             
             Format your response as a valid JSON object with the following structure:
             
             ```json
-            {{
-                "executive_summary": "Concise overview of the entire document",
-                "topics": [
-                    {{
-                        "name": "First topic name",
-                        "relevance_score": 0.95,
-                        "related_sentences": ["Related sentence 1", "Related sentence 2"]
-                    }},
-                    ...
-                ],
-                "key_points": [
-                    {{
-                        "point": "First key point",
-                        "importance_score": 0.92,
-                        "supporting_evidence": ["Evidence 1", "Evidence 2"]
-                    }},
-                    ...
-                ]
-            }}
+            {response_schema}
             ```
             
             Focus on extracting factual information and the main arguments or conclusions.
@@ -188,9 +395,26 @@ class GeneralDocumentSummarizer:
             """
         )
         
+        # Intermediate reduce prompt for summaries that overflow the combine prompt
+        self.intermediate_reduce_prompt = PromptTemplate(
+            input_variables=["section_summaries"],
+            template="""
+            You are an expert document analyst. The following are summaries of consecutive sections
+            of one document. Merge them into a single summary that keeps the section names that matter,
+            the key facts, figures and conclusions, in the original order, without repetition.
+            
+            SECTION SUMMARIES:
+            {section_summaries}
+            """
+        )
+        self.tree_reducer = TreeReducer(self._reduce_summaries, min(
+            reduce_token_limit(model_name, REDUCE_RESERVED_TOKENS),
+            reduce_token_limit(self.stage_models["intermediate_reduce"], REDUCE_RESERVED_TOKENS)
+        ))
+        
         # Combined summary prompt
         self.combined_summary_prompt = PromptTemplate(
-            input_variables=["section_summaries", "settings", "document_statistics"],
+            input_variables=["section_summaries", "settings", "document_statistics", "response_fields", "response_schema"],
             template="""
             You are an expert document analyst. Based on the summaries of individual sections,
             create a comprehensive summary of the entire document.
@@ -204,86 +428,110 @@ class GeneralDocumentSummarizer:
             SETTINGS:
             {settings}
             
-            Create two summaries:
-            1. An executive summary (1-2 paragraphs) that provides a high-level overview
-            2. A detailed summary that integrates the key information from all sections
+            Provide a structured JSON response that includes:
             
-            Both summaries should be {settings[conciseness]} and should accurately represent the original document's
+            {response_fields}
+            
+            The summaries should be {settings[conciseness]} and should accurately represent the original document's
             content, tone, and conclusions.
+            
+            Format your response as a valid JSON object with the following structure:
+            
+            ```json
+            {response_schema}
+            ```
             """
         )
+        
+        # Provider JSON mode for the structured prompts
+        self.json_llm = self.llm.bind(response_format={"type": "json_object"})
     
     def load_document(self, file_path: str) -> str:
         """Load text from various document formats (PDF, DOCX, TXT)."""
+        return "".join(self.iter_document(file_path))
+    
+    def iter_document(self, file_path: str) -> Iterator[str]:
+        """Stream text from a document one page (or block) at a time."""
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
-            return self._load_pdf(file_path)
+            return self._iter_pdf(file_path)
         elif file_extension == '.docx':
-            return self._load_docx(file_path)
+            return self._iter_docx(file_path)
         elif file_extension == '.txt':
-            return self._load_txt(file_path)
+            return self._iter_txt(file_path)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
     
+    def load_document_with_statistics(self, file_path: str) -> Tuple[str, DocumentStatistics]:
+        """Load a document and compute its statistics in the same pass over its pages."""
+        accumulator = DocumentStatisticsAccumulator()
+        text = "".join(accumulator.consume(self.iter_document(file_path)))
+        return text, accumulator.result()
+    
     def _load_pdf(self, pdf_path: str) -> str:
         """Extract text from a PDF document."""
+        return "".join(self._iter_pdf(pdf_path))
+    
+    def _load_docx(self, docx_path: str) -> str:
+        """Extract text from a Word document."""
+        return "".join(self._iter_docx(docx_path))
+    
+    def _load_txt(self, txt_path: str) -> str:
+        """Load text from a TXT file."""
+        return "".join(self._iter_txt(txt_path))
+    
+    def _iter_pdf(self, pdf_path: str) -> Iterator[str]:
+        """Yield the text of a PDF document page by page."""
         print(f"Loading PDF from {pdf_path}...")
         
-        text = ""
+        total_chars = 0
         with open(pdf_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text += page.extract_text() + "\n\n"
+            for page in reader.pages:
+                page_text = page.extract_text() + "\n\n"
+                total_chars += len(page_text)
+                yield page_text
         
-        print(f"Extracted {len(text)} characters from PDF.")
-        return text
+        print(f"Extracted {total_chars} characters from PDF.")
     
-    def _load_docx(self, docx_path: str) -> str:
-        """Extract text from a Word document."""
+    def _iter_docx(self, docx_path: str) -> Iterator[str]:
+        """Yield the text of a Word document paragraph by paragraph."""
         print(f"Loading Word document from {docx_path}...")
         
         doc = docx.Document(docx_path)
-        text = "\n\n".join([paragraph.text for paragraph in doc.paragraphs])
+        total_chars = 0
+        for i, paragraph in enumerate(doc.paragraphs):
+            paragraph_text = paragraph.text if i == 0 else "\n\n" + paragraph.text
+            total_chars += len(paragraph_text)
+            yield paragraph_text
         
-        print(f"Extracted {len(text)} characters from Word document.")
-        return text
+        print(f"Extracted {total_chars} characters from Word document.")
     
-    def _load_txt(self, txt_path: str) -> str:
-        """Load text from a TXT file."""
+    def _iter_txt(self, txt_path: str) -> Iterator[str]:
+        """Yield a TXT file in fixed-size blocks."""
         print(f"Loading text file from {txt_path}...")
         
+        total_chars = 0
         with open(txt_path, 'r', encoding='utf-8') as file:
-            text = file.read()
+            while True:
+                block = file.read(TXT_BLOCK_SIZE)
+                if not block:
+                    break
+                total_chars += len(block)
+                yield block
         
-        print(f"Extracted {len(text)} characters from text file.")
-        return text
+        print(f"Extracted {total_chars} characters from text file.")
     
-    def compute_document_statistics(self, text: str) -> DocumentStatistics:
-        """Compute basic document statistics."""
-        # Count words
-        words = re.findall(r'\b\w+\b', text)
-        word_count = len(words)
-        
-        # Count sentences using regex-based approach
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        sentence_count = len(sentences)
-        
-        # Count paragraphs
-        paragraphs = text.split('\n\n')
-        paragraph_count = len([p for p in paragraphs if p.strip()])  # Count non-empty paragraphs
-        
-        # Estimate reading time (assuming average reading speed of 200 words per minute)
-        estimated_reading_time_minutes = word_count / 200.0
-        
-        return DocumentStatistics(
-            word_count=word_count,
-            sentence_count=sentence_count,
-            paragraph_count=paragraph_count,
-            estimated_reading_time_minutes=estimated_reading_time_minutes
-        )
+    def compute_document_statistics(self, text: Union[str, Iterable[str]]) -> DocumentStatistics:
+        """Compute basic document statistics from a string or a stream of chunks."""
+        accumulator = DocumentStatisticsAccumulator()
+        if isinstance(text, str):
+            accumulator.update(text)
+        else:
+            for chunk in text:
+                accumulator.update(chunk)
+        return accumulator.result()
     
     def _split_into_sections(self, text: str) -> List[DocumentSection]:
         """Split document into sections based on structure."""
@@ -302,8 +550,8 @@ class GeneralDocumentSummarizer:
             # Check if this line looks like a header
             is_header = (
                 (len(line) < 60 and (line.isupper() or line.istitle())) or
-                re.match(r'^(\d+\.|\(?\d+\)?)\s+[A-Z]', line) or  # Numbered section
-                re.match(r'^[A-Z][a-zA-Z\s]{0,30}:?$', line)  # Title case short line
+                NUMBERED_HEADER_PATTERN.match(line) or  # Numbered section
+                SHORT_TITLE_HEADER_PATTERN.match(line)  # Title case short line
             )
             
             if is_header:
@@ -338,6 +586,240 @@ class GeneralDocumentSummarizer:
         
         return sections
     
+    def _build_sections(self, document_text: str, document_path: Optional[str],
+                        settings: Dict[str, Any]) -> List[DocumentSection]:
+        """Split a document into sections and merge them up to the section token budget."""
+        budget = settings.get('section_token_budget') or DEFAULT_SECTION_TOKEN_BUDGET
+        if settings.get('document_key'):
+            # Heading-based merging shifts every later boundary after an edit; content-defined
+            # chunks keep unchanged passages in identical sections across versions
+            chunks = content_defined_chunks(document_text, budget)
+            print(f"Split versioned document into {len(chunks)} content-defined sections.")
+            return [DocumentSection(content=chunk) for chunk in chunks]
+        
+        mode = settings.get('sectioning', 'auto')
+        sections = []
+        
+        is_pdf = bool(document_path) and document_path.lower().endswith('.pdf')
+        if mode in ('auto', 'layout') and is_pdf:
+            if fitz is None:
+                print("PyMuPDF is not installed, falling back to heuristic sectioning.")
+            else:
+                sections = self._split_into_sections_by_layout(document_path)
+        elif mode == 'layout':
+            print("Layout sectioning is only available for PDFs, using heuristic sectioning.")
+        
+        if not sections:
+            sections = self._split_into_sections(document_text)
+        
+        return self._merge_sections(sections, budget)
+    
+    def _extract_layout_lines(self, pdf_path: str) -> List[Dict[str, Any]]:
+        """Read text lines with their font size, weight and position using PyMuPDF."""
+        lines = []
+        with fitz.open(pdf_path) as doc:
+            for page_number, page in enumerate(doc):
+                previous_bottom = None
+                for block in page.get_text("dict")["blocks"]:
+                    # Image blocks carry no lines
+                    for line in block.get("lines", []):
+                        spans = [span for span in line["spans"] if span["text"].strip()]
+                        if not spans:
+                            continue
+                        top, bottom = line["bbox"][1], line["bbox"][3]
+                        lines.append({
+                            "text": " ".join(span["text"].strip() for span in spans),
+                            "size": round(max(span["size"] for span in spans), 1),
+                            "bold": all(
+                                span["flags"] & FONT_FLAG_BOLD or "bold" in span["font"].lower()
+                                for span in spans
+                            ),
+                            "gap_above": top - previous_bottom if previous_bottom is not None else 0.0,
+                            "page": page_number
+                        })
+                        previous_bottom = bottom
+        return lines
+    
+    def _split_into_sections_by_layout(self, pdf_path: str) -> List[DocumentSection]:
+        """
+        Build a section tree from PDF font metadata.
+        
+        Lines set in a noticeably larger font than the body text, or short bold lines
+        set apart from the text above them, are treated as headings. Heading font
+        sizes are ranked to assign nesting levels. Running headers/footers and page
+        numbers are dropped. Returns an empty list when no headings are found.
+        """
+        lines = self._extract_layout_lines(pdf_path)
+        if not lines:
+            return []
+        
+        # Body text size is the size carrying the most characters
+        size_weights = Counter()
+        for line in lines:
+            size_weights[line["size"]] += len(line["text"])
+        body_size = size_weights.most_common(1)[0][0]
+        
+        # Text repeated on many pages is a running header or footer
+        page_count = lines[-1]["page"] + 1
+        pages_by_text = {}
+        for line in lines:
+            pages_by_text.setdefault(line["text"], set()).add(line["page"])
+        repeated_threshold = max(3, page_count // 2)
+        
+        def is_heading(line):
+            text = line["text"]
+            if len(text) > MAX_HEADING_CHARS or text[-1] in ".,;" or not any(c.isalpha() for c in text):
+                return False
+            if line["size"] >= body_size * HEADING_SIZE_RATIO:
+                return True
+            return line["bold"] and line["size"] >= body_size and line["gap_above"] > body_size * 0.5
+        
+        kept_lines = []
+        for line in lines:
+            if PAGE_NUMBER_PATTERN.match(line["text"]) or len(pages_by_text[line["text"]]) >= repeated_threshold:
+                continue
+            line["is_heading"] = is_heading(line)
+            kept_lines.append(line)
+        
+        heading_sizes = sorted({line["size"] for line in kept_lines if line["is_heading"]}, reverse=True)
+        if not heading_sizes:
+            return []
+        level_by_size = {size: min(i + 1, MAX_HEADING_LEVELS) for i, size in enumerate(heading_sizes)}
+        
+        # Build the tree with a stack of open sections
+        roots = []
+        stack = []
+        content_parts = {}
+        preamble = DocumentSection(title=None, content="", level=0)
+        content_parts[id(preamble)] = []
+        current = preamble
+        previous_was_heading = False
+        
+        for line in kept_lines:
+            if line["is_heading"]:
+                level = level_by_size[line["size"]]
+                # Headings wrapped over several lines continue the same title
+                if previous_was_heading and current.level == level and not content_parts[id(current)]:
+                    current.title = f"{current.title} {line['text']}"
+                    continue
+                
+                section = DocumentSection(title=line["text"], content="", level=level)
+                content_parts[id(section)] = []
+                while stack and stack[-1].level >= level:
+                    stack.pop()
+                (stack[-1].children if stack else roots).append(section)
+                stack.append(section)
+                current = section
+                previous_was_heading = True
+            else:
+                content_parts[id(current)].append(line["text"])
+                previous_was_heading = False
+        
+        def fill_content(section):
+            section.content = "\n".join(content_parts[id(section)])
+            for child in section.children:
+                fill_content(child)
+        
+        fill_content(preamble)
+        for root in roots:
+            fill_content(root)
+        if preamble.content:
+            roots.insert(0, preamble)
+        
+        sections = self._flatten_section_tree(roots)
+        print(f"Layout analysis found {len(heading_sizes)} heading levels and {len(sections)} sections.")
+        return sections
+    
+    def _flatten_section_tree(self, sections: List[DocumentSection],
+                              parent_titles: Optional[List[str]] = None) -> List[DocumentSection]:
+        """Flatten a section tree in document order, prefixing titles with their parents."""
+        parent_titles = parent_titles or []
+        flat = []
+        for section in sections:
+            titles = parent_titles + [section.title] if section.title else parent_titles
+            if section.content.strip():
+                flat.append(DocumentSection(
+                    title=" > ".join(titles) or None,
+                    content=section.content,
+                    level=section.level
+                ))
+            flat.extend(self._flatten_section_tree(section.children, titles))
+        return flat
+    
+    def _merge_sections(self, sections: List[DocumentSection], token_budget: int) -> List[DocumentSection]:
+        """
+        Merge consecutive small sections up to the token budget and split sections that exceed it,
+        so the number of map calls is roughly total tokens divided by the budget.
+        """
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=token_budget,
+            chunk_overlap=token_budget // 10,
+            separators=["\n\n", "\n", ". ", " ", ""],
+            length_function=estimate_tokens
+        )
+        
+        merged = []
+        titles = []
+        parts = []
+        used_tokens = 0
+        
+        def flush():
+            if parts:
+                title = titles[0] if titles else None
+                if len(titles) > 1:
+                    title = f"{title} (+{len(titles) - 1} more)"
+                merged.append(DocumentSection(title=title, content="\n\n".join(parts)))
+        
+        for section in sections:
+            tokens = estimate_tokens(section.content)
+            if tokens > token_budget:
+                flush()
+                titles, parts, used_tokens = [], [], 0
+                pieces = splitter.split_text(section.content)
+                for i, piece in enumerate(pieces):
+                    title = section.title or "Section"
+                    merged.append(DocumentSection(
+                        title=f"{title} (part {i + 1}/{len(pieces)})",
+                        content=piece,
+                        level=section.level
+                    ))
+                continue
+            
+            if used_tokens + tokens > token_budget:
+                flush()
+                titles, parts, used_tokens = [], [], 0
+            
+            if section.title:
+                titles.append(section.title)
+                parts.append(f"{section.title}\n{section.content}")
+            else:
+                parts.append(section.content)
+            used_tokens += tokens
+        
+        flush()
+        print(f"Merged {len(sections)} sections into {len(merged)} sections of at most {token_budget} tokens.")
+        return merged
+    
+    def _deduplicate_sections(self, sections: List[DocumentSection],
+                              threshold: Optional[float]) -> Tuple[List[DocumentSection], int]:
+        """Keep one section per near-duplicate cluster, noting how often it repeats in its title."""
+        if threshold is None or len(sections) < 2:
+            return sections, 0
+        
+        groups = find_near_duplicates([section.content for section in sections], threshold)
+        if not groups.duplicates_removed:
+            return sections, 0
+        
+        sizes = groups.cluster_sizes()
+        unique_sections = []
+        for i in groups.representatives:
+            section = sections[i]
+            if sizes[i] > 1:
+                section.title = f"{section.title or f'Section {i + 1}'} (repeated {sizes[i]} times)"
+            unique_sections.append(section)
+        print(f"Collapsed {groups.duplicates_removed} near-duplicate sections, saving as many LLM calls.")
+        return unique_sections, groups.duplicates_removed
+    
     def _score_section_importance(self, sections: List[DocumentSection]) -> List[DocumentSection]:
         """Score sections by importance using heuristics."""
         # Simple heuristic: length and position
@@ -370,6 +852,105 @@ class GeneralDocumentSummarizer:
         
         return sections
     
+    def plan_sections(self, sections: List[DocumentSection], settings: Dict[str, Any]) -> SectionPlan:
+        """
+        Choose the sections to summarize as a 0/1 knapsack problem: maximize total importance
+        subject to a token budget, and predict the number of LLM calls and tokens involved.
+        
+        The budget comes from ``summary_length_percentage`` (share of the document's tokens)
+        and ``max_input_tokens``. When the section summaries would overflow the model's
+        context window, the extra tree-reduce calls are included in the estimate.
+        Selected sections are returned in document order.
+        """
+        section_tokens = [estimate_tokens(section.content) for section in sections]
+        importances = [section.importance_score or 0.0 for section in sections]
+        total_tokens = sum(section_tokens)
+        
+        budget = None
+        if settings.get('summary_length_percentage') is not None:
+            budget = math.ceil(total_tokens * settings['summary_length_percentage'] / 100)
+        if settings.get('max_input_tokens'):
+            budget = min(budget, settings['max_input_tokens']) if budget else settings['max_input_tokens']
+        
+        if budget is None or budget >= total_tokens:
+            selected = list(range(len(sections)))
+        else:
+            selected = self._knapsack_select(section_tokens, importances, budget)
+            if not selected:
+                # Always summarize something: take the most important section
+                selected = [max(range(len(sections)), key=lambda i: importances[i])]
+        
+        selected.sort()
+        
+        # Section summaries that overflow the reduce prompt need extra tree-reduce calls
+        summary_tokens = SECTION_SUMMARY_TOKENS.get(settings.get('conciseness'), SECTION_SUMMARY_TOKENS['balanced'])
+        tree_reduce_calls = self._estimate_tree_reduce_calls(len(selected) * summary_tokens, summary_tokens)
+        
+        selected_tokens = sum(section_tokens[i] for i in selected)
+        map_overhead = estimate_tokens(self.sectional_summary_prompt.template) + estimate_tokens(str(self._prompt_settings(settings)))
+        reduce_overhead = estimate_tokens(self.combined_summary_prompt.template) + map_overhead
+        map_output = len(selected) * summary_tokens
+        
+        plan = SectionPlan(
+            total_sections=len(sections),
+            selected_sections=selected,
+            token_budget=budget,
+            total_input_tokens=total_tokens,
+            selected_input_tokens=selected_tokens,
+            total_importance=round(sum(importances), 4),
+            selected_importance=round(sum(importances[i] for i in selected), 4),
+            llm_calls=len(selected) + tree_reduce_calls + REDUCE_CALLS,
+            estimated_input_tokens=(selected_tokens + len(selected) * map_overhead
+                                    + tree_reduce_calls * (self.tree_reducer.token_limit + reduce_overhead)
+                                    + REDUCE_CALLS * (min(map_output, self.tree_reducer.token_limit) + reduce_overhead)),
+            estimated_output_tokens=(map_output + tree_reduce_calls * summary_tokens * INTERMEDIATE_SUMMARY_RATIO
+                                     + REDUCE_CALLS * summary_tokens * REDUCE_OUTPUT_RATIO),
+            tree_reduce_calls=tree_reduce_calls
+        )
+        print(f"Planned {plan.llm_calls} LLM calls over {len(selected)}/{len(sections)} sections "
+              f"({selected_tokens}/{total_tokens} document tokens, ~{plan.estimated_input_tokens} input "
+              f"and ~{plan.estimated_output_tokens} output tokens).")
+        return plan
+    
+    def _estimate_tree_reduce_calls(self, summary_tokens_total: int, summary_tokens: int) -> int:
+        """Predict how many intermediate reduce calls the tree reducer will make."""
+        limit = self.tree_reducer.token_limit
+        calls = 0
+        for _ in range(MAX_REDUCE_LEVELS):
+            if summary_tokens_total <= limit:
+                break
+            batches = math.ceil(summary_tokens_total / limit)
+            calls += batches
+            summary_tokens_total = batches * summary_tokens * INTERMEDIATE_SUMMARY_RATIO
+        return calls
+    
+    def _knapsack_select(self, weights: List[int], values: List[float], capacity: int) -> List[int]:
+        """Solve a 0/1 knapsack with dynamic programming, bucketing weights to bound the table size."""
+        scale = max(1, math.ceil(capacity / PLANNER_RESOLUTION))
+        buckets = capacity // scale
+        # Round weights up so a bucketed solution never exceeds the real budget
+        scaled = [math.ceil(weight / scale) for weight in weights]
+        
+        best = [0.0] * (buckets + 1)
+        keep = []
+        for weight, value in zip(scaled, values):
+            taken = [False] * (buckets + 1)
+            for c in range(buckets, weight - 1, -1):
+                candidate = best[c - weight] + value
+                if candidate > best[c]:
+                    best[c] = candidate
+                    taken[c] = True
+            keep.append(taken)
+        
+        # Walk back through the decisions to recover the chosen items
+        selected = []
+        c = buckets
+        for i in range(len(weights) - 1, -1, -1):
+            if keep[i][c]:
+                selected.append(i)
+                c -= scaled[i]
+        return sorted(selected)
+    
     def summarize_document(self, document_path: str, settings: Optional[Dict[str, Any]] = None) -> SummaryResult:
         """Generate a summary of the document with customizable settings."""
         start_time = datetime.now()
@@ -381,27 +962,226 @@ class GeneralDocumentSummarizer:
         # Convert settings to Pydantic model for validation
         summary_settings = SummarySettings(**settings)
         
-        # Load document
-        document_text = self.load_document(document_path)
-        
-        # Calculate statistics
-        statistics = self.compute_document_statistics(document_text)
+        # Load document and calculate statistics in a single pass over its pages
+        document_text, statistics = self.load_document_with_statistics(document_path)
         
         # Prepare settings for the prompt
         settings_dict = summary_settings.model_dump()  # Ensure this is a dictionary
         
-        # For shorter documents, use a single-pass approach
-        if statistics.word_count < 3000:
-            result = self._summarize_short_document(document_text, settings_dict, statistics)
-        else:
-            # For longer documents, use a multi-stage approach
-            result = self._summarize_long_document(document_text, settings_dict, statistics)
+        # Topics and key points can be computed locally instead of by the LLM
+        local_metadata = settings_dict['metadata_mode'] == 'local' or settings_dict['metadata_only']
+        if local_metadata:
+            topics, key_points, overview = self.extract_local_metadata(document_text, settings_dict)
+            if settings_dict['metadata_only']:
+                return SummaryResult(
+                    executive_summary=overview,
+                    topics=topics,
+                    key_points=key_points,
+                    statistics=statistics,
+                    processing_time=(datetime.now() - start_time).total_seconds()
+                )
+            settings_dict = {**settings_dict, 'extract_topics': False, 'extract_key_points': False}
+        
+        # Pick single-pass or multi-stage processing by predicted latency
+        with track_stage_metrics() as metrics:
+            route = self.route_document(document_text, settings_dict)
+            print(f"Routing to {route.strategy} ({route.reason}, predicted {route.predicted_seconds:.1f}s).")
+            if route.strategy == "single_pass":
+                if settings_dict.get('extractive_prefilter'):
+                    document_text = self._extractive_filter(document_text, settings_dict)
+                result = self._summarize_short_document(document_text, settings_dict, statistics)
+            else:
+                result = self._summarize_long_document(document_text, settings_dict, statistics, document_path)
+        result.route = route
+        result.stage_metrics = metrics.stages
+        
+        if local_metadata:
+            result.topics = topics
+            result.key_points = key_points
         
         # Set processing time
         result.processing_time = (datetime.now() - start_time).total_seconds()
         
         return result
     
+    def route_document(self, document_text: str, settings: Dict[str, Any]) -> RouteDecision:
+        """
+        Choose single-pass, map-reduce or hierarchical summarization by predicted latency.
+        
+        Section planning (max_input_tokens) and versioning only apply to the multi-stage
+        path, so requests that use them are never routed to a single pass.
+        """
+        document_tokens = estimate_tokens(document_text)
+        summary_tokens = SECTION_SUMMARY_TOKENS.get(settings.get('conciseness'), SECTION_SUMMARY_TOKENS['balanced'])
+        max_input_tokens = settings.get('max_input_tokens')
+        allow_single_pass = not settings.get('document_key') and not (
+            max_input_tokens and document_tokens > max_input_tokens
+        )
+        return route_document(
+            document_tokens,
+            self.model_name,
+            chunk_tokens=settings.get('section_token_budget') or DEFAULT_SECTION_TOKEN_BUDGET,
+            summary_tokens=summary_tokens,
+            output_tokens=summary_tokens * REDUCE_OUTPUT_RATIO,
+            latency=self._latency("reduce"),
+            map_latency=self._latency("map"),
+            allow_single_pass=allow_single_pass
+        )
+    
+    def extract_local_metadata(self, document_text: str,
+                               settings: Dict[str, Any]) -> Tuple[List[Topic], List[KeyPoint], str]:
+        """
+        Extract topics, key points and a short extractive overview without any LLM call.
+        
+        Topics are TF-IDF-ranked keyphrases, with related sentences looked up from the
+        phrase/sentence index and ordered by centrality. Key points are the most central
+        sentences (TextRank), with their most similar sentences as supporting evidence.
+        """
+        sentences = split_sentences(document_text)
+        if not sentences:
+            return [], [], ""
+        
+        matrix = build_tfidf_matrix(sentences)
+        centrality = textrank_scores(matrix)
+        conciseness = settings.get('conciseness', 'balanced')
+        
+        topics = []
+        if settings.get('extract_topics', True) or settings.get('metadata_only'):
+            for keyphrase in extract_keyphrases(sentences, LOCAL_TOPIC_COUNTS[conciseness], sentence_weights=centrality):
+                related = [sentences[i] for i in keyphrase.sentence_indices[:2]]
+                topics.append(Topic(
+                    name=self._surface_form(keyphrase.phrase, related),
+                    relevance_score=keyphrase.score,
+                    related_sentences=related
+                ))
+        
+        key_sentences = central_sentences(
+            sentences, max(LOCAL_KEY_POINT_COUNTS[conciseness], LOCAL_OVERVIEW_SENTENCES),
+            matrix=matrix, scores=centrality
+        )
+        key_points = []
+        if settings.get('extract_key_points', True) or settings.get('metadata_only'):
+            key_points = [
+                KeyPoint(
+                    point=sentences[sentence.index],
+                    importance_score=sentence.score,
+                    supporting_evidence=[sentences[i] for i in sentence.similar_indices]
+                )
+                for sentence in key_sentences[:LOCAL_KEY_POINT_COUNTS[conciseness]]
+            ]
+        
+        # The most central sentences, in document order, give a quick overview
+        overview_indices = sorted(sentence.index for sentence in key_sentences[:LOCAL_OVERVIEW_SENTENCES])
+        overview = " ".join(sentences[i] for i in overview_indices)
+        
+        print(f"Extracted {len(topics)} topics and {len(key_points)} key points locally.")
+        return topics, key_points, overview
+    
+    def _surface_form(self, phrase: str, sentences: List[str]) -> str:
+        """Recover the original casing of a lowercased phrase from a sentence it occurs in."""
+        pattern = re.compile(r'\s+'.join(re.escape(word) for word in phrase.split()), re.IGNORECASE)
+        for sentence in sentences:
+            match = pattern.search(sentence)
+            if match:
+                return match.group(0)
+        return phrase
+    
+    def _extractive_filter(self, text: str, settings: Dict[str, Any]) -> str:
+        """Keep only the most central sentences of a text, as configured by the settings."""
+        keep_ratio = resolve_keep_ratio(settings.get('extractive_keep_ratio'), settings.get('conciseness'))
+        selection = extract_top_sentences(text, keep_ratio)
+        print(f"Extractive pre-filter kept {selection.kept_sentences}/{selection.total_sentences} sentences "
+              f"({selection.tokens_after}/{selection.tokens_before} tokens).")
+        return selection.text
+    
+    def _get_summary_cache(self) -> SummaryCache:
+        """Return the summary cache, opening the default one on first use."""
+        if self.summary_cache is None:
+            self.summary_cache = SummaryCache()
+        return self.summary_cache
+    
+    def _summary_namespace(self, settings: Dict[str, Any]) -> str:
+        """Cache namespace for section summaries: they depend on the model and the prompt settings."""
+        prompt_settings = json.dumps(self._prompt_settings(settings), sort_keys=True, default=str)
+        return f"general:{self.stage_models['map']}:{content_hash(prompt_settings)[:16]}"
+    
+    def _reduce_summaries(self, section_summaries: str, context: str = "") -> str:
+        """Merge a batch of section summaries into one (a node of the tree reduce)."""
+        prompt = self.intermediate_reduce_prompt.format(section_summaries=section_summaries)
+        return self._call("intermediate_reduce", prompt)
+    
+    def _latency(self, stage: str) -> LatencyModel:
+        """Latency model of the model a stage runs on."""
+        return get_latency_model(self.stage_models[stage])
+    
+    def _call(self, stage: str, prompt: str) -> str:
+        """Run one prompt on the model of a stage, recording its latency and tokens."""
+        return self._latency(stage).timed(lambda text: self.stage_llms[stage].invoke(text).content, prompt, stage)
+    
+    def _call_json(self, prompt: str) -> str:
+        """Run one prompt in JSON mode on the final reduce model, recording its latency and tokens."""
+        return self._latency("reduce").timed(lambda text: self.json_llm.invoke(text).content, prompt, "reduce")
+    
+    def _call_batch(self, stage: str, prompts: List[str]) -> List[str]:
+        """Run several prompts concurrently on the model of a stage, as many at a time as the tree reduce uses."""
+        def batch(batch_prompts):
+            responses = self.stage_llms[stage].batch(
+                batch_prompts, config={"max_concurrency": self.tree_reducer.max_workers}
+            )
+            return [response.content for response in responses]
+        return self._latency(stage).timed_batch(batch, prompts, self.tree_reducer.max_workers, stage)
+    
+    def _response_format(self, settings: Dict[str, Any], detailed: bool) -> Dict[str, str]:
+        """
+        Describe the JSON fields the LLM should return, leaving out topics and key points
+        unless the settings ask for them, so unrequested parts are never generated.
+        """
+        fields = ["An executive summary (1-2 paragraphs) that provides a high-level overview"]
+        schema = {"executive_summary": "Concise overview of the entire document"}
+        if detailed:
+            fields.append("A detailed summary that integrates the key information from all sections")
+            schema["detailed_summary"] = "Detailed summary of the entire document"
+        if settings.get('extract_topics', True):
+            fields.append("A list of main topics discussed in the document")
+            schema["topics"] = [{
+                "name": "Topic name",
+                "relevance_score": 0.95,
+                "related_sentences": ["Related sentence 1", "Related sentence 2"]
+            }]
+        if settings.get('extract_key_points', True):
+            fields.append("Key points from the document, each with supporting evidence")
+            schema["key_points"] = [{
+                "point": "Key point statement",
+                "importance_score": 0.92,
+                "supporting_evidence": ["Evidence 1", "Evidence 2"]
+            }]
+        return {
+            "response_fields": "\n".join(f"{i + 1}. {field}" for i, field in enumerate(fields)),
+            "response_schema": json.dumps(schema, indent=2)
+        }
+    
+    def _parse_summary_response(self, response: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Parse a structured summary response into SummaryResult fields, or None if it is not valid JSON."""
+        try:
+            json_start = response.find('{')
+            json_end = response.rfind('}') + 1
+            if json_start < 0 or json_end <= json_start:
+                return None
+            analysis = json.loads(response[json_start:json_end])
+            return {
+                "executive_summary": analysis.get("executive_summary", ""),
+                "detailed_summary": analysis.get("detailed_summary", None),
+                "topics": [Topic(**topic) for topic in analysis.get("topics", [])] if settings.get('extract_topics', True) else [],
+                "key_points": [KeyPoint(**point) for point in analysis.get("key_points", [])] if settings.get('extract_key_points', True) else []
+            }
+        except Exception as e:
+            print(f"Error parsing LLM response: {e}")
+            return None
+    
+    def _prompt_settings(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the settings shown to the LLM, without options that only steer the pipeline."""
+        return {key: value for key, value in settings.items() if key not in PIPELINE_SETTING_KEYS}
+    
     def _summarize_short_document(self, document_text: str, settings: Dict[str, Any], 
                                 statistics: DocumentStatistics) -> SummaryResult:
         """Summarize a short document using a single-pass approach."""
@@ -410,32 +1190,19 @@ class GeneralDocumentSummarizer:
         # Generate analysis with the LLM
         prompt = self.document_analysis_prompt.format(
             document_text=document_text,
-            settings=settings  # Use the dictionary directly
+            settings=self._prompt_settings(settings),
+            **self._response_format(settings, detailed=False)
         )
         
-        response = self.llm.invoke(prompt).content
+        response = self._call_json(prompt)
         
-        # Extract JSON from response
-        try:
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                analysis_str = response[json_start:json_end]
-                analysis = json.loads(analysis_str)
-                
-                # Create SummaryResult
-                result = SummaryResult(
-                    executive_summary=analysis.get("executive_summary", ""),
-                    detailed_summary=analysis.get("detailed_summary", None),
-                    topics=[Topic(**topic) for topic in analysis.get("topics", [])],
-                    key_points=[KeyPoint(**point) for point in analysis.get("key_points", [])],
-                    statistics=statistics,
-                    processing_time=0  # Will be set later
-                )
-                
-                return result
-        except Exception as e:
-            print(f"Error parsing LLM response: {e}")
+        parsed = self._parse_summary_response(response, settings)
+        if parsed is not None:
+            return SummaryResult(
+                **parsed,
+                statistics=statistics,
+                processing_time=0  # Will be set later
+            )
         
         # Fallback if parsing fails
         return SummaryResult(
@@ -445,140 +1212,95 @@ class GeneralDocumentSummarizer:
         )
     
     def _summarize_long_document(self, document_text: str, settings: Dict[str, Any],
-                               statistics: DocumentStatistics) -> SummaryResult:
+                               statistics: DocumentStatistics,
+                               document_path: Optional[str] = None) -> SummaryResult:
         """Summarize a long document using a multi-stage approach."""
         print("Using multi-stage approach for long document...")
         
         # Step 1: Split document into sections
-        sections = self._split_into_sections(document_text)
+        sections = self._build_sections(document_text, document_path, settings)
+        if settings.get('extractive_prefilter'):
+            for section in sections:
+                section.content = self._extractive_filter(section.content, settings)
         print(f"Document split into {len(sections)} sections.")
         
-        # Step 2: Score and possibly filter sections
-        sections = self._score_section_importance(sections)
+        # Collapse near-duplicate sections so each is summarized once
+        sections, duplicate_sections = self._deduplicate_sections(sections, settings.get('duplicate_threshold'))
         
-        # Sort sections by importance score
-        sections.sort(key=lambda x: x.importance_score or 0, reverse=True)
+        # Step 2: Score sections and plan which ones fit the token budget
+        sections = self._score_section_importance(sections)
+        plan = self.plan_sections(sections, settings)
+        plan.duplicate_sections = duplicate_sections
+        sections = [sections[i] for i in plan.selected_sections]
         
-        # If summary length percentage is specified, use only the most important sections
-        if settings.get('summary_length_percentage') is not None:
-            section_limit = max(1, math.ceil(len(sections) * settings['summary_length_percentage'] / 100))
-            sections = sections[:section_limit]
-            print(f"Using top {section_limit} sections for summary.")
+        # Versioned documents reuse the cached summaries of unchanged sections
+        version = None
+        if settings.get('document_key'):
+            cache = self._get_summary_cache()
+            namespace = self._summary_namespace(settings)
+            version = cache.record_version(settings['document_key'], [section.content for section in sections])
+            print(f"Version {version.version} of '{version.document_key}': {version.unchanged_chunks} unchanged, "
+                  f"{version.changed_chunks} changed, {version.removed_chunks} removed sections.")
         
-        # Step 3: Summarize each section
-        section_summaries = []
+        # Step 3: Summarize the sections in parallel, skipping those with a cached summary
+        summaries = [None] * len(sections)
+        if version is not None:
+            summaries = [cache.get(namespace, section.content) for section in sections]
+            version.reused_summaries = sum(1 for summary in summaries if summary is not None)
         
-        for i, section in enumerate(sections):
-            print(f"Summarizing section {i+1}/{len(sections)}...")
-            
-            prompt = self.sectional_summary_prompt.format(
-                section=section.content,
-                settings=settings
+        pending = [i for i, summary in enumerate(summaries) if summary is None]
+        print(f"Summarizing {len(pending)} sections in parallel...")
+        prompts = [
+            self.sectional_summary_prompt.format(
+                section=sections[i].content,
+                settings=self._prompt_settings(settings)
             )
-            
-            summary = self.llm.invoke(prompt).content
-            section_summaries.append(f"Section: {section.title or f'Section {i+1}'}\n{summary}")
+            for i in pending
+        ]
+        for i, summary in zip(pending, self._call_batch("map", prompts)):
+            summaries[i] = summary
+            if version is not None:
+                cache.put(namespace, sections[i].content, summary)
+                version.new_summaries += 1
+        
+        section_summaries = [
+            f"Section: {section.title or f'Section {i+1}'}\n{summary}"
+            for i, (section, summary) in enumerate(zip(sections, summaries))
+        ]
         
-        # Step 4: Combine section summaries into a single document summary
+        # Step 4: Reduce the summaries level by level until they fit the combine prompt,
+        # then combine them into a single document summary
+        section_summaries = self.tree_reducer.reduce(section_summaries)
         combined_summaries = "\n\n".join(section_summaries)
         statistics_str = f"Word count: {statistics.word_count}, Sentence count: {statistics.sentence_count}, " \
                          f"Paragraph count: {statistics.paragraph_count}, " \
                          f"Reading time: {statistics.estimated_reading_time_minutes:.1f} minutes"
         
+        # Step 5: One structured call returns the summaries plus any requested topics and key points
         prompt = self.combined_summary_prompt.format(
             section_summaries=combined_summaries,
             document_statistics=statistics_str,
-            settings=settings
+            settings=self._prompt_settings(settings),
+            **self._response_format(settings, detailed=True)
         )
         
-        combined_response = self.llm.invoke(prompt).content
-        
-        # Step 5: Extract topics and key points
-        topics_prompt = PromptTemplate(
-            input_variables=["document_text"],
-            template="""
-            Extract the main topics from this document. For each topic, provide a relevance score 
-            and 1-2 related sentences from the document. Format as JSON:
-            
-            ```json
-            [
-                {
-                    "name": "Topic name",
-                    "relevance_score": 0.95,
-                    "related_sentences": ["Related sentence 1", "Related sentence 2"]
-                },
-                ...
-            ]
-            ```
-            
-            DOCUMENT:
-            {document_text}
-            """
-        ).format(document_text=combined_summaries)
-        
-        topics_response = self.llm.invoke(topics_prompt).content
-        
-        key_points_prompt = PromptTemplate(
-            input_variables=["document_text"],
-            template="""
-            Extract the key points from this document. For each point, provide an importance score 
-            and supporting evidence. Format as JSON:
-            
-            ```json
-            [
-                {
-                    "point": "Key point statement",
-                    "importance_score": 0.92,
-                    "supporting_evidence": ["Evidence 1", "Evidence 2"]
-                },
-                ...
-            ]
-            ```
-            
-            DOCUMENT:
-            {document_text}
-            """
-        ).format(document_text=combined_summaries)
-        
-        key_points_response = self.llm.invoke(key_points_prompt).content
-        
-        # Parse topics and key points
-        topics = []
-        try:
-            json_start = topics_response.find('[')
-            json_end = topics_response.rfind(']') + 1
-            if json_start >= 0 and json_end > json_start:
-                topics_json = topics_response[json_start:json_end]
-                topics_data = json.loads(topics_json)
-                topics = [Topic(**topic) for topic in topics_data]
-        except Exception as e:
-            print(f"Error parsing topics: {e}")
-        
-        key_points = []
-        try:
-            json_start = key_points_response.find('[')
-            json_end = key_points_response.rfind(']') + 1
-            if json_start >= 0 and json_end > json_start:
-                key_points_json = key_points_response[json_start:json_end]
-                key_points_data = json.loads(key_points_json)
-                key_points = [KeyPoint(**point) for point in key_points_data]
-        except Exception as e:
-            print(f"Error parsing key points: {e}")
+        combined_response = self._call_json(prompt)
         
-        # Extract executive and detailed summaries from combined response
-        parts = combined_response.split('\n\n')
-        executive_summary = parts[0] if parts else combined_response
-        detailed_summary = '\n\n'.join(parts[1:]) if len(parts) > 1 else None
+        parsed = self._parse_summary_response(combined_response, settings)
+        if parsed is None:
+            # Keep the raw text rather than losing the summary
+            parsed = {"executive_summary": combined_response}
         
         # Create the final result
         result = SummaryResult(
-            executive_summary=executive_summary,
-            detailed_summary=detailed_summary,
-            topics=topics,
-            key_points=key_points,
+            **parsed,
             statistics=statistics,
+            section_plan=plan,
+            version=version,
             processing_time=0  # Will be set later
         )
+        if version is not None:
+            plan.llm_calls -= version.reused_summaries
         
         return result
 
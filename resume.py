@@ -1,8 +1,11 @@
 import os
-from typing import List, Dict, Any, Optional, Union
+import bisect
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from dotenv import load_dotenv
 import PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import json
@@ -10,8 +13,16 @@ from datetime import datetime
 from resume_models import (
     ResumeData, ATSAnalysis, ResumeSummaryResult, 
     KeywordMatch, BasicInformation, Experience, Education,
-    Certification, Project, Skill, SkillCategory
+    Certification, Project, Skill, SkillCategory,
+    JobDescription, ScreeningResult, CandidateQuery, CandidateMatch
 )
+from ats_scoring import format_issues, job_keywords, match_keywords, resume_to_text
+from candidate_store import CandidateStore
+from resume_dedup import RESUME_DUPLICATE_THRESHOLD, ResumeFingerprint, cluster_resumes, fingerprint_resume
+from resume_parser import PreParsedResume, pre_parse_resume
+from skill_taxonomy import default_skill_taxonomy
+from model_tiers import record_stage, track_stage_metrics
+from token_utils import estimate_tokens
 
 # Load environment variables
 load_dotenv()
@@ -19,104 +30,102 @@ load_dotenv()
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Resumes screened at once in a batch; raise it as far as the provider rate limit allows
+RESUME_BATCH_CONCURRENCY = int(os.getenv("RESUME_BATCH_CONCURRENCY", "8"))
+MAX_LOCAL_RECOMMENDED_TERMS = 8
+
+# Classes of the extraction schema, sent only when a field of ResumeData needs them
+RESUME_SCHEMA_CLASSES = {
+    "skills": '''class Skill:
+    name: str
+    proficiency: Optional[str]  # e.g., "Beginner", "Intermediate", "Advanced"
+    category: Optional[str]  # e.g., "Technical", "Soft Skills", "Languages"''',
+    "experience": """class Experience:
+    company: str
+    title: str
+    dates: Optional[str]  # e.g., "Jan 2020 - Present"
+    start_date: Optional[str]
+    end_date: Optional[str]
+    current: Optional[bool]
+    location: Optional[str]
+    responsibilities: List[str]
+    achievements: List[str]
+    technologies: List[str]""",
+    "education": """class Education:
+    degree: str
+    institution: str
+    dates: Optional[str]
+    start_date: Optional[str]
+    end_date: Optional[str]
+    location: Optional[str]
+    gpa: Optional[str]
+    major: Optional[str]
+    minor: Optional[str]
+    honors: List[str]
+    coursework: List[str]""",
+    "certifications_licenses": """class Certification:
+    name: str
+    issuer: Optional[str]
+    date: Optional[str]
+    expiration: Optional[str]
+    id: Optional[str]""",
+    "projects": """class Project:
+    name: str
+    description: Optional[str]
+    role: Optional[str]
+    technologies: List[str]
+    url: Optional[str]
+    dates: Optional[str]"""
+}
+RESUME_SCHEMA_FIELDS = {
+    "basic_information": "BasicInformation",
+    "professional_summary": "Optional[str]",
+    "skills": "List[Union[Skill, Dict[str, List[str]]]]  # Can be list of skills or dict of categories",
+    "experience": "List[Experience]",
+    "education": "List[Education]",
+    "certifications_licenses": "List[Certification]",
+    "projects": "List[Project]",
+    "career_highlights": "List[str]",
+    "languages": "Optional[List[Dict[str, str]]]"
+}
+
 class ResumeSummarizer:
     """
     A specialized summarizer for extracting structured information from resumes
     using LangChain, OpenAI, and Pydantic for structured output.
     """
     
-    def __init__(self, model_name="gpt-4o-mini", temperature=0.0):
-        """Initialize the resume summarizer with necessary components."""
+    def __init__(self, model_name="gpt-4o-mini", temperature=0.0,
+                 candidate_store: Optional[CandidateStore] = None):
+        """
+        Initialize the resume summarizer with necessary components.
+        
+        candidate_store receives every parsed resume so candidates can be searched later;
+        the default store is opened on first use.
+        """
+        self.candidate_store = candidate_store
+        self.model_name = model_name
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=temperature,
             openai_api_key=OPENAI_API_KEY
         )
         
-        # Text splitter tuned for resumes
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=3000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ".", " ", ""],
-            length_function=len
-        )
-        
-        # Resume analysis prompt template with structured Pydantic output format
+        # Resume analysis prompt template with structured Pydantic output format; the schema
+        # only lists the fields the rule-based pre-parser could not fill
         self.resume_analysis_prompt = PromptTemplate(
-            input_variables=["resume_text"],
+            input_variables=["resume_text", "schema", "known_fields"],
             template="""
             You are an expert resume analyzer and HR professional. Extract and structure information from 
             the provided resume. Focus on presenting the most relevant information in a clear, organized manner.
-            
+            {known_fields}
             RESUME TEXT:
             {resume_text}
             
             Analyze this resume and provide a structured JSON response that conforms to the following Pydantic model structure:
             
             ```python
-            class BasicInformation:
-                name: Optional[str]
-                email: Optional[str]
-                phone: Optional[str]
-                location: Optional[str]
-                linkedin: Optional[str]
-                website: Optional[str]
-            
-            class Skill:
-                name: str
-                proficiency: Optional[str]  # e.g., "Beginner", "Intermediate", "Advanced"
-                category: Optional[str]  # e.g., "Technical", "Soft Skills", "Languages"
-            
-            class Experience:
-                company: str
-                title: str
-                dates: Optional[str]  # e.g., "Jan 2020 - Present"
-                start_date: Optional[str]
-                end_date: Optional[str]
-                current: Optional[bool]
-                location: Optional[str]
-                responsibilities: List[str]
-                achievements: List[str]
-                technologies: List[str]
-            
-            class Education:
-                degree: str
-                institution: str
-                dates: Optional[str]
-                start_date: Optional[str]
-                end_date: Optional[str]
-                location: Optional[str]
-                gpa: Optional[str]
-                major: Optional[str]
-                minor: Optional[str]
-                honors: List[str]
-                coursework: List[str]
-            
-            class Certification:
-                name: str
-                issuer: Optional[str]
-                date: Optional[str]
-                expiration: Optional[str]
-                id: Optional[str]
-            
-            class Project:
-                name: str
-                description: Optional[str]
-                role: Optional[str]
-                technologies: List[str]
-                url: Optional[str]
-                dates: Optional[str]
-            
-            class ResumeData:
-                basic_information: BasicInformation
-                professional_summary: Optional[str]
-                skills: List[Union[Skill, Dict[str, List[str]]]]  # Can be list of skills or dict of categories
-                experience: List[Experience]
-                education: List[Education]
-                certifications_licenses: List[Certification]
-                projects: List[Project]
-                career_highlights: List[str]
-                languages: Optional[List[Dict[str, str]]]
+{schema}
             ```
             
             The response should be in valid JSON format only, matching the Pydantic model structure above.
@@ -150,51 +159,51 @@ class ResumeSummarizer:
             """
         )
         
-        # ATS compatibility prompt with Pydantic output format
-        self.ats_compatibility_prompt = PromptTemplate(
-            input_variables=["resume_json", "job_description"],
+        # ATS recommendations prompt; the keyword match and score are computed locally. The job
+        # description comes first so prompts for many resumes against one job share a cacheable prefix
+        self.ats_recommendations_prompt = PromptTemplate(
+            input_variables=["job_description", "resume_json", "score", "present", "missing", "format_issues"],
             template="""
-            You are an ATS (Applicant Tracking System) expert. Given a resume and a job description,
-            analyze how well the resume would perform in an ATS screening.
-            
-            RESUME INFORMATION:
-            {resume_json}
+            You are an ATS (Applicant Tracking System) expert. A resume has been matched against
+            a job description; recommend how to improve it for this role.
             
             JOB DESCRIPTION:
             {job_description}
             
-            Provide an analysis that conforms to the following Pydantic model structure:
-            
-            ```python
-            class KeywordMatch:
-                present: List[str]  # Keywords found in the resume
-                missing: List[str]  # Important keywords missing from the resume
+            RESUME INFORMATION:
+            {resume_json}
             
-            class ATSAnalysis:
-                score: float  # ATS Compatibility Score (0-100)
-                keyword_match: KeywordMatch
-                skills_alignment: str  # Description of skills alignment
-                experience_relevance: str  # Description of experience relevance
-                format_issues: List[str]  # Format/structure issues that might affect ATS scanning
-                recommendations: List[str]  # Recommendations to improve ATS compatibility
-            ```
+            KEYWORD MATCH SCORE: {score}/100
+            KEY TERMS PRESENT: {present}
+            KEY TERMS MISSING: {missing}
+            FORMAT ISSUES: {format_issues}
             
-            The response should be in valid JSON format only, matching the Pydantic model structure above.
-            Base your analysis on current ATS best practices. Focus on actionable recommendations that
-            would help the candidate improve their resume for this specific role.
+            Give up to 5 specific, actionable recommendations that would help the candidate improve
+            their resume for this specific role, based on current ATS best practices.
+            Return ONLY a JSON list of strings.
             """
         )
     
+    def _invoke(self, stage: str, prompt: str) -> str:
+        """Call the LLM and record the call in the stage metrics being tracked."""
+        start = time.perf_counter()
+        response = self.llm.invoke(prompt).content
+        record_stage(stage, self.model_name, estimate_tokens(prompt), estimate_tokens(response),
+                     time.perf_counter() - start)
+        return response
+    
     def load_pdf(self, pdf_path: str) -> str:
         """Extract text from a PDF resume."""
         print(f"Loading PDF from {pdf_path}...")
         
+        start = time.perf_counter()
         text = ""
         with open(pdf_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
             for page_num in range(len(reader.pages)):
                 page = reader.pages[page_num]
                 text += page.extract_text() + "\n\n"
+        record_stage("load_pdf", "pypdf2", 0, 0, time.perf_counter() - start)
         
         print(f"Extracted {len(text)} characters from PDF.")
         return text
@@ -203,16 +212,23 @@ class ResumeSummarizer:
         """Process resume text into structured information using Pydantic models."""
         print("Processing resume text into structured information...")
         
-        # For resumes, we often don't need chunking as they're typically short,
-        # but we'll check length just in case
-        if len(resume_text) > 10000:
-            chunks = self.text_splitter.split_text(resume_text)
-            print(f"Resume is long, split into {len(chunks)} chunks.")
-            # Combine chunks as we need the whole context for complete analysis
-            resume_text = " ".join(chunks)
+        # Contact details, name and education are parsed with patterns; only what is left goes to the LLM
+        start = time.perf_counter()
+        pre_parsed = pre_parse_resume(resume_text)
+        record_stage("pre_parse", "regex", 0, 0, time.perf_counter() - start)
+        llm_text = pre_parsed.llm_text() or resume_text
+        print(f"Pre-parsed the resume; sending {len(llm_text)} of {len(resume_text)} characters to the LLM.")
         
-        prompt = self.resume_analysis_prompt.format(resume_text=resume_text)
-        structured_data_str = self.llm.invoke(prompt).content
+        known_fields = ""
+        if pre_parsed.education_parsed or len(pre_parsed.missing_basic_fields) < len(BasicInformation.model_fields):
+            known_fields = ("\n            Some fields were already extracted from the resume with patterns; "
+                            "only extract the fields of the model below.\n")
+        prompt = self.resume_analysis_prompt.format(
+            resume_text=llm_text,
+            schema=self._extraction_schema(pre_parsed),
+            known_fields=known_fields
+        )
+        structured_data_str = self._invoke("extract", prompt)
         
         # Parse the JSON response
         try:
@@ -222,18 +238,99 @@ class ResumeSummarizer:
             if json_start >= 0 and json_end > json_start:
                 structured_data_str = structured_data_str[json_start:json_end]
             
-            # Parse into dictionary
+            # Parse into dictionary and add the pre-parsed fields
             structured_dict = json.loads(structured_data_str)
+            structured_dict["basic_information"] = {
+                **(structured_dict.get("basic_information") or {}),
+                **pre_parsed.basic_information.model_dump(exclude_none=True)
+            }
+            if pre_parsed.education_parsed:
+                structured_dict["education"] = [entry.model_dump() for entry in pre_parsed.education]
             
-            # Convert to Pydantic model
-            structured_data = ResumeData.model_validate(structured_dict)
+            # Convert to Pydantic model, with skill names resolved to the taxonomy ("k8s" -> "Kubernetes")
+            structured_data = default_skill_taxonomy().normalize_resume(ResumeData.model_validate(structured_dict))
             print("Successfully extracted structured information from resume.")
             return structured_data
             
         except Exception as e:
             print(f"Error parsing response: {e}")
-            # Return a minimal structure if parsing fails
-            return ResumeData()
+            # Return the pre-parsed fields if parsing fails
+            return ResumeData(basic_information=pre_parsed.basic_information, education=pre_parsed.education)
+    
+    def _extraction_schema(self, pre_parsed: PreParsedResume) -> str:
+        """Schema of the fields the LLM still has to extract."""
+        fields = dict(RESUME_SCHEMA_FIELDS)
+        missing = pre_parsed.missing_basic_fields
+        if not missing:
+            del fields["basic_information"]
+        if pre_parsed.education_parsed:
+            del fields["education"]
+        
+        classes = []
+        if missing:
+            classes.append("class BasicInformation:\n" + "\n".join(f"    {field}: Optional[str]" for field in missing))
+        classes.extend(schema for field, schema in RESUME_SCHEMA_CLASSES.items() if field in fields)
+        classes.append("class ResumeData:\n" + "\n".join(f"    {field}: {annotation}" for field, annotation in fields.items()))
+        return "\n\n".join(classes)
+    
+    def _get_candidate_store(self) -> CandidateStore:
+        """Return the candidate store, opening the default one on first use."""
+        if self.candidate_store is None:
+            self.candidate_store = CandidateStore()
+        return self.candidate_store
+    
+    def store_candidate(self, resume_data: ResumeData, source: Optional[str] = None,
+                        fingerprint: Optional[ResumeFingerprint] = None,
+                        replace_id: Optional[str] = None) -> Optional[str]:
+        """
+        Persist a parsed resume (and the fingerprint of its text) in the candidate store; returns
+        its candidate id. replace_id replaces the rows of that stored candidate with this resume.
+        """
+        if resume_data == ResumeData():
+            return None  # Nothing was parsed
+        start = time.perf_counter()
+        try:
+            return self._get_candidate_store().add(resume_data, source=source, fingerprint=fingerprint,
+                                                   replace_id=replace_id)
+        except Exception as e:
+            print(f"Error storing candidate: {e}")
+            return None
+        finally:
+            record_stage("store", "duckdb", 0, 0, time.perf_counter() - start)
+    
+    def fingerprint_resume(self, resume_text: str) -> ResumeFingerprint:
+        """Contact keys and MinHash signature of a resume's text, to recognize copies before any LLM call."""
+        start = time.perf_counter()
+        fingerprint = fingerprint_resume(resume_text)
+        record_stage("fingerprint", "minhash", 0, 0, time.perf_counter() - start)
+        return fingerprint
+    
+    def _extract_resume(self, resume_text: str,
+                        fingerprint: ResumeFingerprint) -> Tuple[ResumeData, Optional[str], Optional[str]]:
+        """
+        Structured data of a resume, the candidate id of the stored copy it came from when a
+        near-identical resume was processed before (its extraction is reused, with no LLM
+        call), and the id of the stored candidate it updates when only the email or phone
+        number match (it is extracted again and should replace that candidate's rows).
+        """
+        match = None
+        stored = None
+        try:
+            match = self._get_candidate_store().find_candidate(fingerprint)
+            if match is not None and match[1] >= RESUME_DUPLICATE_THRESHOLD:
+                stored = self._get_candidate_store().get(match[0])
+        except Exception as e:
+            print(f"Error looking up duplicate candidates: {e}")
+        if stored is not None:
+            print(f"Resume is a copy of stored candidate {match[0]}; reusing its structured data.")
+            return stored, match[0], None
+        if match is not None:
+            print(f"Resume is a new version of stored candidate {match[0]}; extracting it again.")
+        return self.process_resume(resume_text), None, match[0] if match is not None else None
+    
+    def search_candidates(self, query: CandidateQuery) -> Tuple[List[CandidateMatch], float]:
+        """Filter and rank stored candidates without the LLM; returns the matches and query milliseconds."""
+        return self._get_candidate_store().search(query)
     
     def generate_summary(self, resume_data: ResumeData) -> str:
         """Generate a narrative summary from structured resume data."""
@@ -241,58 +338,122 @@ class ResumeSummarizer:
         
         resume_json = resume_data.model_dump_json(indent=2)
         prompt = self.resume_summary_prompt.format(resume_json=resume_json)
-        summary = self.llm.invoke(prompt).content
+        summary = self._invoke("summary", prompt)
         
         print("Resume summary generated successfully.")
         return summary
     
-    def analyze_ats_compatibility(self, resume_data: ResumeData, job_description: str) -> ATSAnalysis:
-        """Analyze how well the resume would perform in an ATS for a specific job."""
+    def prepare_job_description(self, job_description: str) -> JobDescription:
+        """Normalize a job description and extract its weighted key terms, once per job."""
+        text = "\n".join(line.strip() for line in job_description.strip().splitlines() if line.strip())
+        keywords, weights = job_keywords(text)
+        return JobDescription(text=text, keywords=keywords, keyword_weights=weights)
+    
+    def analyze_ats_compatibility(self, resume_data: ResumeData,
+                                  job_description: Union[str, JobDescription],
+                                  recommendations: bool = False) -> ATSAnalysis:
+        """
+        Analyze how well the resume would perform in an ATS for a specific job.
+        
+        Keyword matches, the score and format issues are computed locally, so the same
+        resume always gets the same score. With recommendations, the LLM writes the
+        recommendations; otherwise they are derived from the missing terms and issues.
+        """
         print("Analyzing ATS compatibility...")
         
-        resume_json = resume_data.model_dump_json(indent=2)
-        prompt = self.ats_compatibility_prompt.format(
-            resume_json=resume_json,
-            job_description=job_description
+        start = time.perf_counter()
+        if isinstance(job_description, str):
+            job_description = self.prepare_job_description(job_description)
+        experience_text = resume_to_text(ResumeData(experience=resume_data.experience))
+        overall, experience = match_keywords(
+            [resume_to_text(resume_data), experience_text],
+            job_description.keywords,
+            job_description.keyword_weights
+        )
+        issues = format_issues(resume_data)
+        analysis = ATSAnalysis(
+            score=overall.score,
+            keyword_match=KeywordMatch(present=overall.present, missing=overall.missing),
+            skills_alignment=f"The resume covers {len(overall.present)} of the {len(job_description.keywords)} "
+                             f"key terms of the job description (weighted match {overall.score:.0f}/100).",
+            experience_relevance=f"The work experience mentions {len(experience.present)} of the key terms "
+                                 f"(weighted match {experience.score:.0f}/100).",
+            format_issues=issues
+        )
+        record_stage("ats_score", "local", 0, 0, time.perf_counter() - start)
+        
+        if recommendations:
+            analysis.recommendations = self._recommend_ats_improvements(resume_data, job_description, analysis)
+        else:
+            analysis.recommendations = list(issues)
+            if overall.missing:
+                analysis.recommendations.insert(0, "Mention these job terms where they reflect your experience: "
+                                                   + ", ".join(overall.missing[:MAX_LOCAL_RECOMMENDED_TERMS]))
+        print(f"ATS analysis completed locally (score {analysis.score}).")
+        return analysis
+    
+    def _recommend_ats_improvements(self, resume_data: ResumeData, job_description: JobDescription,
+                                    analysis: ATSAnalysis) -> List[str]:
+        """Ask the LLM for recommendations given the locally computed match."""
+        prompt = self.ats_recommendations_prompt.format(
+            job_description=job_description.text,
+            resume_json=resume_data.model_dump_json(indent=2),
+            score=analysis.score,
+            present=", ".join(analysis.keyword_match.present) or "none",
+            missing=", ".join(analysis.keyword_match.missing) or "none",
+            format_issues="; ".join(analysis.format_issues) or "none"
         )
-        analysis_str = self.llm.invoke(prompt).content
+        response = self._invoke("ats_recommendations", prompt)
         
         # Try to parse as JSON if possible
         try:
             # Extract JSON if it's embedded in other text
-            json_start = analysis_str.find('{')
-            json_end = analysis_str.rfind('}') + 1
+            json_start = response.find('[')
+            json_end = response.rfind(']') + 1
             if json_start >= 0 and json_end > json_start:
-                analysis_str = analysis_str[json_start:json_end]
-            
-            # Parse into dictionary
-            analysis_dict = json.loads(analysis_str)
-            
-            # Convert to Pydantic model
-            analysis = ATSAnalysis.model_validate(analysis_dict)
-            print("ATS analysis completed as structured data.")
-            return analysis
-            
+                response = response[json_start:json_end]
+            return [str(item) for item in json.loads(response)]
         except Exception as e:
-            print(f"Error parsing ATS analysis: {e}")
-            # If parsing fails, store the raw text
-            return ATSAnalysis(analysis_text=analysis_str)
+            print(f"Error parsing ATS recommendations: {e}")
+            # If parsing fails, keep one recommendation per line
+            return [line.strip(" -*•\t") for line in response.splitlines() if line.strip(" -*•\t")]
     
-    def process_resume_file(self, pdf_path: str, job_description: Optional[str] = None) -> ResumeSummaryResult:
-        """Process a resume PDF file and generate analysis/summary with Pydantic models."""
-        start_time = datetime.now()
-        
-        # Load and process resume
-        resume_text = self.load_pdf(pdf_path)
-        resume_data = self.process_resume(resume_text)
+    def process_resume_file(self, pdf_path: str, job_description: Optional[str] = None,
+                            ats_recommendations: bool = True,
+                            source: Optional[str] = None) -> ResumeSummaryResult:
+        """
+        Process a resume PDF file and generate analysis/summary with Pydantic models.
         
-        # Generate narrative summary
-        summary = self.generate_summary(resume_data)
+        ats_recommendations asks the LLM for tailored ATS recommendations; the ATS score
+        and keyword match are always computed locally. source names the resume in the
+        candidate store (default: the file name).
+        """
+        start_time = datetime.now()
         
-        # Analyze ATS compatibility if job description provided
-        ats_analysis = None
-        if job_description:
-            ats_analysis = self.analyze_ats_compatibility(resume_data, job_description)
+        with track_stage_metrics() as metrics:
+            # Load and process resume, unless a copy of it was processed before
+            resume_text = self.load_pdf(pdf_path)
+            fingerprint = self.fingerprint_resume(resume_text)
+            resume_data, duplicate_of, updates = self._extract_resume(resume_text, fingerprint)
+            
+            # The later stages only read the structured data, so they run concurrently: the
+            # narrative summary, the ATS analysis (if a job description was provided) and storage
+            # (a reused copy is already stored)
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                # Each stage runs in a copy of the caller's context so its metrics are recorded
+                summary_future = executor.submit(contextvars.copy_context().run, self.generate_summary, resume_data)
+                ats_future = None
+                if job_description:
+                    ats_future = executor.submit(contextvars.copy_context().run, self.analyze_ats_compatibility,
+                                                 resume_data, job_description, ats_recommendations)
+                store_future = None
+                if duplicate_of is None:
+                    store_future = executor.submit(contextvars.copy_context().run, self.store_candidate,
+                                                   resume_data, source or os.path.basename(pdf_path), fingerprint,
+                                                   updates)
+                summary = summary_future.result()
+                ats_analysis = ats_future.result() if ats_future else None
+                candidate_id = store_future.result() if store_future else duplicate_of
         
         processing_time = (datetime.now() - start_time).total_seconds()
         
@@ -301,10 +462,129 @@ class ResumeSummarizer:
             structured_data=resume_data,
             narrative_summary=summary,
             ats_analysis=ats_analysis,
-            processing_time=processing_time
+            processing_time=processing_time,
+            candidate_id=candidate_id,
+            stage_metrics=metrics.stages,
+            duplicate_of=duplicate_of
         )
         
         return result
+    
+    def screen_resumes(self, resumes: List[Tuple[str, str]], job_description: str,
+                       max_workers: int = RESUME_BATCH_CONCURRENCY,
+                       include_summary: bool = False,
+                       include_recommendations: bool = False) -> Iterator[ScreeningResult]:
+        """
+        Screen many resumes, given as (filename, pdf_path) pairs, against one job description.
+        
+        The job description is prepared once. Every resume is loaded and fingerprinted first,
+        and copies of one resume (near-identical text from the same candidate) are
+        screened once: each copy is yielded right after its representative, sharing its
+        result. Up to max_workers resumes are processed at a time and results are yielded
+        as they complete, each with its rank among the resumes screened so far. A resume that
+        fails is yielded with its error instead of stopping the batch. Scores are computed
+        locally; include_recommendations adds an LLM call per resume.
+        """
+        job = self.prepare_job_description(job_description)
+        print(f"Screening {len(resumes)} resumes, {max_workers} at a time...")
+        self._get_candidate_store()  # Open it before the workers share it
+        ranked_scores = []  # Negated scores of completed resumes, ascending
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            loaded = list(executor.map(lambda resume: self._load_resume(*resume), resumes))
+            
+            # Cluster the resumes that loaded; each cluster is screened through its earliest resume
+            readable = [i for i, (text, _, _) in enumerate(loaded) if text is not None]
+            groups = cluster_resumes([loaded[i][1] for i in readable])
+            copies = {}  # Index of a representative resume -> indices of the copies sharing its result
+            for position, representative in enumerate(groups.representative_of):
+                if representative != position:
+                    copies.setdefault(readable[representative], []).append(readable[position])
+            if groups.duplicates_removed:
+                print(f"Found {groups.duplicates_removed} duplicate resumes; screening each candidate once.")
+            
+            futures = {}
+            copied = {i for indices in copies.values() for i in indices}
+            for i, ((filename, _), (text, fingerprint, error)) in enumerate(zip(resumes, loaded)):
+                if text is None:
+                    yield ScreeningResult(filename=filename, batch_index=i, error=error)
+                elif i not in copied:
+                    futures[executor.submit(self._screen_resume, filename, text, fingerprint, job,
+                                            include_summary, include_recommendations)] = i
+            for future in as_completed(futures):
+                result = future.result()
+                result.batch_index = futures[future]
+                if result.score is not None:
+                    position = bisect.bisect_left(ranked_scores, -result.score)
+                    ranked_scores.insert(position, -result.score)
+                    result.rank = position + 1
+                yield result
+                # Copies are linked by batch index, as uploads often share a filename ("resume.pdf")
+                for copy in copies.get(futures[future], []):
+                    yield result.model_copy(update={
+                        "filename": resumes[copy][0], "batch_index": copy, "duplicate_of": result.candidate_id,
+                        "duplicate_of_index": futures[future], "processing_time": 0.0
+                    })
+        finally:
+            # Also reached when the caller closes the generator early (e.g. the client disconnected):
+            # resumes not started yet are cancelled instead of making their LLM calls
+            executor.shutdown(cancel_futures=True)
+    
+    def _load_resume(self, filename: str, pdf_path: str) -> Tuple[Optional[str], Optional[ResumeFingerprint], Optional[str]]:
+        """Text and fingerprint of one resume of a batch, or the error that prevented loading it."""
+        try:
+            text = self.load_pdf(pdf_path)
+            return text, self.fingerprint_resume(text), None
+        except Exception as e:
+            print(f"Error loading {filename}: {e}")
+            return None, None, str(e)
+    
+    def _screen_resume(self, filename: str, resume_text: str, fingerprint: ResumeFingerprint, job: JobDescription,
+                       include_summary: bool, include_recommendations: bool) -> ScreeningResult:
+        """Structure one resume and analyze it against a prepared job description."""
+        start_time = datetime.now()
+        try:
+            resume_data, duplicate_of, updates = self._extract_resume(resume_text, fingerprint)
+            candidate_id = duplicate_of or self.store_candidate(resume_data, source=filename, fingerprint=fingerprint,
+                                                                replace_id=updates)
+            ats_analysis = self.analyze_ats_compatibility(resume_data, job, include_recommendations)
+            return ScreeningResult(
+                filename=filename,
+                candidate_name=resume_data.basic_information.name,
+                score=ats_analysis.score,
+                ats_analysis=ats_analysis,
+                narrative_summary=self.generate_summary(resume_data) if include_summary else None,
+                processing_time=(datetime.now() - start_time).total_seconds(),
+                candidate_id=candidate_id,
+                duplicate_of=duplicate_of
+            )
+        except Exception as e:
+            print(f"Error screening {filename}: {e}")
+            return ScreeningResult(
+                filename=filename,
+                error=str(e),
+                processing_time=(datetime.now() - start_time).total_seconds()
+            )
+
+def rank_screening_results(results: List[ScreeningResult]) -> List[ScreeningResult]:
+    """
+    Final ranking of a batch: best score first, resumes without a score last. Copies of a
+    resume follow the resume they share a result with (by batch index), and share its rank.
+    """
+    copies = {}
+    for result in results:
+        if result.duplicate_of_index is not None:
+            copies.setdefault(result.duplicate_of_index, []).append(result)
+    ranked = sorted((result for result in results if result.duplicate_of_index is None),
+                    key=lambda result: (result.score is None, -(result.score or 0.0)))
+    final = []
+    for i, result in enumerate(ranked):
+        rank = i + 1 if result.score is not None else None
+        final.append(result.model_copy(update={"rank": rank}))
+        final.extend(copy.model_copy(update={"rank": rank}) for copy in copies.pop(result.batch_index, []))
+    # Copies whose resume is not among the results are listed last, unranked
+    final.extend(copy.model_copy(update={"rank": None}) for remaining in copies.values() for copy in remaining)
+    return final
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from dedup import LSH_BANDS, NUM_PERMUTATIONS, DuplicateGroups, candidate_pairs, minhash_signature
+from resume_parser import pre_parse_resume
+
+# Estimated Jaccard similarity of word shingles above which two resumes are the same
+# candidate; lower than for document chunks, as agencies add their own headers and footers
+RESUME_DUPLICATE_THRESHOLD = 0.7
+PHONE_KEY_DIGITS = 10  # Trailing digits compared, so "+1 415..." and "(415)..." match
+NAME_WORD_PATTERN = re.compile(r"[a-z]+")
+
+class ResumeFingerprint(BaseModel):
+    """Exact keys and MinHash signature of a resume's text, computed before any LLM call."""
+    email: Optional[str] = None
+    phone: Optional[str] = None  # Trailing digits only
+    name: Optional[str] = None
+    signature: List[int] = Field(default_factory=list)
+
+    def band_keys(self) -> List[int]:
+        """LSH band keys of the signature: resumes sharing any key are candidate duplicates."""
+        rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+        signature = np.asarray(self.signature, dtype=np.uint64)
+        return [
+            band << 32 | zlib.crc32(signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())
+            for band in range(LSH_BANDS)
+        ]
+
+def fingerprint_resume(text: str) -> ResumeFingerprint:
+    """Fingerprint a resume from its extracted text: pre-parsed contact keys plus a MinHash signature."""
+    info = pre_parse_resume(text).basic_information
+    phone = re.sub(r'\D', "", info.phone or "")[-PHONE_KEY_DIGITS:]
+    return ResumeFingerprint(
+        email=info.email.lower() if info.email else None,
+        phone=phone or None,
+        name=info.name,
+        signature=minhash_signature(text).tolist()
+    )
+
+def names_conflict(first: Optional[str], second: Optional[str]) -> bool:
+    """Whether two names are known to differ ("Jane Doe" and "Jane A. Doe" do not)."""
+    if not first or not second:
+        return False
+    first_words = set(NAME_WORD_PATTERN.findall(first.lower()))
+    second_words = set(NAME_WORD_PATTERN.findall(second.lower()))
+    return not (first_words <= second_words or second_words <= first_words)
+
+def resume_similarity(first: ResumeFingerprint, second: ResumeFingerprint) -> float:
+    """Estimated Jaccard similarity of two resumes' shingles."""
+    return float(np.mean(np.asarray(first.signature) == np.asarray(second.signature)))
+
+def same_candidate(first: ResumeFingerprint, second: ResumeFingerprint,
+                   threshold: float = RESUME_DUPLICATE_THRESHOLD) -> bool:
+    """
+    Whether two resumes are from one candidate, possibly different versions: the same
+    email or phone number, or near-identical text. A shared key with conflicting names
+    (e.g. an agency's contact details on two candidates' resumes) does not count.
+    """
+    if names_conflict(first.name, second.name):
+        return False
+    if (first.email and first.email == second.email) or (first.phone and first.phone == second.phone):
+        return True
+    return resume_similarity(first, second) >= threshold
+
+def same_resume(first: ResumeFingerprint, second: ResumeFingerprint,
+                threshold: float = RESUME_DUPLICATE_THRESHOLD) -> bool:
+    """
+    Whether two resumes are copies of one version, so one's extraction and result can
+    stand for the other: near-identical text, without conflicting names. A shared email
+    or phone number alone is not enough, as an updated resume has new jobs and skills.
+    """
+    return not names_conflict(first.name, second.name) and resume_similarity(first, second) >= threshold
+
+def cluster_resumes(fingerprints: List[ResumeFingerprint],
+                    threshold: float = RESUME_DUPLICATE_THRESHOLD) -> DuplicateGroups:
+    """
+    Group copies of the same resume (see same_resume). Candidate pairs come from shared
+    emails, phone numbers and LSH bands; clusters are merged transitively and each resume
+    points at the earliest resume of its cluster. Two clusters are not merged if any of
+    their names conflict, so A~B and B~C cannot join A and C with conflicting names.
+    """
+    signatures = np.asarray([fingerprint.signature for fingerprint in fingerprints], dtype=np.uint64)
+    pairs = set(candidate_pairs(signatures.reshape(-1, NUM_PERMUTATIONS)))
+    for key in ["email", "phone"]:
+        buckets = {}
+        for i, fingerprint in enumerate(fingerprints):
+            value = getattr(fingerprint, key)
+            if value:
+                buckets.setdefault(value, []).append(i)
+        pairs.update((members[a], members[b]) for members in buckets.values()
+                     for a in range(len(members)) for b in range(a + 1, len(members)))
+
+    # Union-find with the smallest index as the root of each cluster, and the names in each cluster
+    parent = list(range(len(fingerprints)))
+    names = [[fingerprint.name] if fingerprint.name else [] for fingerprint in fingerprints]
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for first, second in sorted(pairs):
+        if not same_resume(fingerprints[first], fingerprints[second], threshold):
+            continue
+        first_root, second_root = root(first), root(second)
+        if first_root == second_root or any(names_conflict(first_name, second_name)
+                                            for first_name in names[first_root] for second_name in names[second_root]):
+            continue
+        merged, absorbed = min(first_root, second_root), max(first_root, second_root)
+        parent[absorbed] = merged
+        names[merged] += names[absorbed]
+
+    return DuplicateGroups(representative_of=[root(i) for i in range(len(fingerprints))], threshold=threshold)
@@ -2,6 +2,8 @@ from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime
 
+from model_tiers import StageMetrics
+
 class BasicInformation(BaseModel):
     """Basic personal information from a resume."""
     name: Optional[str] = None
@@ -148,6 +150,51 @@ class ResumeSummaryResult(BaseModel):
     ats_analysis: Optional[ATSAnalysis] = None
     processing_time: float
     processed_at: datetime = Field(default_factory=datetime.now)
+    candidate_id: Optional[str] = None  # Id in the candidate store
+    stage_metrics: Dict[str, StageMetrics] = Field(default_factory=dict)  # Calls and seconds per stage
+    duplicate_of: Optional[str] = None  # Candidate id of an earlier copy of the resume whose extraction was reused
     
     class Config:
-        extra = "allow"
\ No newline at end of file
+        extra = "allow"
+
+class JobDescription(BaseModel):
+    """A job description prepared once for matching against many resumes."""
+    text: str
+    keywords: List[str] = Field(default_factory=list)  # Key terms extracted locally, best first
+    keyword_weights: List[float] = Field(default_factory=list)  # Importance of each key term
+
+class ScreeningResult(BaseModel):
+    """Outcome of screening one resume of a batch against a job description."""
+    filename: str
+    candidate_name: Optional[str] = None
+    score: Optional[float] = None
+    rank: Optional[int] = None  # Position among the resumes screened so far, best first
+    ats_analysis: Optional[ATSAnalysis] = None
+    narrative_summary: Optional[str] = None
+    processing_time: float = 0.0
+    error: Optional[str] = None
+    candidate_id: Optional[str] = None  # Id in the candidate store
+    batch_index: Optional[int] = None  # Position of the resume in the batch
+    duplicate_of: Optional[str] = None  # Candidate id of the stored or batch copy whose extraction was reused
+    duplicate_of_index: Optional[int] = None  # Batch index of the resume whose result this copy shares
+
+class CandidateQuery(BaseModel):
+    """Filters for searching stored candidates; every filter given must match."""
+    skills: List[str] = Field(default_factory=list)
+    match_all: bool = True  # Require every skill, rather than at least one
+    min_years: Optional[float] = None  # Minimum total years of experience
+    title: Optional[str] = None  # Substring of any past job title
+    degree: Optional[str] = None  # Substring of any degree or major
+    certification: Optional[str] = None  # Substring of any certification name
+    location: Optional[str] = None
+    limit: int = Field(default=50, ge=1, le=1000)
+
+class CandidateMatch(BaseModel):
+    """A stored candidate matching a query."""
+    candidate_id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    location: Optional[str] = None
+    experience_years: float = 0.0
+    matched_skills: List[str] = Field(default_factory=list)
+    source: Optional[str] = None  # File the resume was parsed from
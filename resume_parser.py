@@ -0,0 +1,234 @@
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from resume_models import BasicInformation, Education
+
+# Canonical resume sections and the headings that introduce them
+SECTION_HEADINGS = {
+    "summary": ["summary", "professional summary", "career summary", "profile", "professional profile",
+                "objective", "career objective", "about me", "about"],
+    "experience": ["experience", "work experience", "professional experience", "relevant experience",
+                   "employment", "employment history", "work history", "career history"],
+    "education": ["education", "academic background", "academic qualifications", "education and training",
+                  "educational background"],
+    "skills": ["skills", "technical skills", "key skills", "core competencies", "competencies",
+               "skills and tools", "technologies", "tools and technologies", "skills and technologies"],
+    "projects": ["projects", "personal projects", "key projects", "academic projects", "selected projects"],
+    "certifications": ["certifications", "certificates", "licenses", "licenses and certifications",
+                       "certifications and licenses", "professional certifications"],
+    "languages": ["languages"],
+    "awards": ["awards", "honors", "achievements", "awards and honors", "honors and awards"],
+    "other": ["publications", "volunteer", "volunteering", "volunteer experience", "interests", "hobbies",
+              "activities", "references", "additional information"]
+}
+HEADING_SECTIONS = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+MAX_HEADING_WORDS = 5
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_PATTERN = re.compile(r'(?<![\w+])\+?(?:\(?\d{1,4}\)?[\s.-]?){2,5}\d{2,4}(?!\w)')
+MIN_PHONE_DIGITS, MAX_PHONE_DIGITS = 9, 15
+LINKEDIN_PATTERN = re.compile(r'(?:https?://)?(?:[\w-]+\.)?linkedin\.com/(?:in|pub)/[\w%-]+/?', re.IGNORECASE)
+URL_PATTERN = re.compile(
+    r'(?:https?://|www\.)[^\s,;|()]+'
+    r'|(?<![@\w.])(?:[\w-]+\.)+(?:com|io|dev|me|net|org|co|ai|app|tech)(?:/[^\s,;|()]*)?(?![\w.])',
+    re.IGNORECASE
+)
+NAME_PATTERN = re.compile(r"^[A-Z][A-Za-z'.-]*(?:\s+[A-Z][A-Za-z'.-]*){1,3}$")
+
+MONTH = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?'
+DATE = rf'(?:{MONTH}\s+(?:19|20)\d{{2}}|\d{{1,2}}/(?:19|20)\d{{2}}|(?:19|20)\d{{2}})'
+DATE_RANGE_PATTERN = re.compile(
+    rf'\b({DATE})(?:\s*(?:-|–|—|to)\s*({DATE}|present|current|now))?(?!\d)', re.IGNORECASE
+)
+
+# Degree names: long forms, dotted or unambiguous abbreviations, and two-letter ones
+# (which double as US state codes) only when followed by "in"/"of"
+DEGREE_PATTERN = re.compile(
+    r"\b(?:(?:Bachelor|Master|Doctor|Associate)(?:'s|s)?(?:\s+(?:of|in)\s+(?:Science|Arts|Engineering|Technology|"
+    r"Business Administration|Fine Arts|Laws|Philosophy|Education|Commerce|Computer Applications))?"
+    r"|Ph\.?\s?D\.?|MBA|B\.?Sc\.?|M\.?Sc\.?|B\.?Tech\.?|M\.?Tech\.?|B\.?Eng\.?|M\.?Eng\.?|BCA|MCA|B\.?Com\.?"
+    r"|M\.?Com\.?|LL\.?[BM]\.?|[BM]\.[SAE]\.|[JM]\.D\.|A\.[AS]\.|High School Diploma|Diploma"
+    r"|(?:BS|MS|BA|MA|BE|ME)(?=\s+(?:in|of)\b))(?![\w.])"
+)
+MAJOR_PATTERN = re.compile(r"^\s*(?:in|of|,|-|–|:|\()?\s*([A-Z][A-Za-z&/+' ]*[A-Za-z])")
+INSTITUTION_WORDS = r"(?:University|College|Institute|School|Academy|Polytechnic|Universit[éa]t?)"
+INSTITUTION_PATTERN = re.compile(
+    rf"(?:[A-Z][\w.&'-]*\s+(?:(?:of|the|and|for|at|de)\s+|[A-Z][\w.&'-]*\s+)*{INSTITUTION_WORDS}"
+    rf"|{INSTITUTION_WORDS})(?:\s+(?:of|at|for)(?:\s+(?:the|and|[A-Z][\w.&'-]*))+)?"
+)
+GPA_PATTERN = re.compile(r'\b(?:C?GPA|Grade)\s*[:\-]?\s*(\d+(?:\.\d+)?(?:\s*/\s*\d+(?:\.\d+)?)?)', re.IGNORECASE)
+LABELED_LIST_PATTERN = re.compile(r'^\s*(relevant coursework|coursework|honou?rs|awards)\s*:\s*(.+)$', re.IGNORECASE)
+LIST_SEPARATOR_PATTERN = re.compile(r'\s*[,;|•·]\s*')
+# Separators left dangling where contact details were removed from a header line
+DANGLING_SEPARATOR_PATTERN = re.compile(r'(?:\s*[|•·;]\s*){2,}')
+BULLET_PATTERN = re.compile(r'^[\s•·*\-–#>]+')
+
+class ResumeSection(BaseModel):
+    """Text of one resume section, found by its heading."""
+    name: str  # Canonical section name (see SECTION_HEADINGS)
+    heading: str
+    text: str
+
+class PreParsedResume(BaseModel):
+    """Fields of a resume extracted deterministically, and the sections left for the LLM."""
+    basic_information: BasicInformation = Field(default_factory=BasicInformation)
+    education: List[Education] = Field(default_factory=list)
+    education_parsed: bool = False  # Every education entry was parsed; the section needs no LLM
+    header: str = ""  # Text before the first section heading, without the extracted contact details
+    sections: List[ResumeSection] = Field(default_factory=list)
+
+    @property
+    def missing_basic_fields(self) -> List[str]:
+        return [field for field, value in self.basic_information.model_dump().items() if not value]
+
+    def llm_text(self) -> str:
+        """The resume text the LLM still has to read: what is left of the header and the unparsed sections."""
+        parts = [self.header] if self.header else []
+        for section in self.sections:
+            if section.name == "education" and self.education_parsed:
+                continue
+            parts.append(f"{section.heading}\n{section.text}")
+        return "\n\n".join(parts)
+
+def section_of_heading(line: str) -> Optional[str]:
+    """Canonical section introduced by a line, if the line is a section heading."""
+    heading = BULLET_PATTERN.sub("", line).strip().rstrip(":").strip().lower().replace("&", "and")
+    heading = " ".join(heading.split())
+    if not heading or len(heading.split()) > MAX_HEADING_WORDS:
+        return None
+    return HEADING_SECTIONS.get(heading)
+
+def split_sections(text: str) -> Tuple[str, List[ResumeSection]]:
+    """The text before the first heading, and every section in order."""
+    header_lines: List[str] = []
+    sections: List[ResumeSection] = []
+    for line in text.splitlines():
+        section = section_of_heading(line)
+        if section is not None:
+            sections.append(ResumeSection(name=section, heading=line.strip(), text=""))
+        elif sections:
+            sections[-1].text += line + "\n"
+        else:
+            header_lines.append(line)
+    for section in sections:
+        section.text = section.text.strip()
+    return "\n".join(header_lines).strip(), sections
+
+def find_phone(text: str) -> Optional[str]:
+    """First phone number in the text; digit runs that are too short (e.g. date ranges) are skipped."""
+    for match in PHONE_PATTERN.finditer(text):
+        digits = sum(character.isdigit() for character in match.group())
+        if MIN_PHONE_DIGITS <= digits <= MAX_PHONE_DIGITS and not DATE_RANGE_PATTERN.fullmatch(match.group().strip()):
+            return match.group().strip()
+    return None
+
+def find_website(text: str) -> Optional[str]:
+    """First URL that is not a LinkedIn profile, preferring a GitHub profile."""
+    urls = [match.group().rstrip("/.") for match in URL_PATTERN.finditer(text)]
+    urls = [url for url in urls if "linkedin.com" not in url.lower()]
+    github = [url for url in urls if "github.com" in url.lower()]
+    return (github or urls or [None])[0]
+
+def parse_basic_information(header: str, text: str) -> Tuple[BasicInformation, str]:
+    """
+    Contact details and name from the resume header (contact details may also be anywhere
+    in the text). Returns them and the header with the extracted details removed.
+    """
+    email = EMAIL_PATTERN.search(header) or EMAIL_PATTERN.search(text)
+    linkedin = LINKEDIN_PATTERN.search(header) or LINKEDIN_PATTERN.search(text)
+    without_email = EMAIL_PATTERN.sub(" ", header)
+    info = BasicInformation(
+        email=email.group() if email else None,
+        phone=find_phone(without_email) or find_phone(EMAIL_PATTERN.sub(" ", text)),
+        linkedin=linkedin.group().rstrip("/") if linkedin else None,
+        website=find_website(LINKEDIN_PATTERN.sub(" ", without_email))
+    )
+
+    remaining = []
+    for line in header.splitlines():
+        line = line.strip()
+        if info.name is None and NAME_PATTERN.match(line) and section_of_heading(line) is None:
+            info.name = line.title() if line.isupper() else line
+            continue
+        for value in [info.email, info.phone, info.linkedin, info.website]:
+            if value:
+                line = line.replace(value, " ")
+        line = DANGLING_SEPARATOR_PATTERN.sub(" | ", line).strip(" |•·;,")
+        if line:
+            remaining.append(line)
+    return info, "\n".join(remaining)
+
+def _education_entry(lines: List[str]) -> Optional[Education]:
+    """An education entry from its lines, if both its degree and institution were found."""
+    text = " | ".join(lines)
+    degree = DEGREE_PATTERN.search(text)
+    institution = INSTITUTION_PATTERN.search(text)
+    if not degree or not institution:
+        return None
+
+    major = None
+    if not institution.start() <= degree.end() <= institution.end():
+        major_match = MAJOR_PATTERN.match(text[degree.end():])
+        if major_match and not INSTITUTION_PATTERN.match(major_match.group(1)):
+            major = major_match.group(1).strip()
+    dates = DATE_RANGE_PATTERN.search(text)
+    gpa = GPA_PATTERN.search(text)
+    entry = Education(
+        degree=degree.group().strip(),
+        institution=institution.group().strip(),
+        major=major,
+        dates=dates.group().strip() if dates else None,
+        start_date=dates.group(1) if dates and dates.group(2) else None,
+        end_date=(dates.group(2) or dates.group(1)) if dates else None,
+        gpa=gpa.group(1) if gpa else None
+    )
+    for line in lines:
+        labeled = LABELED_LIST_PATTERN.match(line)
+        if labeled:
+            items = [item for item in LIST_SEPARATOR_PATTERN.split(labeled.group(2).strip()) if item]
+            if labeled.group(1).lower().endswith("coursework"):
+                entry.coursework = items
+            else:
+                entry.honors = items
+    return entry
+
+def parse_education(section_text: str) -> Tuple[List[Education], bool]:
+    """
+    Education entries of an education section. An entry starts at a line naming a degree
+    or an institution when the current entry already has one. The second value is False
+    when any entry is incomplete, in which case the section is left to the LLM.
+    """
+    groups: List[List[str]] = []
+    has_degree = has_institution = False
+    for raw_line in section_text.splitlines():
+        line = BULLET_PATTERN.sub("", raw_line).strip()
+        if not line:
+            continue
+        degree = DEGREE_PATTERN.search(line) is not None
+        institution = INSTITUTION_PATTERN.search(line) is not None
+        if not groups or (degree and has_degree) or (institution and has_institution):
+            groups.append([])
+            has_degree = has_institution = False
+        groups[-1].append(line)
+        has_degree = has_degree or degree
+        has_institution = has_institution or institution
+
+    entries = [_education_entry(lines) for lines in groups]
+    complete = bool(entries) and all(entry is not None for entry in entries)
+    return ([entry for entry in entries if entry is not None], complete)
+
+def pre_parse_resume(text: str) -> PreParsedResume:
+    """Extract contact details, name and education with patterns and split the rest into sections."""
+    header, sections = split_sections(text)
+    info, header = parse_basic_information(header, text)
+    education_text = "\n".join(section.text for section in sections if section.name == "education")
+    education, education_parsed = parse_education(education_text) if education_text else ([], False)
+    return PreParsedResume(
+        basic_information=info,
+        education=education if education_parsed else [],
+        education_parsed=education_parsed,
+        header=header,
+        sections=sections
+    )
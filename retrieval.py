@@ -0,0 +1,88 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+from scipy import sparse
+from pydantic import BaseModel
+
+from extractive import tokenize
+
+INDEX_ARRAYS = ["data", "indices", "indptr"]
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+DEFAULT_TOP_K = 4
+MAX_TOP_K = 20  # Clauses a question may ask for; more would overflow the answer prompt anyway
+
+class RetrievedChunk(BaseModel):
+    """A chunk returned for a query, with its position in the document and BM25 score."""
+    index: int
+    score: float
+    text: str
+
+class BM25Index:
+    """
+    Okapi BM25 index over the chunks of one document.
+
+    The per-term BM25 weights of every chunk are computed once into a sparse chunk x term
+    matrix, so scoring a query is a sum of a few of its columns.
+    """
+
+    def __init__(self, chunks: List[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.chunks = chunks
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, chunk in enumerate(chunks):
+            for term in tokenize(chunk):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+
+        shape = (len(chunks), max(len(self.vocabulary), 1))
+        # Duplicate (row, col) entries are summed, giving raw term frequencies
+        counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=shape)
+        counts.sum_duplicates()
+
+        document_frequency = np.bincount(counts.indices, minlength=shape[1])
+        idf = np.log(1.0 + (shape[0] - document_frequency + 0.5) / (document_frequency + 0.5))
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        length_norm = k1 * (1.0 - b + b * lengths / max(lengths.mean(), 1.0)) if len(chunks) else lengths
+
+        weights = counts.copy()
+        chunk_of_entry = np.repeat(np.arange(shape[0]), np.diff(weights.indptr))
+        weights.data = idf[weights.indices] * weights.data * (k1 + 1.0) / (weights.data + length_norm[chunk_of_entry])
+        self.weights = weights.tocsc()
+
+    def save(self, directory: str) -> None:
+        """Write the weight matrix as .npy arrays, which load() memory-maps, plus the vocabulary."""
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self.weights, name))
+        with open(os.path.join(directory, "vocabulary.json"), "w", encoding="utf-8") as file:
+            json.dump({"shape": list(self.weights.shape), "terms": self.vocabulary}, file)
+
+    @classmethod
+    def load(cls, directory: str, chunks: List[str]) -> "BM25Index":
+        """Open a saved index; the weight arrays are memory-mapped rather than read into memory."""
+        with open(os.path.join(directory, "vocabulary.json"), "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        index = cls.__new__(cls)
+        index.chunks = chunks
+        index.vocabulary = saved["terms"]
+        arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in INDEX_ARRAYS]
+        index.weights = sparse.csc_matrix(tuple(arrays), shape=tuple(saved["shape"]), copy=False)
+        return index
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for a query."""
+        columns = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not columns:
+            return np.zeros(len(self.chunks))
+        return np.asarray(self.weights[:, columns].sum(axis=1)).ravel()
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[RetrievedChunk]:
+        """The top_k chunks matching the query, best first; chunks sharing no term are left out."""
+        scores = self.scores(query)
+        ranked = np.argsort(-scores, kind="stable")[:top_k]
+        return [RetrievedChunk(index=int(i), score=round(float(scores[i]), 4), text=self.chunks[i])
+                for i in ranked if scores[i] > 0]
@@ -0,0 +1,212 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from model_tiers import record_stage
+from token_utils import estimate_tokens, get_context_window, lookup_model_value
+from tree_reduce import DEFAULT_MAX_WORKERS, DEFAULT_RESERVED_TOKENS, MAX_REDUCE_LEVELS, reduce_token_limit
+
+ROUTING_STRATEGIES = ["single_pass", "map_reduce", "hierarchical"]
+
+# Prior latency profile per model: (per-call overhead in seconds, input tokens/s, output tokens/s)
+MODEL_LATENCY_PRIORS = {
+    "gpt-4": (0.8, 3000.0, 20.0),
+    "gpt-4-turbo": (0.6, 5000.0, 35.0),
+    "gpt-4o": (0.5, 6000.0, 60.0),
+    "gpt-4o-mini": (0.4, 8000.0, 80.0),
+    "gpt-3.5-turbo": (0.3, 8000.0, 90.0),
+}
+DEFAULT_LATENCY_PRIOR = (0.6, 4000.0, 40.0)
+PRIOR_WEIGHT = 5.0  # The prior counts as this many observed calls
+TOKEN_SCALE = 1000.0  # Regression features are in thousands of tokens
+
+PROMPT_OVERHEAD_TOKENS = 300  # Instructions and settings around the text in each prompt
+INTERMEDIATE_SUMMARY_RATIO = 2  # An intermediate reduce summary is about this many map summaries long
+# Longest document sent in one call; beyond this, long-context recall of details degrades
+SINGLE_PASS_MAX_TOKENS = 32000
+
+class RouteDecision(BaseModel):
+    """Processing strategy chosen for a document and its predicted cost."""
+    strategy: str
+    predicted_seconds: float
+    predicted_calls: int
+    predicted_input_tokens: int
+    predicted_output_tokens: int
+    candidates: Dict[str, float] = Field(default_factory=dict)  # Predicted seconds of every feasible strategy
+    reason: str = ""
+
+    model_config = {
+        "extra": "allow"
+    }
+
+class LatencyModel:
+    """
+    Online latency model of one LLM: seconds = overhead + input / input_rate + output / output_rate.
+
+    Coefficients start from a per-model prior and are refitted by ridge regression
+    towards that prior as calls are observed, so predictions follow the latency the
+    provider actually delivers.
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name
+        overhead, input_rate, output_rate = lookup_model_value(model_name, MODEL_LATENCY_PRIORS, DEFAULT_LATENCY_PRIOR)
+        self._prior = np.array([overhead, TOKEN_SCALE / input_rate, TOKEN_SCALE / output_rate])
+        self._xtx = np.zeros((3, 3))
+        self._xty = np.zeros(3)
+        self._coefficients = self._prior.copy()
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def observe(self, input_tokens: int, output_tokens: int, seconds: float) -> None:
+        """Record the measured latency of one call and refit the coefficients."""
+        x = np.array([1.0, input_tokens / TOKEN_SCALE, output_tokens / TOKEN_SCALE])
+        with self._lock:
+            self._xtx += np.outer(x, x)
+            self._xty += x * seconds
+            self.observations += 1
+            regularizer = PRIOR_WEIGHT * np.eye(3)
+            solved = np.linalg.solve(self._xtx + regularizer, self._xty + regularizer @ self._prior)
+            # Negative rates are fitting noise; keep every term at least a tenth of its prior
+            self._coefficients = np.maximum(solved, self._prior * 0.1)
+
+    def predict(self, input_tokens: int, output_tokens: int) -> float:
+        """Predicted seconds for one call."""
+        x = np.array([1.0, input_tokens / TOKEN_SCALE, output_tokens / TOKEN_SCALE])
+        return float(x @ self._coefficients)
+
+    def timed(self, call: Callable[[str], str], prompt: str, stage: Optional[str] = None) -> str:
+        """Run call(prompt), record its latency (and its stage metrics) and return its text."""
+        start = time.perf_counter()
+        result = call(prompt)
+        seconds = time.perf_counter() - start
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(result)
+        self.observe(input_tokens, output_tokens, seconds)
+        record_stage(stage, self.model_name, input_tokens, output_tokens, seconds)
+        return result
+
+    def timed_batch(self, call: Callable[[List[str]], List[str]], prompts: List[str],
+                    max_workers: int = DEFAULT_MAX_WORKERS, stage: Optional[str] = None) -> List[str]:
+        """Run a concurrent batch call, recording the average latency of one wave of calls."""
+        if not prompts:
+            return []
+        start = time.perf_counter()
+        results = call(prompts)
+        seconds = time.perf_counter() - start
+        input_tokens = sum(map(estimate_tokens, prompts))
+        output_tokens = sum(map(estimate_tokens, results))
+        self.observe(
+            input_tokens // len(prompts),
+            output_tokens // len(results),
+            seconds / math.ceil(len(prompts) / max_workers)
+        )
+        record_stage(stage, self.model_name, input_tokens, output_tokens, seconds, calls=len(prompts))
+        return results
+
+    def profile(self) -> Dict[str, float]:
+        """Current per-call overhead and throughputs, for reporting."""
+        overhead, input_cost, output_cost = self._coefficients
+        return {
+            "overhead_seconds": round(float(overhead), 3),
+            "input_tokens_per_second": round(TOKEN_SCALE / float(input_cost), 1),
+            "output_tokens_per_second": round(TOKEN_SCALE / float(output_cost), 1),
+            "observations": self.observations
+        }
+
+_latency_models = {}
+_latency_models_lock = threading.Lock()
+
+def get_latency_model(model_name: Optional[str]) -> LatencyModel:
+    """Return the shared latency model of a model name, so all summarizers learn from each other's calls."""
+    with _latency_models_lock:
+        if model_name not in _latency_models:
+            _latency_models[model_name] = LatencyModel(model_name)
+        return _latency_models[model_name]
+
+def _multi_stage_cost(document_tokens: int, chunk_tokens: int, summary_tokens: int, output_tokens: int,
+                      reduce_limit: int, max_workers: int, latency: LatencyModel, map_latency: LatencyModel):
+    """
+    Predict the map stage and any intermediate reduce levels (on the map model) and the
+    final call; returns (strategy, seconds, calls, input, output).
+    """
+    chunks = max(1, math.ceil(document_tokens / chunk_tokens))
+    chunk_size = min(chunk_tokens, document_tokens)
+    seconds = math.ceil(chunks / max_workers) * map_latency.predict(chunk_size + PROMPT_OVERHEAD_TOKENS, summary_tokens)
+    calls = chunks
+    input_tokens = document_tokens + chunks * PROMPT_OVERHEAD_TOKENS
+    output_total = chunks * summary_tokens
+
+    strategy = "map_reduce"
+    summaries, size = chunks, summary_tokens
+    levels = 0
+    while summaries * size > reduce_limit and summaries > 1 and levels < MAX_REDUCE_LEVELS:
+        strategy = "hierarchical"
+        levels += 1
+        per_batch = max(2, reduce_limit // size)
+        batches = math.ceil(summaries / per_batch)
+        merged_size = min(size * INTERMEDIATE_SUMMARY_RATIO, reduce_limit // 2)
+        seconds += math.ceil(batches / max_workers) * map_latency.predict(per_batch * size + PROMPT_OVERHEAD_TOKENS, merged_size)
+        calls += batches
+        input_tokens += summaries * size + batches * PROMPT_OVERHEAD_TOKENS
+        output_total += batches * merged_size
+        summaries, size = batches, merged_size
+
+    final_input = summaries * size + PROMPT_OVERHEAD_TOKENS
+    seconds += latency.predict(final_input, output_tokens)
+    return strategy, seconds, calls + 1, input_tokens + final_input, output_total + output_tokens
+
+def route_document(document_tokens: int, model_name: Optional[str], chunk_tokens: int,
+                   summary_tokens: int, output_tokens: int,
+                   latency: Optional[LatencyModel] = None,
+                   map_latency: Optional[LatencyModel] = None,
+                   max_workers: int = DEFAULT_MAX_WORKERS,
+                   reserved_tokens: int = DEFAULT_RESERVED_TOKENS,
+                   single_pass_max_tokens: int = SINGLE_PASS_MAX_TOKENS,
+                   allow_single_pass: bool = True) -> RouteDecision:
+    """
+    Choose between one call over the whole document, parallel map-reduce and a
+    hierarchical (multi-level) reduce by predicted latency.
+
+    Single pass is feasible when the document fits the model's context window
+    (and single_pass_max_tokens); the map stages run max_workers calls at a time.
+    Map-reduce becomes hierarchical when the map summaries overflow one reduce call.
+    model_name and latency describe the model of the final (or only) call; map_latency
+    that of the map and intermediate reduce calls, when they run on another model.
+    """
+    latency = latency or get_latency_model(model_name)
+    map_latency = map_latency or latency
+    candidates = {}
+
+    single_pass_limit = min(get_context_window(model_name) - reserved_tokens, single_pass_max_tokens)
+    if allow_single_pass and document_tokens <= single_pass_limit:
+        single_input = document_tokens + PROMPT_OVERHEAD_TOKENS
+        candidates["single_pass"] = (latency.predict(single_input, output_tokens), 1, single_input, output_tokens)
+
+    strategy, seconds, calls, input_tokens, output_total = _multi_stage_cost(
+        document_tokens, chunk_tokens, summary_tokens, output_tokens,
+        reduce_token_limit(model_name, reserved_tokens), max_workers, latency, map_latency
+    )
+    candidates[strategy] = (seconds, calls, input_tokens, output_total)
+
+    best = min(candidates, key=lambda name: candidates[name][0])
+    seconds, calls, input_tokens, output_total = candidates[best]
+    if not allow_single_pass:
+        reason = "single pass disabled by the request settings"
+    elif "single_pass" not in candidates:
+        reason = f"document exceeds the {single_pass_limit}-token single-pass limit"
+    else:
+        reason = "lowest predicted latency"
+    return RouteDecision(
+        strategy=best,
+        predicted_seconds=round(seconds, 2),
+        predicted_calls=calls,
+        predicted_input_tokens=input_tokens,
+        predicted_output_tokens=output_total,
+        candidates={name: round(values[0], 2) for name, values in candidates.items()},
+        reason=reason,
+        latency_profile=latency.profile()
+    )
@@ -0,0 +1,202 @@
+import json
+import os
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from resume_models import ResumeData, Skill, SkillCategory
+
+# Canonical skills, their categories and the aliases that resolve to them
+SKILL_TAXONOMY_PATH = os.getenv(
+    "SKILL_TAXONOMY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_taxonomy.json")
+)
+
+class SkillMention(BaseModel):
+    """An alias of a canonical skill found in a text."""
+    skill: str  # Canonical name, e.g. "Kubernetes"
+    start: int
+    end: int
+
+# Characters that may not touch a case-sensitive alias ("C" in "D.C." or "R" in "R&D" is no skill)
+CASE_SENSITIVE_NEIGHBORS = ".&'-"
+
+def _normalize_alias(alias: str) -> str:
+    return " ".join(alias.lower().split())
+
+def _is_word_character(character: str) -> bool:
+    return character.isalnum() or character == "_"
+
+class SkillTaxonomy:
+    """
+    Canonical skills and their aliases ("JS", "ECMAScript" -> "JavaScript"; "k8s" -> "Kubernetes").
+
+    Aliases are compiled into an Aho-Corasick automaton over lowercase characters, so
+    every alias in a text is found in one pass, however many aliases there are. Only
+    whole-word matches count, overlapping matches keep the longest (e.g. "react native"
+    over "react"), and case-sensitive aliases (e.g. "Go", "R") must match exactly.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.categories: Dict[str, Optional[str]] = {}
+        self._aliases: Dict[str, str] = {}  # Case-insensitive alias -> canonical skill
+        self._case_sensitive: Dict[str, str] = {}  # Exact alias -> canonical skill
+        for entry in entries:
+            skill = entry["skill"]
+            self.categories[skill] = entry.get("category")
+            case_sensitive = entry.get("case_sensitive", [])
+            for alias in case_sensitive:
+                self._case_sensitive[alias] = skill
+            for alias in entry.get("aliases", []) + ([] if skill in case_sensitive else [skill]):
+                self._aliases[_normalize_alias(alias)] = skill
+        self._build_automaton()
+
+    @classmethod
+    def load(cls, path: str = SKILL_TAXONOMY_PATH) -> "SkillTaxonomy":
+        """Load a taxonomy from a JSON list of {"skill", "category", "aliases", "case_sensitive"} objects."""
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def _build_automaton(self) -> None:
+        """Goto, failure and output tables of the Aho-Corasick automaton over all aliases."""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]  # Lengths of the aliases ending at each state
+        for pattern in set(self._aliases) | {alias.lower() for alias in self._case_sensitive}:
+            state = 0
+            for character in pattern:
+                if character not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][character] = len(self._goto) - 1
+                state = self._goto[state][character]
+            self._output[state].append(len(pattern))
+
+        # Breadth-first, so the failure state of every state is known before its children's
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(character, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> List[SkillMention]:
+        """Whole-word skill aliases in a text, left to right, longest match first where they overlap."""
+        candidates = []
+        positions: List[int] = []  # Text index of every character fed to the automaton
+        state = 0
+        previous_space = False
+        for index, character in enumerate(text):
+            # Runs of whitespace are fed as one space, as aliases are stored
+            if character.isspace():
+                if previous_space:
+                    continue
+                character, previous_space = " ", True
+            else:
+                character, previous_space = character.lower(), False
+            positions.append(index)
+            while state and character not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(character, 0)
+
+            for length in self._output[state]:
+                start, end = positions[-length], index + 1
+                alias = text[start:end]
+                skill = self._aliases.get(_normalize_alias(alias))
+                neighbors = text[start - 1:start] + text[end:end + 1]
+                if skill is None:
+                    skill = self._case_sensitive.get(alias)
+                    if skill is None or any(character in CASE_SENSITIVE_NEIGHBORS for character in neighbors):
+                        continue
+                # Whole words only: a word character may not continue the alias on either side
+                if (start > 0 and _is_word_character(text[start - 1]) and _is_word_character(alias[0])) or \
+                        (end < len(text) and _is_word_character(text[end]) and _is_word_character(alias[-1])):
+                    continue
+                candidates.append((start, end, skill))
+
+        mentions = []
+        covered_until = 0
+        for start, end, skill in sorted(candidates, key=lambda candidate: (candidate[0], -candidate[1])):
+            if start >= covered_until:
+                mentions.append(SkillMention(skill=skill, start=start, end=end))
+                covered_until = end
+        return mentions
+
+    def canonicalize(self, text: str) -> str:
+        """The text with every skill alias replaced by its canonical name in lowercase, for term matching."""
+        parts = []
+        position = 0
+        for mention in self.find(text):
+            parts.append(text[position:mention.start])
+            parts.append(mention.skill.lower())
+            position = mention.end
+        parts.append(text[position:])
+        return "".join(parts)
+
+    def normalize(self, skill: str) -> str:
+        """Canonical name of a skill string, or the string itself (trimmed) if it is not a known skill."""
+        stripped = skill.strip()
+        canonical = self._case_sensitive.get(stripped) or self._aliases.get(_normalize_alias(stripped))
+        if canonical:
+            return canonical
+        mentions = self.find(stripped)
+        # "Python 3" or "Kubernetes (k8s)" still name one skill
+        if mentions and len({mention.skill for mention in mentions}) == 1 and mentions[0].start == 0:
+            return mentions[0].skill
+        return stripped
+
+    def skills_in(self, text: str) -> List[str]:
+        """Distinct canonical skills mentioned in a text, in order of first mention."""
+        return list(dict.fromkeys(mention.skill for mention in self.find(text)))
+
+    def normalize_resume(self, resume_data: ResumeData) -> ResumeData:
+        """Replace skill and technology names in a parsed resume by their canonical names, dropping duplicates."""
+        def normalize_names(names: List[str]) -> List[str]:
+            return list(dict.fromkeys(self.normalize(name) for name in names if isinstance(name, str) and name.strip()))
+
+        skills = []
+        seen = set()
+        for skill in resume_data.skills:
+            if isinstance(skill, SkillCategory):
+                skill = skill.model_copy(update={"skills": normalize_names(skill.skills)})
+            elif isinstance(skill, dict) and isinstance(skill.get("skills"), list):
+                skill = {**skill, "skills": normalize_names(skill["skills"])}
+            elif isinstance(skill, dict) and skill and all(isinstance(names, list) for names in skill.values()):
+                # {"category": [skill names]}
+                skill = {category: normalize_names(names) for category, names in skill.items()}
+            else:
+                name = skill.get("name") if isinstance(skill, dict) else skill.name if isinstance(skill, Skill) else skill
+                if not isinstance(name, str):
+                    skills.append(skill)
+                    continue
+                name = self.normalize(name)
+                if name in seen:
+                    continue
+                seen.add(name)
+                if isinstance(skill, dict):
+                    skill = {**skill, "name": name}
+                elif isinstance(skill, Skill):
+                    skill = skill.model_copy(update={"name": name})
+                else:
+                    skill = name
+            skills.append(skill)
+
+        return resume_data.model_copy(update={
+            "skills": skills,
+            "experience": [entry.model_copy(update={"technologies": normalize_names(entry.technologies or [])})
+                           for entry in resume_data.experience],
+            "projects": [project.model_copy(update={"technologies": normalize_names(project.technologies or [])})
+                         for project in resume_data.projects]
+        })
+
+@lru_cache(maxsize=1)
+def default_skill_taxonomy() -> SkillTaxonomy:
+    """The taxonomy at SKILL_TAXONOMY_PATH, loaded on first use."""
+    return SkillTaxonomy.load()
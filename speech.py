@@ -3,23 +3,36 @@ import openai
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import assemblyai as aai
 from dotenv import load_dotenv
+from extractive import extract_top_sentences, resolve_keep_ratio
+from model_tiers import build_stage_llms, resolve_stage_models, track_stage_metrics
+from routing import get_latency_model
+from transcription import transcribe_segmented
 
 load_dotenv()
 
 # Set your OpenAI API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialize the ChatOpenAI model
-chat_model = ChatOpenAI(model="gpt-4o-mini")
+# Initialize the ChatOpenAI models: chunk summaries (map) and the final summary (reduce)
+STAGE_MODELS = resolve_stage_models(os.getenv("SPEECH_SUMMARY_MODEL", "gpt-4o-mini"))
+stage_llms = build_stage_llms(STAGE_MODELS, lambda model: ChatOpenAI(model=model))
+chat_model = stage_llms["reduce"]
 
-def transcribe_audio(file_path):
-    """Transcribe audio file to text using AssemblyAI."""
+def invoke_stage(stage, prompt):
+    """Run a prompt on the model of a pipeline stage, recording its latency and tokens."""
+    model = stage_llms[stage]
+    return get_latency_model(STAGE_MODELS[stage]).timed(
+        lambda text: model.invoke([HumanMessage(content=text)]).content.strip(), prompt, stage
+    )
+
+def transcribe_audio(file_path, transcriber=None):
+    """
+    Transcribe audio file to text, by default using AssemblyAI. Long recordings are split
+    on silence and their segments transcribed concurrently; see transcription.py.
+    """
     try:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(file_path)
-        return transcript.text
+        return transcribe_segmented(file_path, transcriber)
     except Exception as e:
         print(f"Error in transcription: {e}")
         return None
@@ -35,7 +48,7 @@ def split_text_recursive(text, chunk_size=1000, chunk_overlap=100):
     documents = text_splitter.create_documents([text])
     return documents
 
-def summarize_text(text, max_summary_length=2000):
+def summarize_text(text, max_summary_length=2000, extractive_keep_ratio=None):
     """
     Create a concise summary of the text, keeping the total summary within
     the specified maximum length.
@@ -43,11 +56,19 @@ def summarize_text(text, max_summary_length=2000):
     Args:
         text: The text to summarize
         max_summary_length: Maximum length of the entire summary
+        extractive_keep_ratio: If set, share of the most central sentences kept
+            before summarization (e.g. 0.3)
         
     Returns:
         A concise summary of the text
     """
     try:
+        # Optionally drop the least central sentences to save tokens
+        if extractive_keep_ratio is not None:
+            selection = extract_top_sentences(text, resolve_keep_ratio(extractive_keep_ratio))
+            print(f"Extractive pre-filter kept {selection.kept_sentences}/{selection.total_sentences} sentences.")
+            text = selection.text
+        
         # Split text into chunks
         doc_chunks = split_text_recursive(text)
         chunks = [doc.page_content for doc in doc_chunks]
@@ -75,12 +96,8 @@ def summarize_text(text, max_summary_length=2000):
                     text=chunk
                 )
                 
-                # Create message and invoke the model
-                messages = [HumanMessage(content=prompt)]
-                response = chat_model.invoke(messages)
-                
-                # Extract the summary from the response
-                chunk_summary = response.content.strip()
+                # Invoke the map model (or the final model for a single chunk) and keep its summary
+                chunk_summary = invoke_stage("map" if len(chunks) > 1 else "reduce", prompt)
                 chunk_summaries.append(chunk_summary)
                 
             except Exception as e:
@@ -101,9 +118,7 @@ def summarize_text(text, max_summary_length=2000):
                 Maintain key details while eliminating repetition. Keep your summary concise.
                 """
                 
-                messages = [HumanMessage(content=final_prompt)]
-                response = chat_model.invoke(messages)
-                return response.content.strip()
+                return invoke_stage("reduce", final_prompt)
             except Exception as e:
                 print(f"Error creating final summary: {e}")
                 return combined_summary
@@ -114,15 +129,19 @@ def summarize_text(text, max_summary_length=2000):
         print(f"Error in summarization process: {e}")
         return "The text could not be summarized due to an error."
 
-def Process_Audio(file_path):
-    """Process audio file: transcribe and summarize."""
-    transcript = transcribe_audio(file_path)
-    if not transcript:
-        return {"success": False, "error": "Transcription failed"}
-    
-    summary = summarize_text(transcript)
+def Process_Audio(file_path, extractive_keep_ratio=None, transcriber=None):
+    """Process audio file: transcribe and summarize, with the latency and tokens of every stage."""
+    with track_stage_metrics() as metrics:
+        transcript = transcribe_audio(file_path, transcriber)
+        if not transcript or not transcript.text:
+            return {"success": False, "error": "Transcription failed"}
+        
+        summary = summarize_text(transcript.text, extractive_keep_ratio=extractive_keep_ratio)
     return {
         "success": True,
-        "transcript": transcript,
-        "summary": summary
+        "transcript": transcript.text,
+        "timestamped_transcript": transcript.timestamped_text(),
+        "segments": [segment.model_dump() for segment in transcript.segments],
+        "summary": summary,
+        "stage_metrics": metrics.as_dict()
     }
\ No newline at end of file
@@ -0,0 +1,55 @@
+from typing import Any, Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken ships with langchain-openai, but stay usable without it
+    tiktoken = None
+
+# Rough characters-per-token ratio for English text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# Context window sizes (in tokens) of the models used across the summarizers
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+_encodings = {}
+
+def _get_encoding(model_name: Optional[str]):
+    """Return (and cache) the tiktoken encoding for a model, or None."""
+    if tiktoken is None:
+        return None
+    key = model_name or "default"
+    if key not in _encodings:
+        try:
+            _encodings[key] = tiktoken.encoding_for_model(model_name) if model_name else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            _encodings[key] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[key]
+
+def estimate_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """Count (or, without tiktoken, estimate) the number of tokens in a text."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def lookup_model_value(model_name: Optional[str], table: Dict[str, Any], default: Any) -> Any:
+    """Look up a per-model value, matching on the longest known model name prefix."""
+    if not model_name:
+        return default
+    matches = [name for name in table if model_name.startswith(name)]
+    if not matches:
+        return default
+    return table[max(matches, key=len)]
+
+def get_context_window(model_name: Optional[str]) -> int:
+    """Return the context window of a model, matching on the longest known prefix."""
+    return lookup_model_value(model_name, MODEL_CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW)
@@ -0,0 +1,203 @@
+import contextvars
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from model_tiers import record_stage
+
+# Length aimed at for each transcribed segment; recordings up to twice as long go as one job
+TRANSCRIBE_SEGMENT_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "600"))
+# Segments transcribed at once; raise it as far as the provider's concurrency limit allows
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "8"))
+TRANSCRIBE_RETRIES = 2  # Extra attempts for a failed segment; the other segments are not redone
+MIN_SEGMENT_RATIO = 0.5  # A cut may fall at a silence from half the target length...
+MAX_SEGMENT_RATIO = 1.5  # ...up to one and a half times it, or else is forced at the target
+SILENCE_THRESHOLD_DB = -35
+SILENCE_MIN_SECONDS = 0.5
+SEGMENT_SAMPLE_RATE = 16000  # Mono 16 kHz FLAC: lossless for speech and a fraction of the upload
+
+SILENCE_START_PATTERN = re.compile(r'silence_start:\s*(-?[\d.]+)')
+SILENCE_END_PATTERN = re.compile(r'silence_end:\s*(-?[\d.]+)')
+
+class TranscriptSegment(BaseModel):
+    """Transcript of one segment of a recording, with its position in seconds."""
+    index: int
+    start: float
+    end: float
+    text: str = ""
+    attempts: int = 0
+
+class SegmentedTranscript(BaseModel):
+    """Transcript of a recording stitched from its segments, in order."""
+    text: str
+    duration: float
+    transcriber: str
+    segments: List[TranscriptSegment] = Field(default_factory=list)
+
+    def timestamped_text(self) -> str:
+        """The transcript with the start time of each segment, e.g. "[00:10:02] ..."."""
+        return "\n".join(f"[{format_timestamp(segment.start)}] {segment.text}" for segment in self.segments if segment.text)
+
+class Transcriber(ABC):
+    """Speech-to-text backend: transcribes one audio file to text."""
+    name = "transcriber"
+
+    @abstractmethod
+    def transcribe(self, file_path: str) -> str:
+        """Text of the speech in an audio file."""
+
+class AssemblyAITranscriber(Transcriber):
+    """Transcription through AssemblyAI (the API key is read from ASSEMBLYAI_API_KEY)."""
+    name = "assemblyai"
+
+    def transcribe(self, file_path: str) -> str:
+        import assemblyai as aai
+        transcript = aai.Transcriber().transcribe(file_path)
+        if transcript.status == aai.TranscriptStatus.error:
+            raise RuntimeError(f"AssemblyAI transcription failed: {transcript.error}")
+        return transcript.text or ""
+
+class LocalTranscriber(Transcriber):
+    """
+    Stand-in transcriber for tests and offline runs: returns respond(file_path) after an
+    optional delay, without any network call.
+    """
+    name = "local"
+
+    def __init__(self, respond: Callable[[str], str] = lambda file_path: "", delay_seconds: float = 0.0):
+        self.respond = respond
+        self.delay_seconds = delay_seconds
+
+    def transcribe(self, file_path: str) -> str:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        return self.respond(file_path)
+
+def format_timestamp(seconds: float) -> str:
+    """Seconds as hh:mm:ss."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+def audio_duration(file_path: str) -> float:
+    """Duration of an audio file in seconds, from ffprobe."""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1",
+         file_path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip())
+
+def detect_silences(file_path: str, threshold_db: float = SILENCE_THRESHOLD_DB,
+                    min_seconds: float = SILENCE_MIN_SECONDS) -> List[Tuple[float, float]]:
+    """(start, end) of every silence in an audio file, from ffmpeg's silencedetect filter."""
+    log = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", file_path,
+         "-af", f"silencedetect=noise={threshold_db}dB:d={min_seconds}", "-f", "null", "-"],
+        capture_output=True, text=True, check=True
+    ).stderr
+    starts = [float(value) for value in SILENCE_START_PATTERN.findall(log)]
+    ends = [float(value) for value in SILENCE_END_PATTERN.findall(log)]
+    return list(zip(starts, ends))
+
+def plan_segments(duration: float, silences: List[Tuple[float, float]],
+                  segment_seconds: float = TRANSCRIBE_SEGMENT_SECONDS) -> List[Tuple[float, float]]:
+    """
+    (start, end) of segments of about segment_seconds covering a recording. Each cut is at
+    the middle of the silence closest to the target length within the allowed range, so
+    words are not split; without such a silence the cut is forced at the target length.
+    """
+    cut_points = [(start + end) / 2 for start, end in silences]
+    segments = []
+    start = 0.0
+    while duration - start > segment_seconds * MAX_SEGMENT_RATIO:
+        target = start + segment_seconds
+        allowed = [point for point in cut_points
+                   if start + segment_seconds * MIN_SEGMENT_RATIO <= point <= start + segment_seconds * MAX_SEGMENT_RATIO]
+        cut = min(allowed, key=lambda point: abs(point - target)) if allowed else target
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, duration))
+    return segments
+
+def cut_segment(file_path: str, start: float, end: float, output_path: str) -> None:
+    """Write the [start, end) seconds of an audio file as mono 16 kHz FLAC."""
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", file_path,
+         "-vn", "-ac", "1", "-ar", str(SEGMENT_SAMPLE_RATE), "-c:a", "flac", output_path],
+        check=True
+    )
+
+def _transcribe_segment(file_path: str, segment: TranscriptSegment, transcriber: Transcriber,
+                        work_dir: Optional[str]) -> TranscriptSegment:
+    """Cut (unless the segment is the whole file) and transcribe one segment, retrying failures."""
+    segment_path = file_path
+    if work_dir is not None:
+        segment_path = os.path.join(work_dir, f"segment-{segment.index:04d}.flac")
+        cut_segment(file_path, segment.start, segment.end, segment_path)
+    for attempt in range(TRANSCRIBE_RETRIES + 1):
+        segment.attempts = attempt + 1
+        try:
+            start = time.perf_counter()
+            segment.text = transcriber.transcribe(segment_path).strip()
+            record_stage("transcribe", transcriber.name, 0, 0, time.perf_counter() - start)
+            return segment
+        except Exception as e:
+            print(f"Error transcribing segment {segment.index} (attempt {attempt + 1}): {e}")
+            if attempt == TRANSCRIBE_RETRIES:
+                raise
+    return segment
+
+def transcribe_segmented(file_path: str, transcriber: Optional[Transcriber] = None,
+                         max_workers: int = TRANSCRIBE_CONCURRENCY,
+                         segment_seconds: float = TRANSCRIBE_SEGMENT_SECONDS) -> SegmentedTranscript:
+    """
+    Transcribe a recording in segments split on silence, up to max_workers at a time, and
+    stitch the segment transcripts back together in order. Recordings shorter than two
+    segments (or any recording when ffmpeg is not installed) go as one job.
+    """
+    transcriber = transcriber or AssemblyAITranscriber()
+    if not ffmpeg_available():
+        print("ffmpeg not found; transcribing the recording as one job.")
+        segment = _transcribe_segment(file_path, TranscriptSegment(index=0, start=0.0, end=0.0), transcriber, None)
+        return SegmentedTranscript(text=segment.text, duration=0.0, transcriber=transcriber.name, segments=[segment])
+
+    start = time.perf_counter()
+    duration = audio_duration(file_path)
+    spans = [(0.0, duration)]
+    if duration > segment_seconds * 2:
+        spans = plan_segments(duration, detect_silences(file_path), segment_seconds)
+    record_stage("segment", "ffmpeg", 0, 0, time.perf_counter() - start)
+    segments = [TranscriptSegment(index=i, start=round(span[0], 3), end=round(span[1], 3)) for i, span in enumerate(spans)]
+    print(f"Transcribing {duration:.0f}s of audio in {len(segments)} segments, {max_workers} at a time...")
+
+    if len(segments) == 1:
+        _transcribe_segment(file_path, segments[0], transcriber, None)
+    else:
+        with tempfile.TemporaryDirectory(prefix="ultimate_summarization_segments-") as work_dir:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Each segment runs in a copy of the caller's context so its metrics are recorded
+                futures = [
+                    executor.submit(contextvars.copy_context().run, _transcribe_segment, file_path, segment,
+                                    transcriber, work_dir)
+                    for segment in segments
+                ]
+                for future in futures:
+                    future.result()
+
+    return SegmentedTranscript(
+        text=" ".join(segment.text for segment in segments if segment.text),
+        duration=duration,
+        transcriber=transcriber.name,
+        segments=segments
+    )
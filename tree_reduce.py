@@ -0,0 +1,134 @@
+import contextvars
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from token_utils import estimate_tokens, get_context_window
+
+# Room kept in the context window for the reduce instructions and the model's answer
+DEFAULT_RESERVED_TOKENS = 2000
+DEFAULT_MAX_WORKERS = 4
+MAX_REDUCE_LEVELS = 8
+MEMO_SIZE = 1024  # Intermediate nodes kept for retries
+SUMMARY_SEPARATOR = "\n\n"
+
+def reduce_token_limit(model_name: Optional[str], reserved_tokens: int = DEFAULT_RESERVED_TOKENS) -> int:
+    """Tokens of summaries a single reduce call can take for a model."""
+    return max(reserved_tokens, get_context_window(model_name) - reserved_tokens)
+
+class TreeReduceError(RuntimeError):
+    """Raised when some branches of a tree reduce fail; completed branches stay memoized."""
+
+class TreeReducer:
+    """
+    Multi-level reduce for summaries that do not fit in one context window.
+
+    Summaries are packed in order into batches of at most ``token_limit`` tokens, each
+    batch is reduced to one summary by ``reduce_fn(batch_text, context)`` (batches run
+    in parallel, ``context`` is passed through unchanged, e.g. a document type), and the
+    process repeats level by level until everything fits in a single batch. Results of
+    intermediate nodes are memoized by content, so retrying after a failure only
+    recomputes the branches that failed.
+    """
+
+    def __init__(self, reduce_fn: Callable[[str, str], str], token_limit: int,
+                 max_workers: int = DEFAULT_MAX_WORKERS, max_retries: int = 1):
+        self.reduce_fn = reduce_fn
+        self.token_limit = token_limit
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_batches(self, summaries: List[str]) -> List[List[str]]:
+        """Pack summaries in order into batches that fit the token limit."""
+        batches = []
+        current = []
+        current_tokens = 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if current and current_tokens + tokens > self.token_limit:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _node_key(self, batch_text: str, context: str) -> str:
+        return hashlib.sha256(f"{context}\0{batch_text}".encode("utf-8")).hexdigest()
+
+    def _reduce_batch(self, batch: List[str], context: str) -> str:
+        """Reduce one batch, reusing a memoized result when the same node was computed before."""
+        batch_text = SUMMARY_SEPARATOR.join(batch)
+        key = self._node_key(batch_text, context)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        result = self.reduce_fn(batch_text, context)
+
+        with self._lock:
+            self._memo[key] = result
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return result
+
+    def _reduce_level(self, batches: List[List[str]], context: str) -> List[str]:
+        """Reduce all batches of one level in parallel, retrying failed branches."""
+        results = [None] * len(batches)
+        pending = list(range(len(batches)))
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for attempt in range(self.max_retries + 1):
+                # Each branch runs in a copy of the caller's context so per-request metrics follow it
+                futures = {
+                    i: executor.submit(contextvars.copy_context().run, self._reduce_batch, batches[i], context)
+                    for i in pending
+                }
+                pending = []
+                for i, future in futures.items():
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        errors[i] = e
+                        pending.append(i)
+                if not pending or attempt == self.max_retries:
+                    break
+                print(f"Retrying {len(pending)} failed reduce branches...")
+
+        if pending:
+            raise TreeReduceError(
+                f"{len(pending)} of {len(batches)} reduce branches failed: {errors[pending[0]]}"
+            )
+        return results
+
+    def reduce(self, summaries: List[str], context: str = "") -> List[str]:
+        """
+        Reduce summaries level by level until they fit in one batch.
+
+        Returns the remaining summaries (often a single one), ready for the final combine prompt.
+        """
+        level = 0
+        while len(summaries) > 1 or (summaries and estimate_tokens(summaries[0]) > self.token_limit):
+            batches = self.make_batches(summaries)
+            if len(batches) == 1 and len(summaries) > 1:
+                break
+            if level >= MAX_REDUCE_LEVELS:
+                print(f"Stopping tree reduce after {MAX_REDUCE_LEVELS} levels.")
+                break
+
+            level += 1
+            print(f"Tree reduce level {level}: {len(summaries)} summaries in {len(batches)} batches...")
+            reduced = self._reduce_level(batches, context)
+            if len(reduced) >= len(summaries) and sum(map(estimate_tokens, reduced)) >= sum(map(estimate_tokens, summaries)):
+                # The reduce step is not shrinking anything; further levels would not help
+                summaries = reduced
+                break
+            summaries = reduced
+        return summaries
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from token_utils import estimate_tokens
+
+# Location of the persistent summary cache
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "ultimate_summarization_cache.db")
+)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+LINE_TOKENS_ESTIMATE = 12  # Typical tokens per extracted line, used to space chunk anchors
+
+class VersionDiff(BaseModel):
+    """How a new version of a document differs from the previous one, chunk by chunk."""
+    document_key: str
+    version: int
+    total_chunks: int
+    unchanged_chunks: int = 0
+    changed_chunks: int = 0
+    removed_chunks: int = 0
+    reused_summaries: int = 0
+    new_summaries: int = 0
+
+    model_config = {
+        "extra": "allow"
+    }
+
+def content_hash(text: str) -> str:
+    """Hash of a text with whitespace normalized, so re-extraction noise does not count as a change."""
+    normalized = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def is_anchor(text: str, divisor: int) -> bool:
+    """Content-defined boundary test: true for roughly one in `divisor` texts."""
+    return zlib.crc32(WHITESPACE_PATTERN.sub(" ", text).strip().encode("utf-8")) % divisor == 0
+
+def content_defined_chunks(text: str, target_tokens: int) -> List[str]:
+    """
+    Split text into chunks whose boundaries depend only on nearby content.
+
+    A chunk ends after a line whose hash marks it as an anchor once the chunk holds at
+    least half the target, or when it would exceed the target. Unlike greedy
+    size-based splitting, an edit only changes the chunks around it: boundaries
+    after the next anchor line are the same as in the previous version.
+    """
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    divisor = max(2, target_tokens // (2 * LINE_TOKENS_ESTIMATE))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > target_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+        if current_tokens >= target_tokens // 2 and is_anchor(line, divisor):
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+class SummaryCache:
+    """
+    Persistent SQLite store of summaries keyed by namespace and content hash, plus the
+    chunk hashes of every stored version of a document, used to diff revisions.
+    """
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "namespace TEXT NOT NULL, content_hash TEXT NOT NULL, summary TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, PRIMARY KEY (namespace, content_hash))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS document_versions ("
+                "document_key TEXT NOT NULL, version INTEGER NOT NULL, chunk_hashes TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, PRIMARY KEY (document_key, version))"
+            )
+
+    def get(self, namespace: str, text: str) -> Optional[str]:
+        """Return the stored summary of a text, if any."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary FROM summaries WHERE namespace = ? AND content_hash = ?",
+                (namespace, content_hash(text))
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, namespace: str, text: str, summary: str) -> None:
+        """Store the summary of a text."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO summaries (namespace, content_hash, summary, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, content_hash(text), summary, datetime.now().isoformat())
+            )
+
+    def record_version(self, document_key: str, chunks: List[str]) -> VersionDiff:
+        """Store the chunk hashes of a new version and diff them against the previous version."""
+        hashes = [content_hash(chunk) for chunk in chunks]
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT version, chunk_hashes FROM document_versions WHERE document_key = ? "
+                "ORDER BY version DESC LIMIT 1",
+                (document_key,)
+            ).fetchone()
+            previous_version, previous_hashes = (row[0], json.loads(row[1])) if row else (0, [])
+            self._connection.execute(
+                "INSERT INTO document_versions (document_key, version, chunk_hashes, created_at) VALUES (?, ?, ?, ?)",
+                (document_key, previous_version + 1, json.dumps(hashes), datetime.now().isoformat())
+            )
+
+        previous = set(previous_hashes)
+        unchanged = sum(1 for chunk_hash in hashes if chunk_hash in previous)
+        current = set(hashes)
+        return VersionDiff(
+            document_key=document_key,
+            version=previous_version + 1,
+            total_chunks=len(hashes),
+            unchanged_chunks=unchanged,
+            changed_chunks=len(hashes) - unchanged,
+            removed_chunks=sum(1 for chunk_hash in previous if chunk_hash not in current)
+        )